@@ -1,17 +1,30 @@
 import sqlite3
+from routing import RoutingConnection, get_router
 
 class DatabaseConnection:
     """Custom class-based context manager for database connections"""
     
-    def __init__(self, db_name='users.db'):
-        """Initialize with database name"""
+    def __init__(self, db_name='users.db', router=None):
+        """
+        Initialize with database name
+
+        Args:
+            db_name (str): Primary database name (default: 'users.db')
+            router (Router): Read-replica routing; by default the one set
+                with routing.configure_replicas() for db_name, if any
+        """
         self.db_name = db_name
+        self.router = router or get_router(db_name)
         self.connection = None
     
     def __enter__(self):
         """Open database connection when entering the context"""
         print(f"Opening connection to {self.db_name}")
-        self.connection = sqlite3.connect(self.db_name)
+        if self.router.replicas:
+            # Reads go to a replica until this context writes
+            self.connection = RoutingConnection(self.router)
+        else:
+            self.connection = sqlite3.connect(self.db_name)
         return self.connection
     
     def __exit__(self, exc_type, exc_value, traceback):
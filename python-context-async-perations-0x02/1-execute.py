@@ -1,9 +1,12 @@
 import sqlite3
+from result_stream import ResultStream
+from routing import RoutingConnection, get_router
 
 class ExecuteQuery:
     """Reusable context manager for executing database queries"""
     
-    def __init__(self, query, parameters=None, db_name='users.db'):
+    def __init__(self, query, parameters=None, db_name='users.db',
+                 router=None, stream=False, columnar=False, arraysize=1000):
         """
         Initialize the context manager with query and parameters
         
@@ -11,10 +14,21 @@ class ExecuteQuery:
             query (str): SQL query to execute
             parameters (tuple): Parameters for the query (optional)
             db_name (str): Database name (default: 'users.db')
+            router (Router): Read-replica routing; by default the one set
+                with routing.configure_replicas() for db_name, if any
+            stream (bool): Return a lazy ResultStream of row tuples
+                instead of the list of all rows
+            columnar (bool): Return a lazy iterator of columnar chunks
+                (column name -> values); implies stream
+            arraysize (int): Rows fetched at a time when streaming
         """
         self.query = query
         self.parameters = parameters or ()
         self.db_name = db_name
+        self.router = router or get_router(db_name)
+        self.stream = stream or columnar
+        self.columnar = columnar
+        self.arraysize = arraysize
         self.connection = None
         self.cursor = None
         self.results = None
@@ -22,12 +36,21 @@ class ExecuteQuery:
     def __enter__(self):
         """
         Open connection, execute query, and return results
+
+        When streaming, rows are fetched as the result is iterated; the
+        cursor stays open until the context exits, so the result must be
+        consumed inside the with block.
         """
         print(f"Opening connection to {self.db_name}")
         
-        # Open database connection
-        self.connection = sqlite3.connect(self.db_name)
+        # Open database connection; with replicas configured, a read runs
+        # on one of them unless this thread or task has just written
+        if self.router.replicas:
+            self.connection = RoutingConnection(self.router)
+        else:
+            self.connection = sqlite3.connect(self.db_name)
         self.cursor = self.connection.cursor()
+        self.cursor.arraysize = self.arraysize
         
         # Execute the query with parameters
         print(f"Executing query: {self.query}")
@@ -37,6 +60,15 @@ class ExecuteQuery:
         else:
             self.cursor.execute(self.query)
         
+        if self.stream:
+            # Hand out a lazy view of the open cursor instead of a list
+            self.results = ResultStream(self.cursor, self.arraysize)
+            print(f"Query executed successfully, streaming "
+                  f"{self.arraysize} rows at a time")
+            if self.columnar:
+                return self.results.columns()
+            return self.results
+        
         # Fetch results
         self.results = self.cursor.fetchall()
         print(f"Query executed successfully, {len(self.results)} rows returned")
@@ -74,8 +106,18 @@ with ExecuteQuery("SELECT * FROM users WHERE age > ?", (25,)) as results:
 
 print("\n" + "="*50 + "\n")
 
-# Another example - fetching all users
-with ExecuteQuery("SELECT * FROM users") as results:
+# Another example - streaming all users instead of loading them at once
+with ExecuteQuery("SELECT * FROM users", stream=True) as results:
     print("All users:")
     for row in results:
-        print(row)
\ No newline at end of file
+        print(row)
+
+print("\n" + "="*50 + "\n")
+
+# Columnar example - averaging ages one chunk of packed values at a time
+with ExecuteQuery("SELECT age FROM users", columnar=True) as chunks:
+    total = count = 0
+    for chunk in chunks:
+        total += sum(chunk["age"])
+        count += len(chunk["age"])
+    print(f"Average age: {total / count if count else 0:.2f}")
\ No newline at end of file
@@ -1,42 +1,67 @@
 import asyncio
 import aiosqlite
 import time
+from async_pool import AsyncConnectionPool
+from query_executor import QueryExecutor
 
 
-async def async_fetch_users():
+async def async_fetch_users(executor):
     """
     Asynchronously fetch all users from the database
+
+    Args:
+        executor (QueryExecutor): Runs the query on a pooled connection
     """
     print("Starting to fetch all users...")
     start_time = time.time()
     
-    async with aiosqlite.connect('users.db') as db:
-        cursor = await db.execute("SELECT * FROM users")
-        results = await cursor.fetchall()
-        await cursor.close()
+    results = await executor.fetch("SELECT * FROM users")
     
     end_time = time.time()
     print(f"Fetched {len(results)} users in {end_time - start_time:.2f} seconds")
     return results
 
 
-async def async_fetch_older_users():
+async def async_fetch_older_users(executor):
     """
     Asynchronously fetch users older than 40 from the database
+
+    Args:
+        executor (QueryExecutor): Runs the query on a pooled connection
     """
     print("Starting to fetch users older than 40...")
     start_time = time.time()
     
-    async with aiosqlite.connect('users.db') as db:
-        cursor = await db.execute("SELECT * FROM users WHERE age > ?", (40,))
-        results = await cursor.fetchall()
-        await cursor.close()
+    results = await executor.fetch("SELECT * FROM users WHERE age > ?", (40,))
     
     end_time = time.time()
     print(f"Fetched {len(results)} users older than 40 in {end_time - start_time:.2f} seconds")
     return results
 
 
+async def count_users_by_age(executor, ages):
+    """
+    Count the users of each age, one query per age, printing each count
+    as soon as its query completes
+
+    Args:
+        executor (QueryExecutor): Bounds how many queries run at once
+        ages: Ages to count
+
+    Returns:
+        dict: Age -> number of users
+    """
+    ages = list(ages)
+    queries = [("SELECT COUNT(*) FROM users WHERE age = ?", (age,))
+               for age in ages]
+    counts = {}
+    async for index, rows in executor.as_completed(queries):
+        counts[ages[index]] = rows[0][0]
+    print(f"Counted users for {len(counts)} ages, "
+          f"{executor.concurrency} queries at a time")
+    return counts
+
+
 async def fetch_concurrently():
     """
     Execute both database queries concurrently using asyncio.gather
@@ -44,11 +69,19 @@ async def fetch_concurrently():
     print("Starting concurrent database queries...")
     start_time = time.time()
     
-    # Execute both queries concurrently
-    all_users, older_users = await asyncio.gather(
-        async_fetch_users(),
-        async_fetch_older_users()
-    )
+    # Both queries share a small pool; the executor bounds how many run at
+    # once and gives each of them 10 seconds
+    async with AsyncConnectionPool('users.db', max_size=4) as pool:
+        executor = QueryExecutor(pool, timeout=10)
+        
+        # Execute both queries concurrently
+        all_users, older_users = await asyncio.gather(
+            async_fetch_users(executor),
+            async_fetch_older_users(executor)
+        )
+        
+        # Hundreds of queries stream through the same four connections
+        await count_users_by_age(executor, range(18, 100))
     
     end_time = time.time()
     print(f"\nConcurrent execution completed in {end_time - start_time:.2f} seconds")
@@ -82,4 +115,18 @@ async def create_sample_data():
             )
         ''')
         
-        # Insert sample d
\ No newline at end of file
+        # Insert sample data if the table is empty
+        cursor = await db.execute("SELECT COUNT(*) FROM users")
+        (count,) = await cursor.fetchone()
+        await cursor.close()
+        if count == 0:
+            await db.executemany(
+                "INSERT INTO users (name, age, email) VALUES (?, ?, ?)",
+                [(f"User {i}", 18 + i % 60, f"user{i}@example.com")
+                 for i in range(1, 101)]
+            )
+        await db.commit()
+
+
+# Run the concurrent fetch
+asyncio.run(fetch_concurrently())
@@ -0,0 +1,189 @@
+#!/usr/bin/python3
+"""
+Module that provides an asyncio pool of aiosqlite connections
+
+Opening an aiosqlite connection starts a worker thread and opens the
+database file; doing it per query makes hundreds of concurrent queries
+open hundreds of files and threads. AsyncConnectionPool keeps at most
+`max_size` connections and hands them out to one task at a time:
+
+    async with AsyncConnectionPool('users.db', max_size=4) as pool:
+        async with pool.connection() as db:
+            rows = await db.execute_fetchall("SELECT * FROM users")
+
+Tasks wait, up to `timeout` seconds, for a connection to be released.
+A connection given back with an open transaction is rolled back; one
+whose query was abandoned (timed out or cancelled) is given back with
+abort(), which stops the query in SQLite and closes the connection. Leaving
+the `async with` block (or awaiting close()) closes the connections,
+whose worker threads would otherwise keep the interpreter running.
+"""
+import asyncio
+import sqlite3
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+# Virtual machine instructions between two checks of a connection's
+# aborted flag
+PROGRESS_STEPS = 1000
+
+
+class AsyncConnectionPool:
+    """Bounded pool of reusable aiosqlite connections for one event loop"""
+
+    def __init__(self, database="users.db", max_size=8, timeout=30.0):
+        """
+        Args:
+            database (str): SQLite database file
+            max_size (int): Most connections open at once
+            timeout (float): Seconds acquire() waits for a free connection
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        # One slot per checked out connection
+        self.slots = asyncio.Semaphore(max_size)
+        # The loop runs one task at a time, so no lock is needed between
+        # awaits
+        self.idle = []
+        self.size = 0
+        self.closed = False
+        self.counters = {"created": 0, "reused": 0, "discarded": 0,
+                         "aborted": 0}
+
+    async def checkout(self):
+        """Returns an idle connection or a new one (slot held)"""
+        if self.closed:
+            raise RuntimeError("connection pool is closed")
+        if self.idle:
+            self.counters["reused"] += 1
+            return self.idle.pop()
+        self.size += 1
+        connection = aiosqlite.connect(self.database)
+        try:
+            await connection
+            # Lets abort() stop statements that have not started yet,
+            # which sqlite3's interrupt() does not reach
+            connection.aborted = False
+            await connection.set_progress_handler(
+                lambda: connection.aborted, PROGRESS_STEPS)
+        except BaseException:
+            self.size -= 1
+            # Ends the worker thread without waiting (we may be cancelled)
+            connection.stop()
+            raise
+        self.counters["created"] += 1
+        return connection
+
+    async def acquire(self, timeout=None):
+        """
+        Checks a connection out of the pool
+
+        Args:
+            timeout (float): Seconds to wait for a free connection,
+                defaults to the pool's timeout
+
+        Returns:
+            An aiosqlite connection, to be given back with release()
+
+        Raises:
+            TimeoutError: If no connection became free in time
+        """
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            await asyncio.wait_for(self.slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"no connection to {self.database} became "
+                               f"free within {timeout} seconds") from None
+        try:
+            return await self.checkout()
+        except BaseException:
+            self.slots.release()
+            raise
+
+    async def discard(self, connection):
+        """Closes a broken connection and frees its place"""
+        self.size -= 1
+        self.counters["discarded"] += 1
+        try:
+            await connection.close()
+        except (sqlite3.Error, ValueError):
+            pass
+
+    async def release(self, connection):
+        """
+        Gives a connection back to the pool
+
+        An open transaction is rolled back first; a connection that cannot
+        be rolled back is discarded.
+        """
+        try:
+            if connection.in_transaction:
+                await connection.rollback()
+        except (sqlite3.Error, ValueError):
+            await self.discard(connection)
+        except BaseException:
+            # Cancelled while rolling back: drop the connection
+            self.size -= 1
+            connection.stop()
+            raise
+        else:
+            if self.closed:
+                self.size -= 1
+                await connection.close()
+            else:
+                self.idle.append(connection)
+        finally:
+            self.slots.release()
+
+    async def abort(self, connection):
+        """
+        Gives back a connection whose query was abandoned
+
+        The query may still be running, or waiting to run, in the
+        connection's worker thread: it is interrupted and the connection
+        is closed instead of being reused.
+        """
+        connection.aborted = True
+        self.counters["aborted"] += 1
+        try:
+            await connection.interrupt()
+            await self.discard(connection)
+        finally:
+            self.slots.release()
+
+    @asynccontextmanager
+    async def connection(self, timeout=None):
+        """
+        Async context manager that borrows a connection for the block
+
+        Yields:
+            A pooled aiosqlite connection
+        """
+        connection = await self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            await self.release(connection)
+
+    def stats(self):
+        """Returns the pool counters and its current size"""
+        return dict(self.counters, size=self.size, idle=len(self.idle))
+
+    async def close(self):
+        """Closes idle connections; busy ones are closed when released"""
+        self.closed = True
+        idle, self.idle = self.idle, []
+        self.size -= len(idle)
+        for connection in idle:
+            await connection.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+        return False
@@ -0,0 +1,152 @@
+#!/usr/bin/python3
+"""
+Module that runs many queries concurrently over an AsyncConnectionPool
+
+asyncio.gather() over a list of queries starts all of them at once.
+QueryExecutor bounds the fan-out instead:
+
+- at most `concurrency` queries run at a time, the others wait for a
+  slot without holding a connection
+- each query can be given a timeout; a query that times out, or whose
+  task is cancelled, is stopped in SQLite (not just abandoned in its
+  worker thread) and its connection is replaced
+- `as_completed()` streams (index, rows) pairs as the queries finish,
+  starting a new query only when one completes, so hundreds of queries
+  only ever hold `concurrency` tasks and connections; leaving the loop
+  early cancels the queries still running
+
+    async with AsyncConnectionPool('users.db') as pool:
+        executor = QueryExecutor(pool, concurrency=4, timeout=5)
+        async for index, rows in executor.as_completed(queries):
+            ...
+"""
+import asyncio
+
+
+def query_spec(item):
+    """
+    Splits a query item into its SQL and parameters
+
+    Args:
+        item: SQL string, or (SQL, parameters) pair
+
+    Returns:
+        tuple: (SQL, parameters)
+    """
+    if isinstance(item, str):
+        return item, ()
+    query, parameters = item
+    return query, parameters or ()
+
+
+class QueryExecutor:
+    """Runs queries on a pool with bounded concurrency and timeouts"""
+
+    def __init__(self, pool, concurrency=None, timeout=None):
+        """
+        Args:
+            pool (AsyncConnectionPool): Pool the queries borrow from
+            concurrency (int): Most queries running at once, the pool's
+                max_size by default
+            timeout (float): Default seconds a query may run, None for
+                no limit
+        """
+        self.pool = pool
+        self.concurrency = concurrency or pool.max_size
+        self.timeout = timeout
+        self.running = asyncio.Semaphore(self.concurrency)
+
+    async def fetch(self, query, parameters=(), timeout=None):
+        """
+        Runs one query and returns its rows
+
+        Args:
+            query (str): SQL query
+            parameters (tuple): Its parameters
+            timeout (float): Seconds the query may run, defaults to the
+                executor's timeout
+
+        Returns:
+            list: The rows, as tuples
+
+        Raises:
+            TimeoutError: If the query did not finish in time
+        """
+        timeout = self.timeout if timeout is None else timeout
+        async with self.running:
+            db = await self.pool.acquire()
+            try:
+                rows = await asyncio.wait_for(
+                    db.execute_fetchall(query, parameters), timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as error:
+                # The statement goes on in the worker thread unless stopped
+                await self.pool.abort(db)
+                if isinstance(error, asyncio.CancelledError):
+                    raise
+                raise TimeoutError(f"query did not finish within "
+                                   f"{timeout} seconds: {query}") from None
+            except BaseException:
+                await self.pool.release(db)
+                raise
+            await self.pool.release(db)
+            return rows
+
+    async def as_completed(self, queries, timeout=None,
+                           return_exceptions=False):
+        """
+        Async generator running queries and yielding them as they finish
+
+        Args:
+            queries: Iterable of SQL strings or (SQL, parameters) pairs,
+                consumed as slots free up
+            timeout (float): Seconds each query may run
+            return_exceptions (bool): Yield a failed query's exception in
+                place of its rows instead of raising it
+
+        Yields:
+            tuple: (index of the query in queries, rows or exception)
+        """
+        items = enumerate(queries)
+        in_flight = {}
+        try:
+            while True:
+                for index, item in items:
+                    query, parameters = query_spec(item)
+                    task = asyncio.ensure_future(
+                        self.fetch(query, parameters, timeout))
+                    in_flight[task] = index
+                    if len(in_flight) >= self.concurrency:
+                        break
+                if not in_flight:
+                    return
+                done, _ = await asyncio.wait(
+                    in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = in_flight.pop(task)
+                    error = asyncio.CancelledError() if task.cancelled() \
+                        else task.exception()
+                    if error is None:
+                        yield index, task.result()
+                    elif return_exceptions:
+                        yield index, error
+                    else:
+                        raise error
+        finally:
+            # Consumer stopped early, a query failed or we were cancelled
+            for task in in_flight:
+                task.cancel()
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+
+    async def gather(self, queries, timeout=None, return_exceptions=False):
+        """
+        Runs queries with bounded concurrency and returns their rows
+
+        Returns:
+            list: Rows (or exceptions) of each query, in query order
+        """
+        results = {}
+        async for index, result in self.as_completed(queries, timeout,
+                                                     return_exceptions):
+            results[index] = result
+        return [results[index] for index in range(len(results))]
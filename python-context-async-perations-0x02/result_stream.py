@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+"""
+Module that provides lazily fetched query results for ExecuteQuery
+
+fetchall() materializes the whole result set before the first row is
+used. A ResultStream reads it `arraysize` rows at a time with
+fetchmany(), so only one chunk is held in memory, in one of two shapes:
+
+- rows: the tuples returned by the cursor, one at a time
+- columns: one dictionary per chunk mapping each column name to its
+  values; integer and float columns are packed into array.array
+  (8 bytes per value instead of a Python object each), other columns
+  are tuples
+
+The stream reads from an open cursor: it has to be consumed inside the
+`with ExecuteQuery(...)` block, and is consumed once.
+"""
+from array import array
+
+
+def pack_column(values):
+    """
+    Stores the values of one column as compactly as possible
+
+    Args:
+        values (tuple): Values of a column, one per row
+
+    Returns:
+        array.array of int64 or float64 when every value is an int or a
+        float, the tuple itself otherwise (text, NULLs, blobs, ints
+        beyond 64 bits)
+    """
+    types = set(map(type, values))
+    try:
+        if types == {int}:
+            return array("q", values)
+        if types <= {int, float}:
+            return array("d", values)
+    except OverflowError:
+        pass
+    return values
+
+
+class ResultStream:
+    """Iterator over the rows of an executed cursor, fetched in chunks"""
+
+    def __init__(self, cursor, arraysize=1000):
+        """
+        Args:
+            cursor: Cursor on which the query has been executed
+            arraysize (int): Rows fetched per fetchmany() call
+        """
+        self.cursor = cursor
+        self.arraysize = arraysize
+        self.rows_read = 0
+
+    @property
+    def names(self):
+        """Column names of the result"""
+        return [column[0] for column in self.cursor.description or ()]
+
+    def batches(self):
+        """
+        Generator function that fetches the rows chunk by chunk
+
+        Yields:
+            list: Up to arraysize row tuples
+        """
+        while True:
+            rows = self.cursor.fetchmany(self.arraysize)
+            if not rows:
+                return
+            self.rows_read += len(rows)
+            yield rows
+
+    def __iter__(self):
+        for rows in self.batches():
+            yield from rows
+
+    def columns(self):
+        """
+        Generator function that fetches the rows as columnar chunks
+
+        Yields:
+            dict: Column name -> array.array or tuple of the chunk's values
+        """
+        names = self.names
+        for rows in self.batches():
+            yield {name: pack_column(values)
+                   for name, values in zip(names, zip(*rows))}
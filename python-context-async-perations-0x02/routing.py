@@ -0,0 +1,343 @@
+#!/usr/bin/python3
+"""
+Module that routes statements between a primary database and replicas
+
+DatabaseConnection and ExecuteQuery send every statement to the primary
+unless replicas are configured for it:
+
+    configure_replicas('users.db', ['replica-1.db', 'replica-2.db'])
+
+Then each statement is classified with `is_write()`:
+
+- writes (and anything not known to be a read, e.g. PRAGMA or BEGIN)
+  run on the primary
+- reads run on the replica with the fewest open readers, ties going to
+  the one picked least recently; a replica that cannot be opened is
+  skipped and the read falls back to the primary
+- once a context has written, its later reads stick to the primary so
+  they see the write; the same holds for `sticky_window` seconds in the
+  thread or task that wrote, which covers a read in the ExecuteQuery
+  that follows a write
+
+Replicas are opened read-only. Keeping them in sync with the primary
+(file copies, sqlite3 backup, Litestream...) is not done here.
+"""
+import contextvars
+import itertools
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# Comments, string literals and quoted identifiers, blanked before
+# looking for keywords
+IGNORED = re.compile(r"--[^\n]*|/\*.*?(?:\*/|$)|'(?:[^']|'')*'?"
+                     r"|\"(?:[^\"]|\"\")*\"?|`[^`]*`?|\[[^\]]*\]?", re.S)
+
+WORDS = re.compile(r"[A-Za-z_][\w$]*|[()]")
+
+# Statements a replica can answer
+READ_VERBS = {"select", "values"}
+
+# Verbs that end the common table expressions of a WITH clause
+VERBS = READ_VERBS | {"insert", "replace", "update", "delete"}
+
+# Monotonic time of the last write of the current thread or task
+last_write = contextvars.ContextVar("last_write", default=None)
+
+
+def is_write(query):
+    """
+    Tells whether a statement has to run on the primary
+
+    Args:
+        query (str): SQL statement
+
+    Returns:
+        bool: False for SELECT and VALUES statements, with or without a
+            WITH clause, True for everything else
+
+    >>> is_write("WITH r AS (SELECT 1) DELETE FROM users WHERE id IN r")
+    True
+    >>> is_write("/* report */ select * from users where name = 'update'")
+    False
+    """
+    depth = 0
+    with_clause = False
+    for word in WORDS.findall(IGNORED.sub(" ", query)):
+        if word == "(":
+            depth += 1
+        elif word == ")":
+            depth -= 1
+        elif depth == 0:
+            word = word.lower()
+            if word == "with" and not with_clause:
+                with_clause = True
+            elif not with_clause or word in VERBS:
+                return word not in READ_VERBS
+    return True
+
+
+class Replica:
+    """A read-only copy of the primary and its current readers"""
+
+    def __init__(self, path):
+        self.path = path
+        self.readers = 0
+        self.picked = 0
+
+    def connect(self):
+        """Opens a read-only connection to the replica"""
+        uri = Path(self.path).resolve().as_uri() + "?mode=ro"
+        return sqlite3.connect(uri, uri=True)
+
+
+class Router:
+    """Picks the database each statement of a primary runs on"""
+
+    def __init__(self, primary, replicas=(), sticky_window=1.0):
+        """
+        Args:
+            primary (str): Database file taking the writes
+            replicas (list): Database files answering the reads
+            sticky_window (float): Seconds the reads of a thread or task
+                stay on the primary after it wrote
+        """
+        self.primary = primary
+        self.replicas = [Replica(path) for path in replicas]
+        self.sticky_window = sticky_window
+        self.lock = threading.Lock()
+        self.picks = itertools.count(1)
+
+    def wrote(self):
+        """Records a write of the current thread or task"""
+        last_write.set(time.monotonic())
+
+    def recently_wrote(self):
+        """Tells whether reads must stay on the primary to see a write"""
+        written = last_write.get()
+        return written is not None \
+            and time.monotonic() - written < self.sticky_window
+
+    def acquire_replica(self, excluded=()):
+        """
+        Picks the least loaded replica and counts a reader on it
+
+        Args:
+            excluded: Replicas not to pick
+
+        Returns:
+            Replica: None when no replica is left
+        """
+        with self.lock:
+            candidates = [replica for replica in self.replicas
+                          if replica not in excluded]
+            if not candidates:
+                return None
+            replica = min(candidates, key=lambda r: (r.readers, r.picked))
+            replica.readers += 1
+            replica.picked = next(self.picks)
+            return replica
+
+    def release_replica(self, replica):
+        """Counts a reader off a replica"""
+        with self.lock:
+            replica.readers -= 1
+
+    def open_reader(self):
+        """
+        Opens a connection to the least loaded replica that works
+
+        Returns:
+            tuple: (Replica, connection), or (None, None) when reads
+                have to go to the primary
+        """
+        failed = []
+        while True:
+            replica = self.acquire_replica(failed)
+            if replica is None:
+                return None, None
+            try:
+                return replica, replica.connect()
+            except sqlite3.Error:
+                self.release_replica(replica)
+                failed.append(replica)
+
+    def stats(self):
+        """Returns the current readers of each replica"""
+        with self.lock:
+            return {replica.path: replica.readers
+                    for replica in self.replicas}
+
+
+class RoutingCursor:
+    """Cursor running each statement on the primary or a replica"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = None
+        self.arraysize = 1
+
+    def on(self, target):
+        """Returns an underlying cursor of the target connection"""
+        if self.cursor is not None and self.cursor.connection is not target:
+            self.cursor.close()
+            self.cursor = None
+        if self.cursor is None:
+            self.cursor = target.cursor()
+        self.cursor.arraysize = self.arraysize
+        return self.cursor
+
+    def execute(self, sql, parameters=()):
+        """Runs a statement where it belongs"""
+        self.on(self.connection.route(sql)).execute(sql, parameters)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        """Runs a statement once per set of parameters"""
+        self.on(self.connection.route(sql)).executemany(sql,
+                                                        seq_of_parameters)
+        return self
+
+    def fetchmany(self, size=None):
+        """Fetches the next arraysize rows, or size rows"""
+        if self.cursor is None:
+            raise sqlite3.ProgrammingError("no statement executed")
+        return self.cursor.fetchmany(
+            self.arraysize if size is None else size)
+
+    def __getattr__(self, name):
+        # fetchone, fetchmany, fetchall, description, rowcount...
+        if self.cursor is None:
+            raise sqlite3.ProgrammingError("no statement executed")
+        return getattr(self.cursor, name)
+
+    def __iter__(self):
+        return iter(self.cursor or ())
+
+    def close(self):
+        """Closes the underlying cursor"""
+        if self.cursor is not None:
+            self.cursor.close()
+
+
+class RoutingConnection:
+    """
+    Connection-like object over a primary and, lazily, one replica
+
+    The primary is only opened by the first statement that needs it and
+    is the only connection committed or rolled back; the replica
+    connection is read-only.
+    """
+
+    def __init__(self, router):
+        self.router = router
+        self.writer = None
+        self.replica = None
+        self.reader = None
+        self.has_written = False
+
+    @property
+    def primary(self):
+        """Connection to the primary, opened on first use"""
+        if self.writer is None:
+            self.writer = sqlite3.connect(self.router.primary)
+        return self.writer
+
+    def wrote(self):
+        """Pins the context's reads to the primary after a write"""
+        self.has_written = True
+        self.router.wrote()
+
+    def route(self, sql):
+        """
+        Returns the connection a statement has to run on
+
+        Args:
+            sql (str): SQL statement
+
+        Returns:
+            sqlite3.Connection: The primary or the context's replica
+        """
+        if is_write(sql):
+            self.wrote()
+            return self.primary
+        if self.has_written or self.router.recently_wrote():
+            return self.primary
+        if self.reader is None:
+            self.replica, self.reader = self.router.open_reader()
+            if self.reader is None:
+                # No replica available: read from the primary from now on
+                self.has_written = True
+                return self.primary
+        return self.reader
+
+    def cursor(self):
+        """Returns a routing cursor"""
+        return RoutingCursor(self)
+
+    def execute(self, sql, parameters=()):
+        """Runs a statement on a new routing cursor"""
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        """Runs a statement many times on a new routing cursor"""
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        """Commits the primary"""
+        if self.writer is not None:
+            self.writer.commit()
+
+    def rollback(self):
+        """Rolls the primary back"""
+        if self.writer is not None:
+            self.writer.rollback()
+
+    def close(self):
+        """Closes the primary and gives the replica back to the router"""
+        if self.reader is not None:
+            self.reader.close()
+            self.router.release_replica(self.replica)
+            self.reader = self.replica = None
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+_routers = {}
+_routers_lock = threading.Lock()
+
+
+def configure_replicas(primary, replicas, **options):
+    """
+    Sets the replicas reads of a primary database are sent to
+
+    Args:
+        primary (str): Database file taking the writes
+        replicas (list): Database files answering the reads; empty to
+            send everything to the primary again
+        options: Router arguments
+
+    Returns:
+        Router
+    """
+    with _routers_lock:
+        router = _routers[primary] = Router(primary, replicas, **options)
+        return router
+
+
+def get_router(primary):
+    """
+    Returns the router of a primary database
+
+    Returns:
+        Router: Configured by configure_replicas(), or one without
+            replicas
+    """
+    with _routers_lock:
+        router = _routers.get(primary)
+        if router is None:
+            router = _routers[primary] = Router(primary)
+        return router
@@ -1,42 +1,86 @@
-import sqlite3
+import sys
+import time
 import functools
-from datetime import datetime
+import inspect
+
+from connection_pool import get_pool
+from instrumentation import shared_instrumentation
 
 #### decorator to log SQL queries
 
-def log_queries(func):
-    """Decorator that logs SQL queries before executing them"""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
+def log_queries(func, instrumentation=shared_instrumentation):
+    """Decorator that records SQL queries with their duration, row count and caller
+
+    Records go to a ring buffer flushed by a background thread, see
+    instrumentation.py; nothing is formatted or printed on the calling thread.
+    """
+    def query_of(args, kwargs):
         # Extract the query from function arguments
         # Assuming the first argument or 'query' keyword argument contains the SQL
-        query = None
         
         # Check if query is passed as positional argument
         if args:
-            query = args[0]
+            return args[0]
         # Check if query is passed as keyword argument
-        elif 'query' in kwargs:
-            query = kwargs['query']
+        return kwargs.get('query')
+    
+    def record(query, start, result, error, frame):
+        # Row count of list results, and where the call came from
+        rowcount = len(result) if isinstance(result, (list, tuple)) else None
+        caller = (frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name)
+        instrumentation.record(query, time.perf_counter() - start, rowcount,
+                               caller, error)
+    
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            query = query_of(args, kwargs)
+            if not query or not instrumentation.sampled(query):
+                return await func(*args, **kwargs)
+            frame = sys._getframe(1)
+            start = time.perf_counter()
+            try:
+                # Await the original coroutine function
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                record(query, start, None, type(e).__name__, frame)
+                raise
+            record(query, start, result, None, frame)
+            return result
         
-        # Log the query with timestamp
-        if query:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            print(f"[{timestamp}] Executing SQL Query: {query}")
+        return async_wrapper
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Skip the calls left out by sampling
+        query = query_of(args, kwargs)
+        if not query or not instrumentation.sampled(query):
+            return func(*args, **kwargs)
         
-        # Execute the original function
-        return func(*args, **kwargs)
+        frame = sys._getframe(1)
+        start = time.perf_counter()
+        try:
+            # Execute the original function
+            result = func(*args, **kwargs)
+        except Exception as e:
+            record(query, start, None, type(e).__name__, frame)
+            raise
+        record(query, start, result, None, frame)
+        return result
     
     return wrapper
 
 @log_queries
 def fetch_all_users(query):
-    conn = sqlite3.connect('users.db')
-    cursor = conn.cursor()
-    cursor.execute(query)
-    results = cursor.fetchall()
-    conn.close()
-    return results
+    # Reuse a warm pooled connection rather than opening a new one
+    with get_pool('users.db').connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query)
+        return cursor.fetchall()
 
 #### fetch users while logging the query
-users = fetch_all_users(query="SELECT * FROM users")
\ No newline at end of file
+users = fetch_all_users(query="SELECT * FROM users")
+
+#### flush the records and report latency percentiles per query fingerprint
+shared_instrumentation.flush()
+print(shared_instrumentation.percentiles())
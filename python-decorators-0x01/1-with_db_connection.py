@@ -1,20 +1,26 @@
-import sqlite3 
 import functools
+import inspect
+
+from connection_pool import get_async_pool, get_pool
 
 def with_db_connection(func):
     """Decorator that automatically handles database connections"""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            # Borrow an aiosqlite connection from the event loop's pool
+            async with get_async_pool('users.db').connection() as conn:
+                return await func(conn, *args, **kwargs)
+        
+        return async_wrapper
+    
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Open database connection
-        conn = sqlite3.connect('users.db')
-        
-        try:
+        # Borrow a warm connection from the pool instead of opening one
+        with get_pool('users.db').connection() as conn:
             # Call the original function with connection as first argument
-            result = func(conn, *args, **kwargs)
-            return result
-        finally:
-            # Always close the connection, even if an exception occurs
-            conn.close()
+            # The connection goes back to the pool even if an exception occurs
+            return func(conn, *args, **kwargs)
     
     return wrapper
 
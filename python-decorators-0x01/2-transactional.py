@@ -1,27 +1,60 @@
-import sqlite3 
 import functools
+import inspect
+
+from connection_pool import get_async_pool, get_pool
+from group_commit import group_committed
+from query_cache import shared_cache
+from sql_tables import statement_tables
 
 def with_db_connection(func):
     """Decorator that automatically handles database connections"""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            # Borrow an aiosqlite connection from the event loop's pool
+            async with get_async_pool('users.db').connection() as conn:
+                return await func(conn, *args, **kwargs)
+        
+        return async_wrapper
+    
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Open database connection
-        conn = sqlite3.connect('users.db')
-        
-        try:
+        # Borrow a warm connection from the pool instead of opening one
+        with get_pool('users.db').connection() as conn:
             # Call the original function with connection as first argument
-            result = func(conn, *args, **kwargs)
-            return result
-        finally:
-            # Always close the connection, even if an exception occurs
-            conn.close()
+            # The connection goes back to the pool even if an exception occurs
+            return func(conn, *args, **kwargs)
     
     return wrapper
 
 def transactional(func):
     """Decorator that manages database transactions"""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(conn, *args, **kwargs):
+            # Same as below over an aiosqlite connection
+            written = set()
+            await conn.set_trace_callback(lambda sql: written.update(statement_tables(sql)[1]))
+            try:
+                await conn.execute("BEGIN")
+                result = await func(conn, *args, **kwargs)
+                await conn.commit()
+                shared_cache.invalidate(written)
+                return result
+            except BaseException:
+                # Also roll back when the task is cancelled
+                await conn.rollback()
+                raise
+            finally:
+                await conn.set_trace_callback(None)
+        
+        return async_wrapper
+    
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        # Record the tables written by the statements of the transaction
+        written = set()
+        conn.set_trace_callback(lambda sql: written.update(statement_tables(sql)[1]))
         try:
             # Start transaction (SQLite is in autocommit mode by default)
             # Begin transaction by executing a statement
@@ -32,6 +65,10 @@ def transactional(func):
             
             # If successful, commit the transaction
             conn.commit()
+            
+            # Start a new generation of the written tables, so cached
+            # results read from them are no longer served
+            shared_cache.invalidate(written)
             return result
             
         except Exception as e:
@@ -39,6 +76,9 @@ def transactional(func):
             conn.rollback()
             # Re-raise the exception to preserve the original error
             raise e
+        finally:
+            # The connection goes back to the pool, stop tracing it
+            conn.set_trace_callback(None)
     
     return wrapper
 
@@ -48,5 +88,11 @@ def update_user_email(conn, user_id, new_email):
     cursor = conn.cursor() 
     cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id)) 
 
+@group_committed
+def update_user_email_batched(conn, user_id, new_email):
+    # Committed together with the writes other threads submit meanwhile
+    cursor = conn.cursor()
+    cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
+
 #### Update user's email with automatic transaction handling 
 update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
\ No newline at end of file
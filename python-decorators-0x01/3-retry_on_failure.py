@@ -1,51 +1,125 @@
 import time
-import sqlite3 
+import asyncio
 import functools
+import inspect
+import itertools
+
+from connection_pool import get_async_pool, get_pool
+from resilience import CircuitOpenError, RetryPolicy
 
 def with_db_connection(func):
     """Decorator that automatically handles database connections"""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            # Borrow an aiosqlite connection from the event loop's pool
+            async with get_async_pool('users.db').connection() as conn:
+                return await func(conn, *args, **kwargs)
+        
+        return async_wrapper
+    
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Open database connection
-        conn = sqlite3.connect('users.db')
-        
-        try:
+        # Borrow a warm connection from the pool instead of opening one
+        with get_pool('users.db').connection() as conn:
             # Call the original function with connection as first argument
-            result = func(conn, *args, **kwargs)
-            return result
-        finally:
-            # Always close the connection, even if an exception occurs
-            conn.close()
+            # The connection goes back to the pool even if an exception occurs
+            return func(conn, *args, **kwargs)
     
     return wrapper
 
-def retry_on_failure(retries=3, delay=2):
-    """Decorator that retries a function on failure"""
+def retry_on_failure(retries=3, delay=2, max_delay=None, policy=None):
+    """Decorator that retries a function on transient failures with backoff
+
+    Only errors resilience.is_retryable classifies as transient (such as
+    "database is locked") are retried, after exponentially growing,
+    jittered delays starting at `delay` seconds and capped at `max_delay`
+    (10 times `delay` by default). Retries draw on a process-wide budget
+    and a shared circuit breaker fails calls fast while the database is
+    down. Pass a resilience.RetryPolicy as `policy` to tune all of it.
+    """
     def decorator(func):
+        retry = policy or RetryPolicy(
+            retries, base_delay=delay,
+            max_delay=delay * 10 if max_delay is None else max_delay)
+        
+        def report(e, attempt, wait, reason):
+            # Log the outcome of a failed attempt, and why we gave up
+            if wait is None:
+                attempts = "attempt" if attempt == 0 else "attempts"
+                print(f"Function {func.__name__} failed after {attempt + 1} "
+                      f"{attempts} ({reason}): {str(e)}")
+                return
+            print(f"Attempt {attempt + 1} failed for {func.__name__}: {str(e)}")
+            print(f"Retrying in {wait:.2f} seconds...")
+        
+        def next_wait(e, attempt, wait):
+            # Delay before the next attempt, None to give up on e
+            try:
+                wait, reason = retry.backoff(e, attempt, wait)
+            except CircuitOpenError:
+                report(e, attempt, None, "circuit open")
+                raise
+            report(e, attempt, wait, reason)
+            return wait
+        
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                wait = retry.start()
+                try:
+                    for attempt in itertools.count():
+                        try:
+                            result = await func(*args, **kwargs)
+                        except Exception as e:
+                            wait = next_wait(e, attempt, wait)
+                            if wait is None:
+                                raise
+                            # Sleep without blocking the event loop
+                            await asyncio.sleep(wait)
+                        else:
+                            retry.succeeded()
+                            return result
+                except Exception:
+                    raise
+                except BaseException:
+                    # Cancelled: free the breaker's half-open trial
+                    retry.breaker.release()
+                    raise
+            
+            return async_wrapper
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            last_exception = None
+            # Fail fast with CircuitOpenError while the database is down
+            wait = retry.start()
             
-            for attempt in range(retries + 1):  # retries + 1 to include the initial attempt
-                try:
-                    # Attempt to execute the function
-                    return func(*args, **kwargs)
-                    
-                except Exception as e:
-                    last_exception = e
+            try:
+                for attempt in itertools.count():
+                    try:
+                        # Attempt to execute the function
+                        result = func(*args, **kwargs)
+                        
+                    except Exception as e:
+                        # Give up on errors that are not transient, once the retries
+                        # or the retry budget run out, or if the circuit opened
+                        wait = next_wait(e, attempt, wait)
+                        if wait is None:
+                            raise
+                        
+                        # Otherwise wait a jittered, growing delay before retrying
+                        time.sleep(wait)
                     
-                    # If this was the last attempt, re-raise the exception
-                    if attempt == retries:
-                        print(f"Function {func.__name__} failed after {retries + 1} attempts")
-                        raise last_exception
-                    
-                    # Otherwise, log the failure and wait before retrying
-                    print(f"Attempt {attempt + 1} failed for {func.__name__}: {str(e)}")
-                    print(f"Retrying in {delay} seconds...")
-                    time.sleep(delay)
-            
-            # This should never be reached, but included for safety
-            raise last_exception
+                    else:
+                        retry.succeeded()
+                        return result
+            except Exception:
+                raise
+            except BaseException:
+                # KeyboardInterrupt, SystemExit...: neither a success nor a
+                # transient failure, but the half-open trial must end
+                retry.breaker.release()
+                raise
         
         return wrapper
     return decorator
@@ -1,58 +1,110 @@
 import time
 import sqlite3 
 import functools
+import inspect
+
+from connection_pool import get_async_pool, get_pool
+from query_cache import MISSING, make_key, shared_async_flights, shared_cache, \
+    shared_flights
+from sql_tables import statement_tables
 
 def with_db_connection(func):
     """Decorator that automatically handles database connections"""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            # Borrow an aiosqlite connection from the event loop's pool
+            async with get_async_pool('users.db').connection() as conn:
+                return await func(conn, *args, **kwargs)
+        
+        return async_wrapper
+    
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Open database connection
-        conn = sqlite3.connect('users.db')
-        
-        try:
+        # Borrow a warm connection from the pool instead of opening one
+        with get_pool('users.db').connection() as conn:
             # Call the original function with connection as first argument
-            result = func(conn, *args, **kwargs)
-            return result
-        finally:
-            # Always close the connection, even if an exception occurs
-            conn.close()
+            # The connection goes back to the pool even if an exception occurs
+            return func(conn, *args, **kwargs)
     
     return wrapper
 
-query_cache = {}
+# Bounded LRU/TTL cache shared with transactional, see query_cache.py
+query_cache = shared_cache
+
+def query_arguments(args, kwargs):
+    """Extracts the query and its parameters from function arguments"""
+    query = None
+    params = kwargs.get('params')
+    
+    # Check if query is passed as positional argument (after conn)
+    if len(args) > 1:
+        query = args[1]  # First arg is conn, second is typically query
+        if len(args) > 2:
+            params = args[2]
+    # Check if query is passed as keyword argument
+    elif 'query' in kwargs:
+        query = kwargs['query']
+    return query, params
 
 def cache_query(func):
-    """Decorator that caches query results based on SQL query string"""
+    """Decorator that caches query results based on SQL query and parameters"""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            # Same as below, coalescing misses within the event loop
+            query, params = query_arguments(args, kwargs)
+            if not query:
+                return await func(*args, **kwargs)
+            
+            cache_key = make_key(query, params)
+            result = query_cache.get(cache_key, MISSING)
+            if result is not MISSING:
+                print(f"Cache hit for query: {query}")
+                return result
+            
+            async def load():
+                print(f"Cache miss for query: {query}")
+                snapshot = query_cache.snapshot(statement_tables(query)[0])
+                result = await func(*args, **kwargs)
+                query_cache.put(cache_key, result, snapshot)
+                print(f"Result cached for query: {query}")
+                return result
+            
+            return await shared_async_flights.do(cache_key, load)
+        
+        return async_wrapper
+    
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         # Extract the query from function arguments
-        query = None
-        
-        # Check if query is passed as positional argument (after conn)
-        if len(args) > 1:
-            query = args[1]  # First arg is conn, second is typically query
-        # Check if query is passed as keyword argument
-        elif 'query' in kwargs:
-            query = kwargs['query']
+        query, params = query_arguments(args, kwargs)
         
         # If we found a query, check cache
         if query:
-            # Use the query string as cache key
-            cache_key = query.strip().lower()  # Normalize the query for consistent caching
+            # Key on the normalized query plus its bound parameters
+            cache_key = make_key(query, params)
             
-            # Check if result is already cached
-            if cache_key in query_cache:
+            # Check if result is already cached (and neither expired nor invalidated)
+            result = query_cache.get(cache_key, MISSING)
+            if result is not MISSING:
                 print(f"Cache hit for query: {query}")
-                return query_cache[cache_key]
+                return result
             
-            # Execute the function if not cached
-            print(f"Cache miss for query: {query}")
-            result = func(*args, **kwargs)
+            # Execute the function if not cached, noting beforehand the
+            # generation of the tables it reads
+            def load():
+                print(f"Cache miss for query: {query}")
+                snapshot = query_cache.snapshot(statement_tables(query)[0])
+                result = func(*args, **kwargs)
+                
+                # Store result in cache, valid until one of those tables is written
+                query_cache.put(cache_key, result, snapshot)
+                print(f"Result cached for query: {query}")
+                return result
             
-            # Store result in cache
-            query_cache[cache_key] = result
-            print(f"Result cached for query: {query}")
-            return result
+            # Concurrent misses on the same key share a single execution
+            return shared_flights.do(cache_key, load)
         
         # If no query found, execute without caching
         return func(*args, **kwargs)
@@ -61,9 +113,9 @@ def cache_query(func):
 
 @with_db_connection
 @cache_query
-def fetch_users_with_cache(conn, query):
+def fetch_users_with_cache(conn, query, params=()):
     cursor = conn.cursor()
-    cursor.execute(query)
+    cursor.execute(query, params)
     return cursor.fetchall()
 
 #### First call will cache the result
@@ -0,0 +1,105 @@
+#!/usr/bin/python3
+"""
+Benchmark showing concurrent cache misses collapsing to one query
+
+Starts N threads at once on the same cold, slow cached query, first with
+plain get/run/put caching, where every thread misses and runs the query
+(a thundering herd), then with the misses coalesced through SingleFlight,
+where one thread runs it and the others share its result. Prints the
+number of database executions and the wall time of each.
+
+Usage:
+    ./bench_coalescing.py [--rows N] [--threads N]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from connection_pool import ConnectionPool
+from query_cache import MISSING, QueryCache, SingleFlight, make_key
+from sql_tables import statement_tables
+
+# Self-join slow enough for the threads to overlap
+QUERY = ("SELECT a.age, COUNT(*) FROM users a JOIN users b "
+         "ON a.age = b.age AND a.id < b.id GROUP BY a.age")
+
+
+def build_users(path, rows):
+    """Creates a users table filled with fake users in a database file"""
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                       "name TEXT NOT NULL, age INTEGER NOT NULL)")
+    connection.executemany("INSERT INTO users VALUES (?, ?, ?)",
+                           ((i, f"User {i}", 18 + i % 60)
+                            for i in range(1, rows + 1)))
+    connection.commit()
+    connection.close()
+
+
+def run_herd(pool, threads, flights):
+    """
+    Runs the cold query from many threads released at the same moment
+
+    Args:
+        pool (ConnectionPool): Connections to run the query on
+        threads (int): Number of concurrent callers
+        flights (SingleFlight): Coalesces the misses, or None
+
+    Returns:
+        tuple: (database executions, seconds)
+    """
+    cache = QueryCache()
+    key = make_key(QUERY)
+    executions = []
+    barrier = threading.Barrier(threads)
+
+    def load():
+        snapshot = cache.snapshot(statement_tables(QUERY)[0])
+        with pool.connection() as conn:
+            executions.append(1)
+            result = conn.execute(QUERY).fetchall()
+        cache.put(key, result, snapshot)
+        return result
+
+    def caller():
+        barrier.wait()
+        if cache.get(key, MISSING) is MISSING:
+            if flights:
+                flights.do(key, load)
+            else:
+                load()
+
+    workers = [threading.Thread(target=caller) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    return len(executions), elapsed
+
+
+def main():
+    """Runs the herd with and without coalescing and prints the counts"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=3000)
+    parser.add_argument("--threads", type=int, default=32)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "users.db")
+        build_users(path, args.rows)
+        pool = ConnectionPool(path, max_size=args.threads)
+
+        print(f"{'mode':<12} {'callers':>8} {'db calls':>9} {'seconds':>9}")
+        for name, flights in (("herd", None), ("coalesced", SingleFlight())):
+            calls, elapsed = run_herd(pool, args.threads, flights)
+            print(f"{name:<12} {args.threads:>8} {calls:>9} {elapsed:>9.3f}")
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+"""
+Benchmark of group commit against a transaction per write
+
+Many threads update user emails, first each in its own transaction on a
+pooled connection (one commit per write), then through a
+GroupCommitWriter at several batch windows. Prints writes per second
+and the mean number of writes committed together.
+
+Usage:
+    ./bench_group_commit.py [--rows N] [--threads N] [--writes N]
+        [--synchronous full|normal|off] [--dir PATH]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from connection_pool import ConnectionPool
+from group_commit import GroupCommitWriter
+
+
+def build_users(path, rows):
+    """Creates a users table filled with fake users in a database file"""
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                       "name TEXT NOT NULL, email TEXT NOT NULL)")
+    connection.executemany("INSERT INTO users VALUES (?, ?, ?)",
+                           ((i, f"User {i}", f"user{i}@example.com")
+                            for i in range(1, rows + 1)))
+    connection.commit()
+    connection.close()
+
+
+def set_email(conn, user_id, new_email):
+    """The write: update_user_email without its decorators"""
+    conn.execute("UPDATE users SET email = ? WHERE id = ?",
+                 (new_email, user_id))
+
+
+def run_threads(threads, writes, write):
+    """Runs write(user_id, email) from many threads, returns writes/s"""
+    def work(offset):
+        for i in range(writes // threads):
+            user_id = 1 + (offset * 7919 + i) % 1000
+            write(user_id, f"user{user_id}.{i}@example.com")
+
+    workers = [threading.Thread(target=work, args=(n,))
+               for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return writes // threads * threads / (time.perf_counter() - start)
+
+
+def main():
+    """Runs both strategies and prints their throughput"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--writes", type=int, default=4000)
+    parser.add_argument("--synchronous", default="full",
+                        choices=("full", "normal", "off"))
+    parser.add_argument("--dir", default=None,
+                        help="directory of the database file (use a real "
+                             "disk, /tmp may be in memory)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        path = os.path.join(directory, "users.db")
+        build_users(path, args.rows)
+
+        def connect():
+            connection = sqlite3.connect(path, timeout=60,
+                                         check_same_thread=False)
+            connection.execute(f"PRAGMA synchronous = {args.synchronous}")
+            return connection
+
+        pool = ConnectionPool(path, max_size=args.threads, connect=connect)
+
+        def transactional_write(user_id, new_email):
+            with pool.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                set_email(conn, user_id, new_email)
+                conn.commit()
+
+        print(f"{'strategy':<22} {'writes/s':>10} {'mean batch':>11}")
+        rate = run_threads(args.threads, args.writes, transactional_write)
+        print(f"{'transaction per write':<22} {rate:>10,.0f} {1:>11.1f}")
+        pool.close()
+
+        for window in (0, 0.001, 0.005, 0.02):
+            writer = GroupCommitWriter(path, window=window, connect=connect)
+            rate = run_threads(args.threads, args.writes,
+                               lambda *write: writer.write(set_email, *write))
+            writer.close()
+            mean = writer.stats()["mean_batch"]
+            label = f"group, {window * 1000:g} ms window"
+            print(f"{label:<22} {rate:>10,.0f} {mean:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+"""
+Benchmark of the per-call overhead of query logging
+
+Runs an indexed user lookup bare, wrapped with the original print-based
+log_queries (printing to /dev/null), and recorded by QueryInstrumentation
+at several sample rates, then prints microseconds per call and the
+latency percentiles collected for the lookup.
+
+Usage:
+    ./bench_instrumentation.py [--rows N] [--calls N]
+"""
+import argparse
+import contextlib
+import functools
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from instrumentation import QueryInstrumentation
+
+QUERY = "SELECT * FROM users WHERE id = ?"
+
+
+def print_logged(func):
+    """The original log_queries: formats and prints every query"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        query = args[0] if args else kwargs.get('query')
+        if query:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            print(f"[{timestamp}] Executing SQL Query: {query}")
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def instrumented(instrumentation):
+    """Returns a decorator recording calls like log_queries does"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(query, *args):
+            if not instrumentation.sampled(query):
+                return func(query, *args)
+            frame = sys._getframe(1)
+            start = time.perf_counter()
+            result = func(query, *args)
+            instrumentation.record(
+                query, time.perf_counter() - start, len(result),
+                (frame.f_code.co_filename, frame.f_lineno,
+                 frame.f_code.co_name))
+            return result
+        return wrapper
+    return decorator
+
+
+def time_calls(function, calls, rows):
+    """Returns the mean microseconds per call of function(QUERY, (id,))"""
+    start = time.perf_counter()
+    for i in range(calls):
+        function(QUERY, (1 + i % rows,))
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    """Runs the lookup under each kind of logging and prints the cost"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--calls", type=int, default=100000)
+    args = parser.parse_args()
+
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                       "name TEXT NOT NULL, age INTEGER NOT NULL)")
+    connection.executemany("INSERT INTO users VALUES (?, ?, ?)",
+                           ((i, f"User {i}", 18 + i % 60)
+                            for i in range(1, args.rows + 1)))
+
+    def lookup(query, params):
+        return connection.execute(query, params).fetchall()
+
+    setups = [("bare", lookup, None), ("print", print_logged(lookup), None)]
+    recorders = {}
+    for rate in (1.0, 0.1):
+        recorders[rate] = QueryInstrumentation(capacity=args.calls,
+                                               sample_rate=rate, sink=None)
+        setups.append((f"record {rate:g}",
+                       instrumented(recorders[rate])(lookup),
+                       recorders[rate]))
+
+    print(f"{'setup':<12} {'us/call':>9}")
+    with open(os.devnull, "w") as devnull:
+        for name, function, recorder in setups:
+            with contextlib.redirect_stdout(devnull):
+                cost = time_calls(function, args.calls, args.rows)
+            print(f"{name:<12} {cost:>9.2f}")
+            if recorder:
+                # Finish flushing so it does not slow down the next run
+                recorder.stop()
+
+    recorder = recorders[1.0]
+    for shape, stats in recorder.percentiles().items():
+        print(f"{shape}: " + ", ".join(f"{label} {value:.3f}"
+                                       for label, value in stats.items()
+                                       if label != "count")
+              + f" ms over {stats['count']} calls"
+              + f" ({recorder.dropped} dropped)")
+
+
+if __name__ == "__main__":
+    main()
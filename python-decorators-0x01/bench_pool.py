@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+"""
+Benchmark comparing connect-per-call with pooled connections
+
+Runs a get_user_by_id lookup decorated once with the original
+connect/close wrapper and once with a ConnectionPool, from one and from
+several threads, and prints calls per second for each.
+
+Usage:
+    ./bench_pool.py [--rows N] [--calls N] [--threads N]
+"""
+import argparse
+import functools
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from connection_pool import ConnectionPool
+
+
+def build_users(path, rows):
+    """Creates a users table filled with fake users in a database file"""
+    connection = sqlite3.connect(path)
+    connection.execute("""
+        CREATE TABLE users (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            age INTEGER NOT NULL
+        )
+    """)
+    connection.executemany(
+        "INSERT INTO users VALUES (?, ?, ?, ?)",
+        ((i, f"User {i}", f"user{i}@example.com", 18 + i % 60)
+         for i in range(1, rows + 1))
+    )
+    connection.commit()
+    connection.close()
+
+
+def connect_per_call(path):
+    """Returns the original decorator, opening a connection per call"""
+    def with_db_connection(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            conn = sqlite3.connect(path)
+            try:
+                return func(conn, *args, **kwargs)
+            finally:
+                conn.close()
+        return wrapper
+    return with_db_connection
+
+
+def pooled(pool):
+    """Returns a decorator borrowing connections from a pool"""
+    def with_db_connection(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with pool.connection() as conn:
+                return func(conn, *args, **kwargs)
+        return wrapper
+    return with_db_connection
+
+
+def lookup(conn, user_id):
+    """get_user_by_id, undecorated"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    return cursor.fetchone()
+
+
+def calls_per_second(function, calls, threads, rows):
+    """Runs `calls` lookups spread over threads, returns calls per second"""
+    def work(offset):
+        for i in range(calls // threads):
+            function(user_id=1 + (offset + i * 7919) % rows)
+
+    workers = [threading.Thread(target=work, args=(n,))
+               for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return calls // threads * threads / (time.perf_counter() - start)
+
+
+def main():
+    """Runs the benchmark and prints calls per second for each setup"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "users.db")
+        build_users(path, args.rows)
+        pool = ConnectionPool(path, min_size=1, max_size=args.threads)
+
+        print(f"{'setup':<12} {'threads':>8} {'calls/s':>12}")
+        for threads in sorted({1, args.threads}):
+            for name, decorator in (("connect", connect_per_call(path)),
+                                    ("pool", pooled(pool))):
+                rate = calls_per_second(decorator(lookup), args.calls,
+                                        threads, args.rows)
+                print(f"{name:<12} {threads:>8} {rate:>12,.0f}")
+        print(f"pool stats: {pool.stats()}")
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+"""
+Benchmark of the parse and plan savings of the statement cache
+
+Runs repeated parameterized lookups (get_user_by_id, and a more complex
+filtered, sorted query) with a connection per call, with pooled
+connections that prepare every statement again (statement cache size
+0), and with pooled connections keeping their prepared statements.
+Prints microseconds per call and the statement cache hit rate.
+
+Usage:
+    ./bench_statements.py [--rows N] [--calls N]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from connection_pool import ConnectionPool
+
+QUERIES = {
+    "get_user_by_id": ("SELECT * FROM users WHERE id = ?",
+                       lambda i: (i,)),
+    "filtered": ("SELECT u.id, u.name, u.email FROM users AS u "
+                 "WHERE u.id BETWEEN ? AND ? AND u.age >= ? "
+                 "AND u.email LIKE '%@example.com' "
+                 "ORDER BY u.age DESC, u.name LIMIT 5",
+                 lambda i: (i, i + 10, 20)),
+}
+
+
+def build_users(path, rows):
+    """Creates a users table filled with fake users in a database file"""
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                       "name TEXT NOT NULL, email TEXT NOT NULL, "
+                       "age INTEGER NOT NULL)")
+    connection.executemany("INSERT INTO users VALUES (?, ?, ?, ?)",
+                           ((i, f"User {i}", f"user{i}@example.com",
+                             18 + i % 60) for i in range(1, rows + 1)))
+    connection.commit()
+    connection.close()
+
+
+def per_call(path, query, params, calls, rows):
+    """Mean microseconds of a lookup on a new connection each time"""
+    start = time.perf_counter()
+    for i in range(calls):
+        connection = sqlite3.connect(path)
+        connection.execute(query, params(1 + i % rows)).fetchall()
+        connection.close()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def pooled(pool, query, params, calls, rows):
+    """Mean microseconds of a lookup on a pooled connection"""
+    start = time.perf_counter()
+    for i in range(calls):
+        with pool.connection() as connection:
+            connection.execute(query, params(1 + i % rows)).fetchall()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    """Runs each lookup in each setup and prints the cost per call"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "users.db")
+        build_users(path, args.rows)
+
+        print(f"{'query':<16} {'setup':<18} {'us/call':>9} {'hit rate':>9}")
+        for name, (query, params) in QUERIES.items():
+            cost = per_call(path, query, params, args.calls // 4, args.rows)
+            print(f"{name:<16} {'connect per call':<18} {cost:>9.2f}")
+            for size in (0, 256):
+                pool = ConnectionPool(path, max_size=1,
+                                      statement_cache_size=size)
+                cost = pooled(pool, query, params, args.calls, args.rows)
+                rate = pool.stats()["statement_hit_rate"]
+                print(f"{name:<16} {f'pool, cache {size}':<18} "
+                      f"{cost:>9.2f} {rate:>9.1%}")
+                pool.close()
+
+
+if __name__ == "__main__":
+    main()
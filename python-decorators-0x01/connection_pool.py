@@ -0,0 +1,497 @@
+#!/usr/bin/python3
+"""
+Module that provides a bounded, thread-safe pool of SQLite connections
+
+Opening a connection costs far more than a simple indexed lookup, so
+instead of connecting and closing around every call the decorators
+borrow a warm connection from a pool and hand it back afterwards:
+
+- the pool opens `min_size` connections up front and never holds more
+  than `max_size`; callers wait (up to `timeout` seconds) when all of
+  them are in use
+- connections left idle for longer than `idle_timeout` are closed,
+  down to `min_size`
+- every checkout runs a `SELECT 1` health check first and replaces a
+  connection that fails it
+- a thread gets back the connection it used last when it is idle (per
+  thread affinity), which keeps SQLite's page cache warm for it
+- a connection handed back in the middle of a transaction is rolled
+  back, so no state leaks to the next borrower
+- each connection keeps up to `statement_cache_size` prepared
+  statements, whose hit rate `stats()` reports (see statement_cache.py)
+
+Pools are shared per database file through `get_pool()`.
+
+AsyncConnectionPool is the asyncio counterpart over aiosqlite
+connections, shared per event loop and database file through
+`get_async_pool()`; waiting for a connection never blocks the loop.
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+from statement_cache import (DEFAULT_SIZE, HEALTH_CHECK, StatementStats,
+                             connection_factory)
+
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+
+class ConnectionPool:
+    """Bounded pool of reusable SQLite connections"""
+
+    def __init__(self, database="users.db", min_size=1, max_size=8,
+                 idle_timeout=60.0, timeout=30.0, health_check=True,
+                 affinity=True, statement_cache_size=DEFAULT_SIZE,
+                 connect=None):
+        """
+        Args:
+            database (str): SQLite database file
+            min_size (int): Connections opened up front and kept when idle
+            max_size (int): Maximum number of open connections
+            idle_timeout (float): Seconds after which an idle connection
+                above min_size is closed
+            timeout (float): Seconds to wait for a free connection before
+                raising TimeoutError
+            health_check (bool): Test connections with SELECT 1 on checkout
+            affinity (bool): Hand each thread its previous connection
+                when it is idle
+            statement_cache_size (int): Prepared statements kept per
+                connection
+            connect: Optional callable opening a new connection
+        """
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError("expected 0 <= min_size <= max_size, "
+                             "max_size >= 1")
+        self.database = database
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.health_check = health_check
+        self.affinity = affinity
+        self.statement_cache_size = statement_cache_size
+        self.statements = StatementStats()
+        self.factory = connection_factory(self.statements)
+        self.connect = connect or self.open_sqlite
+        self.lock = threading.Condition()
+        # Idle connections as (connection, owner thread id, release time),
+        # the most recently released last
+        self.idle = []
+        self.size = 0
+        self.closed = False
+        self.counters = {"created": 0, "reused": 0, "evicted": 0,
+                         "discarded": 0, "waits": 0}
+        for _ in range(min_size):
+            self.idle.append((self.open(), None, time.monotonic()))
+            self.size += 1
+
+    def open_sqlite(self):
+        """Opens a SQLite connection that may move between threads"""
+        return sqlite3.connect(self.database, check_same_thread=False,
+                               cached_statements=self.statement_cache_size,
+                               factory=self.factory)
+
+    def open(self):
+        """Opens a new connection and counts it"""
+        connection = self.connect()
+        with self.lock:
+            self.counters["created"] += 1
+        return connection
+
+    def take_idle(self):
+        """Removes and returns the best idle connection (lock held)"""
+        if self.affinity:
+            owner = threading.get_ident()
+            for position in range(len(self.idle) - 1, -1, -1):
+                if self.idle[position][1] == owner:
+                    return self.idle.pop(position)[0]
+        # Otherwise the most recently used one, whose pages are warmest
+        return self.idle.pop()[0] if self.idle else None
+
+    def expired(self, now):
+        """Removes idle connections past idle_timeout (lock held)"""
+        stale = []
+        while (self.idle and self.size > self.min_size
+               and now - self.idle[0][2] > self.idle_timeout):
+            stale.append(self.idle.pop(0)[0])
+            self.size -= 1
+        self.counters["evicted"] += len(stale)
+        return stale
+
+    def healthy(self, connection):
+        """Tells whether a connection still answers a trivial query"""
+        try:
+            connection.execute(HEALTH_CHECK).fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def discard(self, connection):
+        """Closes a broken connection and frees its slot"""
+        try:
+            connection.close()
+        except sqlite3.Error:
+            pass
+        with self.lock:
+            self.size -= 1
+            self.counters["discarded"] += 1
+            self.lock.notify()
+
+    def acquire(self, timeout=None):
+        """
+        Checks a connection out of the pool
+
+        Args:
+            timeout (float): Seconds to wait for a free connection,
+                defaults to the pool's timeout
+
+        Returns:
+            A healthy DB-API connection, to be given back with release()
+
+        Raises:
+            TimeoutError: If no connection became free in time
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            stale = []
+            with self.lock:
+                while True:
+                    if self.closed:
+                        raise RuntimeError("connection pool is closed")
+                    stale += self.expired(time.monotonic())
+                    connection = self.take_idle()
+                    if connection is not None or self.size < self.max_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(
+                            f"no connection to {self.database} became "
+                            f"free within {timeout} seconds")
+                    self.counters["waits"] += 1
+                    self.lock.wait(remaining)
+                if connection is None:
+                    # Reserve the slot before connecting outside the lock
+                    self.size += 1
+                else:
+                    self.counters["reused"] += 1
+            for old in stale:
+                old.close()
+
+            if connection is None:
+                try:
+                    return self.open()
+                except Exception:
+                    with self.lock:
+                        self.size -= 1
+                        self.lock.notify()
+                    raise
+            if not self.health_check or self.healthy(connection):
+                return connection
+            self.discard(connection)
+
+    def release(self, connection):
+        """
+        Gives a connection back to the pool
+
+        An open transaction is rolled back first; a connection that cannot
+        be rolled back is discarded.
+        """
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except sqlite3.Error:
+            self.discard(connection)
+            return
+        with self.lock:
+            if self.closed:
+                self.size -= 1
+                connection.close()
+                return
+            self.idle.append((connection, threading.get_ident(),
+                              time.monotonic()))
+            self.lock.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Context manager that borrows a connection for the with block
+
+        Yields:
+            A pooled DB-API connection
+        """
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def stats(self):
+        """Returns the pool and statement cache counters and the pool size"""
+        with self.lock:
+            return dict(self.counters, size=self.size, idle=len(self.idle),
+                        **self.statements.stats())
+
+    def close(self):
+        """Closes idle connections; busy ones are closed when released"""
+        with self.lock:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            self.size -= len(idle)
+            self.lock.notify_all()
+        for connection, _, _ in idle:
+            connection.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(database="users.db", **options):
+    """
+    Returns the pool shared by every caller of a database file
+
+    Args:
+        database (str): SQLite database file
+        options: ConnectionPool arguments, only used when the pool is
+            first created
+
+    Returns:
+        ConnectionPool
+    """
+    with _pools_lock:
+        pool = _pools.get(database)
+        if pool is None or pool.closed:
+            pool = _pools[database] = ConnectionPool(database, **options)
+        return pool
+
+
+class AsyncConnectionPool:
+    """Bounded pool of reusable aiosqlite connections for one event loop"""
+
+    def __init__(self, database="users.db", min_size=1, max_size=8,
+                 idle_timeout=60.0, timeout=30.0, health_check=True,
+                 statement_cache_size=DEFAULT_SIZE, connect=None):
+        """
+        Takes the arguments of ConnectionPool, except affinity: tasks
+        all run on the loop's thread. Connections are opened on demand
+        and min_size of them are kept when idle.
+
+        Args:
+            connect: Optional coroutine function opening a new connection
+        """
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError("expected 0 <= min_size <= max_size, "
+                             "max_size >= 1")
+        self.database = database
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.health_check = health_check
+        self.statement_cache_size = statement_cache_size
+        self.statements = StatementStats()
+        self.factory = connection_factory(self.statements)
+        self.connect = connect or self.open_sqlite
+        # One slot per checked out connection; idle connections hold none
+        self.slots = asyncio.Semaphore(max_size)
+        # Idle connections as (connection, release time), the most
+        # recently released last. The loop runs one task at a time, so
+        # no lock is needed between awaits.
+        self.idle = []
+        self.size = 0
+        self.closed = False
+        self.counters = {"created": 0, "reused": 0, "evicted": 0,
+                         "discarded": 0}
+
+    async def open_sqlite(self):
+        """Opens an aiosqlite connection"""
+        if aiosqlite is None:
+            raise ImportError("async connections require aiosqlite")
+        return await aiosqlite.connect(
+            self.database, cached_statements=self.statement_cache_size,
+            factory=self.factory)
+
+    def expired(self, now):
+        """Removes and returns idle connections past idle_timeout"""
+        stale = []
+        while (self.idle and self.size > self.min_size
+               and now - self.idle[0][1] > self.idle_timeout):
+            stale.append(self.idle.pop(0)[0])
+            self.size -= 1
+        self.counters["evicted"] += len(stale)
+        return stale
+
+    async def healthy(self, connection):
+        """Tells whether a connection still answers a trivial query"""
+        try:
+            cursor = await connection.execute(HEALTH_CHECK)
+            await cursor.fetchone()
+            await cursor.close()
+            return True
+        except (sqlite3.Error, ValueError):
+            return False
+
+    async def discard(self, connection):
+        """Closes a broken connection and frees its place"""
+        self.size -= 1
+        self.counters["discarded"] += 1
+        try:
+            await connection.close()
+        except (sqlite3.Error, ValueError):
+            pass
+
+    async def checkout(self):
+        """Returns an idle healthy connection or a new one (slot held)"""
+        while True:
+            if self.closed:
+                raise RuntimeError("connection pool is closed")
+            for stale in self.expired(time.monotonic()):
+                await stale.close()
+            if not self.idle:
+                self.size += 1
+                try:
+                    connection = await self.connect()
+                except BaseException:
+                    self.size -= 1
+                    raise
+                self.counters["created"] += 1
+                return connection
+            connection = self.idle.pop()[0]
+            self.counters["reused"] += 1
+            if not self.health_check:
+                return connection
+            try:
+                if await self.healthy(connection):
+                    return connection
+            except BaseException:
+                # Cancelled during the check: the connection stays usable
+                self.idle.append((connection, time.monotonic()))
+                raise
+            await self.discard(connection)
+
+    async def acquire(self, timeout=None):
+        """
+        Checks a connection out of the pool
+
+        Args:
+            timeout (float): Seconds to wait for a free connection,
+                defaults to the pool's timeout
+
+        Returns:
+            A healthy aiosqlite connection, to be given back with release()
+
+        Raises:
+            TimeoutError: If no connection became free in time
+        """
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            await asyncio.wait_for(self.slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"no connection to {self.database} became "
+                               f"free within {timeout} seconds") from None
+        try:
+            return await self.checkout()
+        except BaseException:
+            self.slots.release()
+            raise
+
+    async def release(self, connection):
+        """
+        Gives a connection back to the pool
+
+        An open transaction is rolled back first; a connection that cannot
+        be rolled back is discarded.
+        """
+        try:
+            if connection.in_transaction:
+                await connection.rollback()
+        except (sqlite3.Error, ValueError):
+            await self.discard(connection)
+        else:
+            if self.closed:
+                self.size -= 1
+                await connection.close()
+            else:
+                self.idle.append((connection, time.monotonic()))
+        finally:
+            self.slots.release()
+
+    @asynccontextmanager
+    async def connection(self, timeout=None):
+        """
+        Async context manager that borrows a connection for the block
+
+        Yields:
+            A pooled aiosqlite connection
+        """
+        connection = await self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            await self.release(connection)
+
+    def stats(self):
+        """Returns the pool and statement cache counters and the pool size"""
+        return dict(self.counters, size=self.size, idle=len(self.idle),
+                    **self.statements.stats())
+
+    async def close(self):
+        """Closes idle connections; busy ones are closed when released"""
+        self.closed = True
+        idle, self.idle = self.idle, []
+        self.size -= len(idle)
+        for connection, _ in idle:
+            await connection.close()
+
+
+# Event loop -> (database file -> AsyncConnectionPool, closer); aiosqlite
+# connections cannot be shared between loops
+_async_pools = weakref.WeakKeyDictionary()
+
+
+async def close_at_shutdown(pools):
+    """
+    Async generator closing a loop's pools when the loop shuts down
+
+    Once started, the loop tracks it and asyncio.run() (through
+    loop.shutdown_asyncgens()) closes it before closing the loop. The
+    pooled connections are closed then, as their worker threads would
+    otherwise keep the interpreter from exiting.
+    """
+    try:
+        yield
+    finally:
+        for pool in list(pools.values()):
+            await pool.close()
+
+
+def get_async_pool(database="users.db", **options):
+    """
+    Returns the async pool shared by the tasks of the running event loop
+
+    Args:
+        database (str): SQLite database file
+        options: AsyncConnectionPool arguments, only used when the pool
+            is first created
+
+    Returns:
+        AsyncConnectionPool
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _async_pools:
+        pools = {}
+        closer = close_at_shutdown(pools)
+        loop.create_task(closer.__anext__())
+        _async_pools[loop] = (pools, closer)
+    pools = _async_pools[loop][0]
+    pool = pools.get(database)
+    if pool is None or pool.closed:
+        pool = pools[database] = AsyncConnectionPool(database, **options)
+    return pool
@@ -0,0 +1,295 @@
+#!/usr/bin/python3
+"""
+Module that provides a group-commit writer on top of transactional
+
+A transaction per write pays one commit, hence one fsync, per write.
+GroupCommitWriter runs the writes submitted by many threads on a single
+writer thread and commits them together:
+
+- the first queued write opens a batch; the batch closes `window`
+  seconds later or once it holds `max_batch` writes, and all of them
+  run in one BEGIN ... COMMIT
+- each write runs inside its own SAVEPOINT, so a write that raises is
+  rolled back alone and its caller gets the exception while the others
+  still commit; if the COMMIT itself fails every caller of the batch
+  gets that error
+- callers wait on a concurrent.futures.Future, or block in write(),
+  until the batch holding their write has committed
+- like transactional, the tables written are traced and their cached
+  query results invalidated once the batch commits
+
+Writes are functions taking the connection first, like the ones
+decorated with transactional; they must not commit themselves.
+
+    writer = get_writer('users.db')
+    writer.write(set_email, user_id, new_email)
+
+or decorate the function with `group_committed`.
+"""
+import atexit
+import functools
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from query_cache import shared_cache
+from sql_tables import statement_tables
+
+STOP = object()
+
+
+class GroupCommitWriter:
+    """Single writer thread committing the writes of many threads in batches"""
+
+    def __init__(self, database="users.db", window=0.002, max_batch=256,
+                 connect=None, cache=shared_cache):
+        """
+        Args:
+            database (str): SQLite database file
+            window (float): Seconds a batch stays open after its first
+                write; 0 commits whatever is queued at once
+            max_batch (int): Most writes committed together
+            connect: Optional callable opening the writer's connection
+            cache (QueryCache): Cache whose results are invalidated
+        """
+        self.database = database
+        self.window = window
+        self.max_batch = max_batch
+        self.connect = connect or (lambda: sqlite3.connect(database))
+        self.cache = cache
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+        self.counters = {"operations": 0, "failed": 0, "batches": 0,
+                         "failed_batches": 0}
+        self.started = None
+
+    def start(self):
+        """Starts the writer thread"""
+        with self.lock:
+            if self.thread is not None:
+                return
+            if self.closed:
+                raise RuntimeError("group commit writer is closed")
+            self.started = time.monotonic()
+            self.thread = threading.Thread(target=self.run, daemon=True,
+                                           name="group-commit")
+            self.thread.start()
+        atexit.register(self.close)
+
+    def submit(self, operation, *args, **kwargs):
+        """
+        Queues a write for the next batch
+
+        Args:
+            operation: Callable taking the connection first
+            args, kwargs: Its other arguments
+
+        Returns:
+            concurrent.futures.Future: Resolved with the result of the
+                operation, or its exception, once the batch committed
+        """
+        if self.thread is None:
+            self.start()
+        future = Future()
+        with self.lock:
+            # Checked under the lock so nothing is queued after STOP
+            if self.closed:
+                raise RuntimeError("group commit writer is closed")
+            self.queue.put((operation, args, kwargs, future))
+        return future
+
+    def write(self, operation, *args, **kwargs):
+        """Queues a write and waits for its batch to commit"""
+        return self.submit(operation, *args, **kwargs).result()
+
+    def next_batch(self):
+        """
+        Waits for a write, then collects the batch it opens
+
+        Returns:
+            tuple: (list of queued writes, True if the writer must stop)
+        """
+        item = self.queue.get()
+        if item is STOP:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self.queue.get(timeout=remaining)
+                else:
+                    item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def commit(self, connection, batch, written):
+        """Runs a batch in one transaction and resolves its futures"""
+        written.clear()
+        outcomes = []
+        try:
+            connection.execute("BEGIN")
+            for operation, args, kwargs, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                connection.execute("SAVEPOINT operation")
+                try:
+                    result = operation(connection, *args, **kwargs)
+                except Exception as error:
+                    # Undo this write only, the batch goes on
+                    connection.execute("ROLLBACK TO operation")
+                    connection.execute("RELEASE operation")
+                    outcomes.append((future, False, error))
+                except BaseException as error:
+                    # SystemExit, KeyboardInterrupt...: its caller gets it,
+                    # the batch is rolled back and the writer stops
+                    future.set_exception(error)
+                    raise
+                else:
+                    connection.execute("RELEASE operation")
+                    outcomes.append((future, True, result))
+            connection.commit()
+        except BaseException as error:
+            try:
+                connection.rollback()
+            except sqlite3.Error:
+                pass
+            self.counters["failed_batches"] += 1
+            self.counters["failed"] += len(batch)
+            failure = error
+            if not isinstance(error, Exception):
+                failure = RuntimeError("group commit writer stopped by "
+                                       + type(error).__name__)
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(failure)
+            if failure is not error:
+                raise
+            return
+        self.cache.invalidate(written)
+        self.counters["batches"] += 1
+        for future, succeeded, value in outcomes:
+            self.counters["operations"] += 1
+            if succeeded:
+                future.set_result(value)
+            else:
+                self.counters["failed"] += 1
+                future.set_exception(value)
+
+    def run(self):
+        """Writer thread: commits batches until close()"""
+        try:
+            connection = self.connect()
+        except Exception as error:
+            self.fail(error)
+            return
+        written = set()
+        connection.set_trace_callback(
+            lambda sql: written.update(statement_tables(sql)[1]))
+        try:
+            stopping = False
+            while not stopping:
+                batch, stopping = self.next_batch()
+                if batch:
+                    self.commit(connection, batch, written)
+        except BaseException:
+            # Raised by an operation (SystemExit...) and already handed to
+            # its caller; the writer stops
+            pass
+        finally:
+            connection.close()
+            # Writes queued behind a fatal error fail instead of waiting
+            # forever, and later submit() calls raise
+            self.fail(RuntimeError("group commit writer stopped"))
+
+    def fail(self, error):
+        """Closes the writer, failing every queued write with an error"""
+        with self.lock:
+            self.closed = True
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not STOP and item[3].set_running_or_notify_cancel():
+                item[3].set_exception(error)
+
+    def close(self):
+        """Commits the writes already queued, then stops the writer"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            thread = self.thread
+            if thread is not None:
+                self.queue.put(STOP)
+        if thread is not None:
+            thread.join()
+
+    def stats(self):
+        """
+        Reports the writer's throughput
+
+        Returns:
+            dict: Operations resolved, failures, committed and failed
+                batches, mean committed batch size and operations per
+                second since the writer started
+        """
+        stats = dict(self.counters)
+        stats["mean_batch"] = stats["operations"] / stats["batches"] \
+            if stats["batches"] else 0.0
+        elapsed = time.monotonic() - self.started if self.started else 0
+        stats["operations_per_second"] = \
+            stats["operations"] / elapsed if elapsed else 0.0
+        return stats
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(database="users.db", **options):
+    """
+    Returns the writer shared by every caller of a database file
+
+    Args:
+        database (str): SQLite database file
+        options: GroupCommitWriter arguments, only used when the writer
+            is first created
+
+    Returns:
+        GroupCommitWriter
+    """
+    with _writers_lock:
+        writer = _writers.get(database)
+        if writer is None or writer.closed:
+            writer = _writers[database] = GroupCommitWriter(database,
+                                                            **options)
+        return writer
+
+
+def group_committed(func=None, database="users.db"):
+    """
+    Decorator that runs a write through the shared group-commit writer
+
+    The decorated function takes the connection first, like a
+    transactional one, and is called without it; the call returns once
+    its batch has committed.
+    """
+    if func is None:
+        return functools.partial(group_committed, database=database)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return get_writer(database).write(func, *args, **kwargs)
+
+    return wrapper
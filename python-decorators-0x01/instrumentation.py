@@ -0,0 +1,244 @@
+#!/usr/bin/python3
+"""
+Module that provides low-overhead structured query instrumentation
+
+Formatting and printing a log line on every query costs more than many
+of the queries themselves. QueryInstrumentation keeps the hot path to a
+sampling decision, two clock reads and one deque append:
+
+- each sampled call appends a raw record (time, SQL, duration, row
+  count, caller, error) to a bounded ring buffer; when the buffer is
+  full the oldest records are dropped and counted, callers never block
+- a background thread wakes up every `flush_interval` seconds, turns
+  the records into dictionaries keyed by query fingerprint (the SQL
+  with literals replaced by ?), hands them to a sink in batches and
+  feeds per-fingerprint latency histograms
+- `sample_rate` (and `sample_rates` per fingerprint) decide which
+  calls are recorded; 0.1 records about one call in ten
+- `percentiles()` reports p50/p95/p99 per fingerprint, within 5% of the
+  true latencies
+
+The default sink writes one JSON line per record to the "queries"
+logger at INFO level.
+"""
+import atexit
+import functools
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from collections import deque
+
+from query_cache import normalize
+
+# String and numeric literals, replaced by ? in fingerprints
+LITERALS = re.compile(r"'(?:[^']|'')*'|\bx'[0-9a-f]*'|\b\d+(?:\.\d+)?\b",
+                      re.I)
+
+# Lists of placeholders, collapsed so IN lists of any length match
+PLACEHOLDER_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+logger = logging.getLogger("queries")
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(query):
+    """
+    Returns the shape of a query, independent of its literal values
+
+    >>> fingerprint("SELECT * FROM users WHERE id IN (1, 2,3) AND x = 'a'")
+    'select * from users where id in (?+) and x = ?'
+    """
+    shape = LITERALS.sub("?", normalize(query))
+    return PLACEHOLDER_LISTS.sub("(?+)", shape)
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram with 5% relative precision"""
+
+    # Bucket i covers (FLOOR * GROWTH ** (i - 1), FLOOR * GROWTH ** i]
+    FLOOR = 1e-6
+    GROWTH = 1.05
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        """Counts one duration, in seconds"""
+        index = 0
+        if seconds > self.FLOOR:
+            index = math.ceil(math.log(seconds / self.FLOOR)
+                              / math.log(self.GROWTH))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Returns the upper bound of the bucket holding the q-quantile"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= target:
+                return min(self.max, self.FLOOR * self.GROWTH ** index)
+        return self.max
+
+
+def log_sink(records):
+    """Default sink: logs each record as a JSON line"""
+    if logger.isEnabledFor(logging.INFO):
+        for record in records:
+            logger.info(json.dumps(record, default=str))
+
+
+class QueryInstrumentation:
+    """Records query timings off the hot path"""
+
+    def __init__(self, capacity=10000, flush_interval=1.0, batch_size=500,
+                 sample_rate=1.0, sample_rates=None, sink=log_sink):
+        """
+        Args:
+            capacity (int): Size of the ring buffer
+            flush_interval (float): Seconds between background flushes
+            batch_size (int): Most records handed to the sink at once
+            sample_rate (float): Share of calls recorded, from 0 to 1
+            sample_rates (dict): Fingerprint -> sample rate overrides
+            sink: Callable receiving lists of record dictionaries, or None
+        """
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.sample_rate = sample_rate
+        self.sample_rates = dict(sample_rates or {})
+        self.sink = sink
+        self.buffer = deque(maxlen=capacity)
+        self.histograms = {}
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def sampled(self, query):
+        """Tells whether a call of a query should be recorded"""
+        rate = self.sample_rates.get(fingerprint(query), self.sample_rate) \
+            if self.sample_rates else self.sample_rate
+        return rate >= 1 or random.random() < rate
+
+    def record(self, query, duration, rowcount=None, caller=None,
+               error=None):
+        """
+        Appends a raw record to the ring buffer (hot path)
+
+        Args:
+            query (str): SQL statement
+            duration (float): Seconds the call took
+            rowcount (int): Rows returned, None if unknown
+            caller (tuple): (file name, line number, function name)
+            error (str): Name of the exception raised, if any
+        """
+        if self.thread is None:
+            self.start()
+        if len(self.buffer) == self.capacity:
+            self.dropped += 1
+        self.buffer.append((time.time(), query, duration, rowcount, caller,
+                            error))
+
+    def drain(self):
+        """Removes and returns the buffered records"""
+        records = []
+        try:
+            while True:
+                records.append(self.buffer.popleft())
+        except IndexError:
+            return records
+
+    def flush(self):
+        """Processes the buffered records now: histograms, then the sink"""
+        records = self.drain()
+        if not records:
+            return
+        batch = []
+        with self.lock:
+            for timestamp, query, duration, rowcount, caller, error \
+                    in records:
+                shape = fingerprint(query)
+                histogram = self.histograms.get(shape)
+                if histogram is None:
+                    histogram = self.histograms[shape] = LatencyHistogram()
+                histogram.add(duration)
+                if self.sink is None:
+                    continue
+                batch.append({
+                    "time": timestamp, "fingerprint": shape, "query": query,
+                    "duration_ms": round(duration * 1000, 3),
+                    "rows": rowcount,
+                    "caller": "{}:{} {}".format(*caller) if caller else None,
+                    "error": error,
+                })
+        for start in range(0, len(batch), self.batch_size):
+            self.sink(batch[start:start + self.batch_size])
+
+    def run(self):
+        """Background loop flushing the buffer every flush_interval"""
+        while not self.stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("query instrumentation flush failed")
+
+    def start(self):
+        """Starts the background flush thread"""
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self.run, daemon=True,
+                                           name="query-instrumentation")
+            self.thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stops the background thread after a last flush"""
+        thread = self.thread
+        if thread is None:
+            return
+        self.stopped.set()
+        thread.join()
+        self.thread = None
+        self.flush()
+
+    def percentiles(self, quantiles=(0.5, 0.95, 0.99)):
+        """
+        Reports latency percentiles per query fingerprint
+
+        Only flushed records are included; call flush() first for an
+        up-to-date report.
+
+        Returns:
+            dict: Fingerprint -> {"count", "p50", "p95", "p99", ...} with
+                latencies in milliseconds
+        """
+        report = {}
+        with self.lock:
+            for shape, histogram in self.histograms.items():
+                stats = {"count": histogram.count,
+                         "mean": histogram.total / histogram.count * 1000,
+                         "max": histogram.max * 1000}
+                for q in quantiles:
+                    label = f"p{q * 100:g}"
+                    stats[label] = histogram.quantile(q) * 1000
+                report[shape] = stats
+        return report
+
+
+# Instrumentation shared by log_queries
+shared_instrumentation = QueryInstrumentation()
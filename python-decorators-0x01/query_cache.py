@@ -0,0 +1,379 @@
+#!/usr/bin/python3
+"""
+Module that provides a bounded query-result cache
+
+Results are keyed on the normalized SQL text plus the bound parameters,
+so `SELECT * FROM users WHERE id = ?` with (1,) and with (2,) are cached
+separately while differences in whitespace or keyword case are not.
+
+The cache is bounded three ways:
+
+- LRU: at most `max_entries` results, the least recently used go first
+- TTL: a result expires `ttl` seconds after it was stored
+- memory: the estimated size of all results stays under `max_bytes`
+
+Invalidation is versioned rather than eager. Every table has a
+generation counter that `invalidate()` bumps; the `transactional`
+decorator calls it with the tables a transaction wrote (found by
+sql_tables) once it commits. A result is stored along with the
+generations of the tables its query reads, snapshotted before the query
+ran, and a lookup only returns it while those generations are still
+current. Committing a write is therefore O(tables written) however many
+results are cached, and a result computed while a write was committing
+is never served, so long TTLs are safe for read-heavy queries as long
+as every write goes through `transactional`.
+
+Misses are coalesced with `SingleFlight`: when many threads miss on the
+same key at once, one of them runs the query and the others wait for
+its result instead of all hitting the database. `AsyncSingleFlight` does
+the same for coroutines: the cache itself never awaits, so both kinds of
+callers share it.
+"""
+import asyncio
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Quoted literals and identifiers, kept verbatim by normalize()
+QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`)""")
+
+# Whitespace runs, collapsed by normalize()
+SPACES = re.compile(r"\s+")
+
+MISSING = object()
+
+
+def normalize(query):
+    """
+    Normalizes SQL text for use as a cache key
+
+    Whitespace runs are collapsed and keywords lowercased; quoted
+    literals and identifiers are kept as they are.
+
+    Args:
+        query (str): SQL statement
+
+    Returns:
+        str: Normalized statement
+    """
+    parts = QUOTED.split(query.strip().rstrip(";").strip())
+    # Odd positions hold the quoted parts
+    for position in range(0, len(parts), 2):
+        parts[position] = SPACES.sub(" ", parts[position].lower())
+    return "".join(parts)
+
+
+def make_key(query, params=None):
+    """
+    Builds the cache key of a query and its bound parameters
+
+    Args:
+        query (str): SQL statement
+        params: Sequence or mapping of parameters, or None
+
+    Returns:
+        tuple: (normalized SQL, hashable parameters)
+    """
+    if params is None:
+        frozen = ()
+    elif isinstance(params, dict):
+        frozen = tuple(sorted(params.items()))
+    else:
+        frozen = tuple(params)
+    return normalize(query), frozen
+
+
+def size_of(value):
+    """Estimates the memory held by a result (nested lists, tuples, dicts)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(size_of(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(size_of(key) + size_of(item)
+                    for key, item in value.items())
+    return size
+
+
+class TableGenerations:
+    """Per-table generation counters, bumped by every committed write"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def snapshot(self, tables):
+        """
+        Captures the current generation of some tables
+
+        Returns:
+            tuple: Sorted (table, generation) pairs
+        """
+        counters = self.counters
+        return tuple(sorted((table, counters.get(table, 0))
+                            for table in tables))
+
+    def current(self, snapshot):
+        """Tells whether no table of a snapshot was written since"""
+        counters = self.counters
+        for table, generation in snapshot:
+            if counters.get(table, 0) != generation:
+                return False
+        return True
+
+    def bump(self, tables):
+        """Starts a new generation for each of the given tables"""
+        with self.lock:
+            for table in tables:
+                table = table.lower()
+                self.counters[table] = self.counters.get(table, 0) + 1
+
+
+class QueryCache:
+    """Thread-safe LRU/TTL cache of query results within a memory budget"""
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024,
+                 ttl=300.0, generations=None):
+        """
+        Args:
+            max_entries (int): Maximum number of cached results
+            max_bytes (int): Budget for the estimated size of all results
+            ttl (float): Seconds a result stays valid, None for no expiry
+            generations (TableGenerations): Counters to validate against,
+                a new set by default
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.generations = generations or TableGenerations()
+        self.lock = threading.Lock()
+        # key -> (result, size, expiry time, generation snapshot),
+        # least recently used first
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0,
+                         "expirations": 0, "invalidations": 0}
+
+    def remove(self, key):
+        """Drops an entry (lock held)"""
+        self.bytes -= self.entries.pop(key)[1]
+
+    def snapshot(self, tables):
+        """
+        Captures the generations of the tables a query reads
+
+        Take it before running the query and pass it to put().
+        """
+        return self.generations.snapshot(tables)
+
+    def get(self, key, default=None):
+        """
+        Looks up a cached result
+
+        Args:
+            key: Key built by make_key
+            default: Returned on a miss
+
+        Returns:
+            The cached result, or default
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[2] is not None \
+                    and entry[2] <= time.monotonic():
+                self.remove(key)
+                self.counters["expirations"] += 1
+                entry = None
+            elif entry is not None \
+                    and not self.generations.current(entry[3]):
+                # A table it reads was written since the query ran
+                self.remove(key)
+                self.counters["invalidations"] += 1
+                entry = None
+            if entry is None:
+                self.counters["misses"] += 1
+                return default
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[0]
+
+    def put(self, key, result, snapshot=(), ttl=MISSING):
+        """
+        Stores a result, evicting least recently used ones to make room
+
+        Args:
+            key: Key built by make_key
+            result: Query result
+            snapshot: Generations of the tables the query reads, taken by
+                snapshot() before it ran; the result is not stored if
+                one of them was written meanwhile
+            ttl (float): Overrides the cache's ttl for this result
+        """
+        ttl = self.ttl if ttl is MISSING else ttl
+        size = size_of(result)
+        if size > self.max_bytes:
+            return
+        expires = None if ttl is None else time.monotonic() + ttl
+        with self.lock:
+            if not self.generations.current(snapshot):
+                return
+            if key in self.entries:
+                self.remove(key)
+            while self.entries and (len(self.entries) >= self.max_entries
+                                    or self.bytes + size > self.max_bytes):
+                self.remove(next(iter(self.entries)))
+                self.counters["evictions"] += 1
+            self.entries[key] = (result, size, expires, snapshot)
+            self.bytes += size
+
+    def invalidate(self, tables):
+        """
+        Invalidates every result that reads one of the given tables
+
+        Call it after the write to these tables has committed; the stale
+        results are dropped when next looked up, or evicted.
+
+        Args:
+            tables: Iterable of table names
+        """
+        self.generations.bump(tables)
+
+    def clear(self):
+        """Drops every result"""
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Returns the hit/miss/eviction counters and the cache size"""
+        with self.lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(self.counters, entries=len(self.entries),
+                        bytes=self.bytes,
+                        hit_rate=self.counters["hits"] / lookups
+                        if lookups else 0.0)
+
+
+class Flight:
+    """One in-flight call, awaited by the callers coalesced onto it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time, sharing its outcome"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.counters = {"executions": 0, "coalesced": 0}
+
+    def do(self, key, function):
+        """
+        Calls function(), unless a call for the same key is in flight
+
+        Callers arriving while a call for their key runs wait for it and
+        get its result, or its exception raised again.
+
+        Args:
+            key: Hashable key identifying the call
+            function: Callable without arguments
+
+        Returns:
+            The result of the call
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+                self.counters["executions"] += 1
+            else:
+                self.counters["coalesced"] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = function()
+            return flight.result
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+
+    def stats(self):
+        """Returns how many calls ran and how many were coalesced"""
+        with self.lock:
+            return dict(self.counters, in_flight=len(self.flights))
+
+
+class AsyncSingleFlight:
+    """Runs at most one coroutine per key at a time, sharing its outcome"""
+
+    def __init__(self):
+        self.flights = {}
+        self.counters = {"executions": 0, "coalesced": 0}
+
+    async def do(self, key, function):
+        """
+        Awaits function(), unless a call for the same key is in flight
+
+        The first caller runs the call itself (on its own connection);
+        the others wait for its outcome. If that caller is cancelled, a
+        waiting one takes over and runs the call.
+
+        Args:
+            key: Hashable key identifying the call
+            function: Coroutine function without arguments
+
+        Returns:
+            The result of the call
+        """
+        while key in self.flights:
+            flight = self.flights[key]
+            self.counters["coalesced"] += 1
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    # This caller was cancelled, not the call it awaited
+                    raise
+
+        flight = self.flights[key] = \
+            asyncio.get_running_loop().create_future()
+        self.counters["executions"] += 1
+        try:
+            result = await function()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as error:
+            flight.set_exception(error)
+            # Mark it retrieved, whether or not anyone was waiting
+            flight.exception()
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            del self.flights[key]
+
+    def stats(self):
+        """Returns how many calls ran and how many were coalesced"""
+        return dict(self.counters, in_flight=len(self.flights))
+
+
+# Cache shared by cache_query and transactional, and the coalescing of
+# its misses
+shared_cache = QueryCache()
+shared_flights = SingleFlight()
+shared_async_flights = AsyncSingleFlight()
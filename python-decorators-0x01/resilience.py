@@ -0,0 +1,254 @@
+#!/usr/bin/python3
+"""
+Module that provides the retry policy used by retry_on_failure
+
+Retrying every error right away, or after the same fixed delay, turns a
+database brownout into an outage: all callers retry in lockstep and
+multiply the load. RetryPolicy instead:
+
+- only retries errors classified as transient by `is_retryable()` (a
+  locked or busy database, a pool that ran out of connections), other
+  errors are raised at once
+- waits with exponential backoff and decorrelated jitter, each delay
+  drawn between `base_delay` and three times the previous one, capped
+  at `max_delay`, so callers spread out instead of synchronizing
+- spends retries from a process-wide RetryBudget, a token bucket that
+  earns a fraction of a token per call, so retries stay a bounded
+  share of the traffic
+- shares a CircuitBreaker that opens after `failure_threshold`
+  consecutive transient failures: calls then fail fast with
+  CircuitOpenError until `reset_timeout` has passed and a trial call
+  succeeds
+"""
+import random
+import sqlite3
+import threading
+import time
+
+# Messages of sqlite3.OperationalError worth retrying
+TRANSIENT_MESSAGES = ("database is locked", "database table is locked",
+                      "database is busy", "unable to open database file",
+                      "disk i/o error")
+
+# Why RetryPolicy.backoff() gave up on an error
+NOT_TRANSIENT = "not transient"
+RETRIES_EXHAUSTED = "retries exhausted"
+BUDGET_EMPTY = "retry budget empty"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend that is considered down"""
+
+
+def is_retryable(error):
+    """
+    Tells whether an error is transient, i.e. worth retrying
+
+    Args:
+        error (Exception): Error raised by a database call
+
+    Returns:
+        bool: True for a locked/busy database, a pool timeout or a
+            dropped connection
+    """
+    if isinstance(error, sqlite3.OperationalError):
+        message = str(error).lower()
+        return any(text in message for text in TRANSIENT_MESSAGES)
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+
+def decorrelated_jitter(previous, base_delay, max_delay, rng=random):
+    """
+    Draws the next backoff delay
+
+    Args:
+        previous (float): Previous delay, base_delay before the first retry
+        base_delay (float): Smallest delay
+        max_delay (float): Largest delay
+
+    Returns:
+        float: Delay in seconds, between base_delay and
+            min(max_delay, 3 * previous)
+    """
+    return min(max_delay, rng.uniform(base_delay, previous * 3))
+
+
+class RetryBudget:
+    """Token bucket limiting retries to a share of the calls"""
+
+    def __init__(self, ratio=0.2, per_second=1.0, capacity=20.0):
+        """
+        Args:
+            ratio (float): Tokens earned by each call; 0.2 allows one
+                retry for every five calls
+            per_second (float): Tokens earned per second regardless of
+                traffic, so rare callers can still retry
+            capacity (float): Most tokens the bucket holds
+        """
+        self.ratio = ratio
+        self.per_second = per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self, earned):
+        """Adds earned tokens plus the time-based ones (lock held)"""
+        now = time.monotonic()
+        earned += (now - self.updated) * self.per_second
+        self.tokens = min(self.capacity, self.tokens + earned)
+        self.updated = now
+
+    def record_call(self):
+        """Earns the tokens of a first attempt"""
+        with self.lock:
+            self.refill(self.ratio)
+
+    def try_spend(self):
+        """Takes the token of one retry, returns False if there is none"""
+        with self.lock:
+            self.refill(0)
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """Closed, open or half-open state shared by the callers of a backend"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """
+        Args:
+            failure_threshold (int): Consecutive transient failures that
+                open the circuit
+            reset_timeout (float): Seconds the circuit stays open before
+                one trial call is let through
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """
+        Checks that a call may go through
+
+        Raises:
+            CircuitOpenError: While the circuit is open, or a trial call
+                is already running after it half-opened
+        """
+        with self.lock:
+            if self.state == "closed":
+                return
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError("database circuit is open")
+                self.state = "half-open"
+            if self.trial_running:
+                raise CircuitOpenError("database circuit is half-open")
+            self.trial_running = True
+
+    def record_success(self):
+        """Closes the circuit"""
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+            self.trial_running = False
+
+    def record_failure(self):
+        """Counts a transient failure, opening the circuit when needed"""
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.state == "half-open" \
+                    or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """Ends a call that neither succeeded nor failed transiently"""
+        with self.lock:
+            self.trial_running = False
+
+
+class RetryPolicy:
+    """Decides whether and when a failed call is retried"""
+
+    def __init__(self, retries=3, base_delay=0.1, max_delay=10.0,
+                 retryable=is_retryable, budget=None, breaker=None,
+                 rng=None):
+        """
+        Args:
+            retries (int): Retries after the first attempt
+            base_delay (float): Smallest backoff delay, in seconds
+            max_delay (float): Largest backoff delay, in seconds
+            retryable: Callable classifying errors as transient
+            budget (RetryBudget): Shared budget, the process-wide one
+                by default
+            breaker (CircuitBreaker): Shared breaker, the process-wide
+                one by default
+            rng (random.Random): Source of the jitter
+        """
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable = retryable
+        self.budget = budget or shared_budget
+        self.breaker = breaker or shared_breaker
+        self.rng = rng or random.Random()
+
+    def start(self):
+        """
+        Begins a call
+
+        Returns:
+            float: The initial "previous delay" for backoff()
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        self.breaker.allow()
+        self.budget.record_call()
+        return self.base_delay
+
+    def succeeded(self):
+        """Records a successful attempt"""
+        self.breaker.record_success()
+
+    def backoff(self, error, attempt, previous):
+        """
+        Handles a failed attempt
+
+        Args:
+            error (Exception): Error the attempt raised
+            attempt (int): Number of the attempt, from 0
+            previous (float): Previous delay
+
+        Returns:
+            tuple: (seconds to wait before the next attempt, None) or,
+                if the error must be raised, (None, reason): NOT_TRANSIENT,
+                RETRIES_EXHAUSTED or BUDGET_EMPTY
+
+        Raises:
+            CircuitOpenError: If this failure left the circuit open
+        """
+        if not self.retryable(error):
+            self.breaker.release()
+            return None, NOT_TRANSIENT
+        self.breaker.record_failure()
+        if attempt >= self.retries:
+            return None, RETRIES_EXHAUSTED
+        if not self.budget.try_spend():
+            return None, BUDGET_EMPTY
+        self.breaker.allow()
+        return decorrelated_jitter(previous, self.base_delay,
+                                   self.max_delay, self.rng), None
+
+
+# Budget and breaker shared by every retrying function of the process
+shared_budget = RetryBudget()
+shared_breaker = CircuitBreaker()
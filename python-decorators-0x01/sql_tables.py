@@ -0,0 +1,210 @@
+#!/usr/bin/python3
+"""
+Module that extracts the tables a SQL statement reads and writes
+
+A small tokenizer, not a full parser: it skips comments and string
+literals, unquotes identifiers ("users", `users`, [users]), ignores the
+names of common table expressions and table-valued functions, and
+follows comma separated FROM lists, joins and subqueries. That is
+enough to tell which tables a cached query depends on and which ones a
+transaction changed.
+
+    >>> statement_tables("UPDATE users SET email = ? WHERE id = ?")
+    (frozenset(), frozenset({'users'}))
+"""
+import functools
+import re
+
+TOKEN = re.compile(r"""
+      (?P<skip>\s+|--[^\n]*|/\*.*?(?:\*/|$))
+    | (?P<string>'(?:[^']|'')*'?)
+    | (?P<quoted>"(?:[^"]|"")*"?|`[^`]*`?|\[[^\]]*\]?)
+    | (?P<word>[A-Za-z_][\w$]*)
+    | (?P<other>\d+(?:\.\d*)?|\S)
+""", re.X | re.S)
+
+# Keywords after which a table name follows
+TABLE_KEYWORDS = {"from", "join", "into", "update", "table"}
+
+# Statements whose target table is written
+WRITE_VERBS = {"insert", "replace", "update", "delete", "create", "drop",
+               "alter", "truncate"}
+
+# Words that end a table reference rather than alias it
+CLAUSE_WORDS = {
+    "where", "on", "using", "join", "inner", "left", "right", "full",
+    "outer", "cross", "natural", "group", "order", "limit", "having",
+    "union", "intersect", "except", "window", "set", "values", "select",
+    "returning", "default", "as", "indexed", "not", "if", "exists",
+    "offset", "for", "with",
+}
+KEYWORD_ITEMS = {("word", word) for word in CLAUSE_WORDS | TABLE_KEYWORDS}
+
+
+def tokens(query):
+    """
+    Splits a statement into lowercased words, identifiers and symbols
+
+    Returns:
+        list: (kind, text) pairs, kind being "word", "name", "string"
+            or "other"; quoted identifiers come back unquoted as "name"
+    """
+    result = []
+    for match in TOKEN.finditer(query):
+        kind = match.lastgroup
+        text = match.group()
+        if kind == "skip":
+            continue
+        if kind == "word":
+            text = text.lower()
+        elif kind == "quoted":
+            kind, text = "name", text[1:-1].lower()
+        result.append((kind, text))
+    return result
+
+
+def skip_parens(items, position):
+    """Returns the position just past the parenthesis opened at position"""
+    depth = 0
+    for index in range(position, len(items)):
+        if items[index] == ("other", "("):
+            depth += 1
+        elif items[index] == ("other", ")"):
+            depth -= 1
+            if depth == 0:
+                return index + 1
+    return len(items)
+
+
+def with_clause(items, position):
+    """
+    Reads the common table expressions of a WITH clause
+
+    Args:
+        items: Tokens of the statement
+        position: Position of the WITH keyword
+
+    Returns:
+        tuple: (set of names defined, position after the clause)
+    """
+    names = set()
+    position += 1
+    if position < len(items) and items[position] == ("word", "recursive"):
+        position += 1
+    while position < len(items) and items[position][0] in ("word", "name"):
+        names.add(items[position][1])
+        position += 1
+        if position < len(items) and items[position] == ("other", "("):
+            position = skip_parens(items, position)
+        if position < len(items) and items[position] == ("word", "as"):
+            position += 1
+        while position < len(items) and items[position] in (
+                ("word", "not"), ("word", "materialized")):
+            position += 1
+        if position < len(items) and items[position] == ("other", "("):
+            position = skip_parens(items, position)
+        if position < len(items) and items[position] == ("other", ","):
+            position += 1
+        else:
+            break
+    return names, position
+
+
+def main_verb(items):
+    """Returns the verb of a statement (select, insert, ...), after WITH"""
+    position = 0
+    if items and items[0] == ("word", "with"):
+        position = with_clause(items, 0)[1]
+    if position < len(items) and items[position][0] == "word":
+        return items[position][1]
+    return None
+
+
+def table_name(items, position):
+    """
+    Reads a possibly schema-qualified table name
+
+    Returns:
+        tuple: (name or None, position after it)
+    """
+    if position >= len(items) or items[position][0] not in ("word", "name"):
+        return None, position
+    name = items[position][1]
+    position += 1
+    while position + 1 < len(items) and items[position] == ("other", ".") \
+            and items[position + 1][0] in ("word", "name"):
+        name = items[position + 1][1]
+        position += 2
+    return name, position
+
+
+@functools.lru_cache(maxsize=1024)
+def statement_tables(query):
+    """
+    Finds the tables a statement reads and the tables it writes
+
+    Results are memoized, repeated statements are not tokenized again.
+
+    Args:
+        query (str): SQL statement
+
+    Returns:
+        tuple: (frozenset of tables read, frozenset of tables written)
+    """
+    items = tokens(query)
+    excluded = set()
+    for index, item in enumerate(items):
+        if item == ("word", "with"):
+            excluded |= with_clause(items, index)[0]
+    # A write's target is the first table named after its verb
+    target_pending = main_verb(items) in WRITE_VERBS
+    reads, writes = set(), set()
+
+    position = 0
+    while position < len(items):
+        kind, text = items[position]
+        position += 1
+        if kind != "word" or text not in TABLE_KEYWORDS:
+            continue
+        if text == "table" and not target_pending:
+            continue
+        # Skip modifiers such as UPDATE OR IGNORE, DROP TABLE IF EXISTS
+        while position < len(items) and items[position][1] in (
+                "or", "ignore", "abort", "fail", "rollback", "if", "not",
+                "exists", "only", "lateral"):
+            position += 1
+        while True:
+            if position >= len(items) or items[position] == ("other", "(") \
+                    or items[position] in KEYWORD_ITEMS:
+                # A subquery's own FROM clauses are found by the scan
+                break
+            name, position = table_name(items, position)
+            if name is None:
+                break
+            if not target_pending and position < len(items) \
+                    and items[position] == ("other", "("):
+                # Table-valued function such as json_each(...)
+                break
+            if name not in excluded:
+                if target_pending:
+                    writes.add(name)
+                else:
+                    reads.add(name)
+            target_pending = False
+            # Optional alias, then possibly another table of a FROM list
+            if position < len(items) and items[position] == ("word", "as"):
+                position += 1
+            if position < len(items) and items[position][0] in (
+                    "word", "name") and items[position][1] not in \
+                    CLAUSE_WORDS | TABLE_KEYWORDS:
+                position += 1
+            if position < len(items) and items[position] == ("other", ","):
+                position += 1
+                continue
+            break
+    return frozenset(reads), frozenset(writes)
+
+
+def is_write(query):
+    """Tells whether a statement changes data or schema"""
+    return main_verb(tokens(query)) in WRITE_VERBS
@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+"""
+Module that keeps prepared statements alive on pooled connections
+
+The sqlite3 module prepares every statement it runs (parse, then plan)
+and keeps the prepared statements of each connection in an LRU cache
+keyed by SQL text, `cached_statements` entries long. A connection opened
+per call loses that cache after one query; a pooled connection keeps it,
+so a repeated parameterized lookup such as get_user_by_id is only parsed
+and planned once per connection.
+
+The sqlite3 module does not expose its prepared statement handles or
+cache counters, so StatementCachingConnection mirrors the cache: it
+tracks the SQL texts run on the connection in an LRU of the same size
+and counts a hit when a statement would be found prepared. The pools
+open their connections with it and report the hit rate.
+
+Only the application's own queries are counted: transaction control
+(BEGIN, COMMIT, SAVEPOINT, ...) and the pools' HEALTH_CHECK still take
+their place in the mirrored cache but not in the hit rate, which would
+otherwise be made up mostly of the pool's own statements.
+"""
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Prepared statements kept per connection (the sqlite3 default is 128)
+DEFAULT_SIZE = 256
+
+# Statement the pools run on checkout, distinct from any application query
+HEALTH_CHECK = "SELECT 1 -- connection pool health check"
+
+# First keywords of the transaction control statements
+CONTROL_KEYWORDS = frozenset(("BEGIN", "COMMIT", "END", "ROLLBACK",
+                              "SAVEPOINT", "RELEASE"))
+
+
+def counted(sql):
+    """Tells whether a statement is an application query to be counted"""
+    if sql == HEALTH_CHECK:
+        return False
+    words = sql.split(None, 1)
+    return not words or words[0].upper() not in CONTROL_KEYWORDS
+
+
+class StatementStats:
+    """Hit and miss counters shared by the connections of a pool"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, hit):
+        """Counts one statement lookup"""
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        """Returns the counters and the hit rate"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"statement_hits": self.hits,
+                    "statement_misses": self.misses,
+                    "statement_hit_rate": self.hits / lookups
+                    if lookups else 0.0}
+
+
+class StatementCache:
+    """LRU mirror of one connection's prepared statement cache"""
+
+    def __init__(self, size=DEFAULT_SIZE, stats=None):
+        """
+        Args:
+            size (int): Entries of the connection's statement cache
+            stats (StatementStats): Counters to report lookups to
+        """
+        self.size = size
+        self.stats = stats or StatementStats()
+        self.statements = OrderedDict()
+
+    def lookup(self, sql):
+        """
+        Records that a statement runs, counting a hit if it is cached
+
+        Pool-internal statements update the mirrored cache, since sqlite3
+        caches them too, but are left out of the counters.
+        """
+        statements = self.statements
+        hit = sql in statements
+        if hit:
+            statements.move_to_end(sql)
+        elif self.size:
+            statements[sql] = None
+            if len(statements) > self.size:
+                statements.popitem(last=False)
+        if counted(sql):
+            self.stats.count(hit)
+
+
+class StatementCursor(sqlite3.Cursor):
+    """Cursor reporting the statements it runs to its connection's cache"""
+
+    def execute(self, sql, parameters=()):
+        self.connection.statements.lookup(sql)
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self.connection.statements.lookup(sql)
+        return super().executemany(sql, seq_of_parameters)
+
+
+class StatementCachingConnection(sqlite3.Connection):
+    """sqlite3 connection whose statement cache hits are counted"""
+
+    def __init__(self, *args, stats=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statements = StatementCache(
+            kwargs.get("cached_statements", 128), stats)
+
+    def cursor(self, factory=StatementCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connection_factory(stats):
+    """
+    Returns a sqlite3.connect factory reporting to shared counters
+
+    Args:
+        stats (StatementStats): Counters of the pool
+
+    Returns:
+        A StatementCachingConnection subclass bound to stats
+    """
+    class PooledConnection(StatementCachingConnection):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, stats=stats, **kwargs)
+
+    return PooledConnection
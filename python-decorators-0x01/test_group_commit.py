@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Unit tests for the group_commit module.
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from group_commit import GroupCommitWriter
+from query_cache import QueryCache
+
+
+def insert(conn, value):
+    """Insert one row into t."""
+    conn.execute("INSERT INTO t (value) VALUES (?)", (value,))
+
+
+class TestGroupCommitWriter(unittest.TestCase):
+    """Test cases for GroupCommitWriter.
+    """
+
+    def setUp(self):
+        """Create a database with an empty table t."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.database = os.path.join(directory.name, "test.db")
+        with sqlite3.connect(self.database) as conn:
+            conn.execute("CREATE TABLE t (value INTEGER)")
+        self.writer = GroupCommitWriter(self.database, window=0.05,
+                                        cache=QueryCache())
+        self.addCleanup(self.writer.close)
+
+    def values(self):
+        """Return the committed values of t."""
+        with sqlite3.connect(self.database) as conn:
+            return sorted(v for v, in conn.execute("SELECT value FROM t"))
+
+    def test_batch_commits_and_isolates_failures(self):
+        """Test that a failing write is rolled back alone."""
+        def failing(conn):
+            insert(conn, 99)
+            raise ValueError("bad write")
+
+        futures = [self.writer.submit(insert, 1),
+                   self.writer.submit(failing),
+                   self.writer.submit(insert, 2)]
+        self.assertIsNone(futures[0].result(5))
+        with self.assertRaises(ValueError):
+            futures[1].result(5)
+        self.assertIsNone(futures[2].result(5))
+        self.assertEqual(self.values(), [1, 2])
+
+    def test_base_exception_fails_batch_and_stops_writer(self):
+        """Test that SystemExit in a write does not hang later writes."""
+        def exiting(conn):
+            raise SystemExit
+
+        futures = [self.writer.submit(insert, 1),
+                   self.writer.submit(exiting)]
+        with self.assertRaises(RuntimeError):
+            futures[0].result(5)
+        with self.assertRaises(SystemExit):
+            futures[1].result(5)
+        self.writer.thread.join(5)
+        self.assertTrue(self.writer.closed)
+        with self.assertRaises(RuntimeError):
+            self.writer.write(insert, 2)
+        self.assertEqual(self.values(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
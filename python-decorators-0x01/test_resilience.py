@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""Unit tests for the resilience module and retry_on_failure.
+"""
+import asyncio
+import contextlib
+import importlib.util
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from resilience import (BUDGET_EMPTY, NOT_TRANSIENT, RETRIES_EXHAUSTED,
+                        CircuitBreaker, CircuitOpenError, RetryBudget,
+                        RetryPolicy)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class Clock:
+    """Manually advanced replacement for time.monotonic."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for the CircuitBreaker state machine.
+    """
+
+    def setUp(self):
+        """Freeze the clock seen by the breaker."""
+        self.clock = Clock()
+        patcher = patch('resilience.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+
+    def open_breaker(self):
+        """Record enough failures to open the circuit."""
+        for _ in range(3):
+            self.breaker.allow()
+            self.breaker.record_failure()
+
+    def test_opens_after_threshold(self):
+        """Test that consecutive failures open the circuit."""
+        for _ in range(2):
+            self.breaker.allow()
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "closed")
+        self.breaker.allow()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.allow()
+
+    def test_success_resets_failures(self):
+        """Test that a success clears the failure count."""
+        for _ in range(2):
+            self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_half_open_allows_one_trial(self):
+        """Test that one trial call goes through after reset_timeout."""
+        self.open_breaker()
+        self.clock.now += 29
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.allow()
+        self.clock.now += 2
+        self.breaker.allow()
+        self.assertEqual(self.breaker.state, "half-open")
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.allow()
+
+    def test_trial_success_closes(self):
+        """Test that a successful trial closes the circuit."""
+        self.open_breaker()
+        self.clock.now += 31
+        self.breaker.allow()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, "closed")
+        self.breaker.allow()
+
+    def test_trial_failure_reopens(self):
+        """Test that a failed trial opens the circuit again."""
+        self.open_breaker()
+        self.clock.now += 31
+        self.breaker.allow()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.allow()
+
+    def test_release_ends_trial(self):
+        """Test that an abandoned trial lets the next call through."""
+        self.open_breaker()
+        self.clock.now += 31
+        self.breaker.allow()
+        self.breaker.release()
+        self.breaker.allow()
+        self.assertEqual(self.breaker.state, "half-open")
+
+
+class TestRetryBudget(unittest.TestCase):
+    """Test cases for the RetryBudget token bucket.
+    """
+
+    def setUp(self):
+        """Freeze the clock seen by the budget."""
+        self.clock = Clock()
+        patcher = patch('resilience.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_capacity_then_empty(self):
+        """Test that a full bucket allows `capacity` retries."""
+        budget = RetryBudget(ratio=0.2, per_second=0, capacity=3)
+        self.assertEqual([budget.try_spend() for _ in range(4)],
+                         [True, True, True, False])
+
+    def test_calls_earn_tokens(self):
+        """Test that five calls earn one retry at ratio 0.2."""
+        budget = RetryBudget(ratio=0.2, per_second=0, capacity=3)
+        budget.tokens = 0
+        for _ in range(4):
+            budget.record_call()
+        self.assertFalse(budget.try_spend())
+        budget.record_call()
+        self.assertTrue(budget.try_spend())
+
+    def test_time_earns_tokens_up_to_capacity(self):
+        """Test the time-based refill and its cap."""
+        budget = RetryBudget(ratio=0, per_second=1, capacity=2)
+        budget.tokens = 0
+        self.assertFalse(budget.try_spend())
+        self.clock.now += 1
+        self.assertTrue(budget.try_spend())
+        self.clock.now += 100
+        self.assertEqual([budget.try_spend() for _ in range(3)],
+                         [True, True, False])
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """Test cases for RetryPolicy decisions.
+    """
+
+    def setUp(self):
+        """Give each policy its own budget and breaker."""
+        self.breaker = CircuitBreaker(failure_threshold=100)
+        self.policy = RetryPolicy(
+            retries=2, base_delay=0.1, max_delay=1,
+            budget=RetryBudget(capacity=10), breaker=self.breaker)
+
+    def test_not_transient_is_not_retried(self):
+        """Test that a programming error is raised at once."""
+        self.policy.start()
+        self.assertEqual(self.policy.backoff(ValueError(), 0, 0.1),
+                         (None, NOT_TRANSIENT))
+        self.assertEqual(self.breaker.failures, 0)
+
+    def test_transient_is_retried_with_bounded_delay(self):
+        """Test that locked errors are retried until retries run out."""
+        error = sqlite3.OperationalError("database is locked")
+        wait = self.policy.start()
+        for attempt in range(2):
+            wait, reason = self.policy.backoff(error, attempt, wait)
+            self.assertTrue(0.1 <= wait <= 1)
+            self.assertIsNone(reason)
+        self.assertEqual(self.policy.backoff(error, 2, wait),
+                         (None, RETRIES_EXHAUSTED))
+
+    def test_empty_budget_stops_retries(self):
+        """Test that retries stop when the budget is spent."""
+        self.policy.budget = RetryBudget(per_second=0, capacity=0)
+        error = sqlite3.OperationalError("database is locked")
+        self.assertEqual(self.policy.backoff(error, 0, 0.1),
+                         (None, BUDGET_EMPTY))
+
+    def test_circuit_opening_raises(self):
+        """Test that a failure opening the circuit raises at once."""
+        self.policy.breaker = CircuitBreaker(failure_threshold=1)
+        error = sqlite3.OperationalError("database is locked")
+        with self.assertRaises(CircuitOpenError):
+            self.policy.backoff(error, 0, 0.1)
+
+
+class TestRetryOnFailureCancellation(unittest.TestCase):
+    """Test that cancelled calls do not leave the breaker half-open.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Load 3-retry_on_failure.py next to a small users.db."""
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.cwd = os.getcwd()
+        os.chdir(cls.directory.name)
+        with sqlite3.connect("users.db") as conn:
+            conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                         "name TEXT, age INTEGER, email TEXT)")
+        spec = importlib.util.spec_from_file_location(
+            "retry_on_failure", os.path.join(HERE, "3-retry_on_failure.py"))
+        cls.module = importlib.util.module_from_spec(spec)
+        with contextlib.redirect_stdout(io.StringIO()):
+            spec.loader.exec_module(cls.module)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the temporary database."""
+        os.chdir(cls.cwd)
+        cls.directory.cleanup()
+
+    def half_open_policy(self):
+        """Return a policy whose breaker lets one trial call through."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        return RetryPolicy(retries=0, breaker=breaker,
+                           budget=RetryBudget()), breaker
+
+    def test_cancelled_async_trial_releases_breaker(self):
+        """Test that cancelling the trial call frees the breaker."""
+        policy, breaker = self.half_open_policy()
+
+        @self.module.retry_on_failure(policy=policy)
+        async def slow():
+            await asyncio.sleep(10)
+
+        async def cancel_trial():
+            task = asyncio.ensure_future(slow())
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_trial())
+        self.assertFalse(breaker.trial_running)
+        breaker.allow()
+
+    def test_interrupted_sync_trial_releases_breaker(self):
+        """Test that a KeyboardInterrupt in the trial frees the breaker."""
+        policy, breaker = self.half_open_policy()
+
+        @self.module.retry_on_failure(policy=policy)
+        def interrupted():
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            interrupted()
+        self.assertFalse(breaker.trial_running)
+        breaker.allow()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Unit tests for the statement_cache module and the pools' accounting.
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from connection_pool import AsyncConnectionPool, ConnectionPool
+from statement_cache import StatementCache
+
+
+class TestStatementCache(unittest.TestCase):
+    """Test cases for the mirrored statement cache.
+    """
+
+    def test_hits_misses_and_eviction(self):
+        """Test LRU hits and misses of application queries."""
+        cache = StatementCache(size=2)
+        for sql in ("SELECT a", "SELECT b", "SELECT a", "SELECT c",
+                    "SELECT b"):
+            cache.lookup(sql)
+        self.assertEqual(cache.stats.stats()["statement_hits"], 1)
+        self.assertEqual(cache.stats.stats()["statement_misses"], 4)
+
+    def test_transaction_control_is_not_counted(self):
+        """Test that BEGIN, SAVEPOINT and friends leave the counters."""
+        cache = StatementCache()
+        for sql in ("BEGIN", "SAVEPOINT operation", "release operation",
+                    "ROLLBACK TO operation", "COMMIT", "BEGIN"):
+            cache.lookup(sql)
+        stats = cache.stats.stats()
+        self.assertEqual(stats["statement_hits"], 0)
+        self.assertEqual(stats["statement_misses"], 0)
+
+
+class TestPoolStatementStats(unittest.TestCase):
+    """Test that the pools do not count their own statements.
+    """
+
+    def setUp(self):
+        """Create a database with one table."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.database = os.path.join(directory.name, "test.db")
+        with sqlite3.connect(self.database) as conn:
+            conn.execute("CREATE TABLE t (value INTEGER)")
+
+    def assert_counts(self, stats, hits, misses):
+        """Assert the statement counters of pool stats."""
+        self.assertEqual((stats["statement_hits"],
+                          stats["statement_misses"]), (hits, misses))
+
+    def test_checkouts_alone_count_nothing(self):
+        """Test that health checks and transactions are not lookups."""
+        pool = ConnectionPool(self.database, max_size=2)
+        self.addCleanup(pool.close)
+        for _ in range(5):
+            with pool.connection():
+                pass
+        with pool.connection() as conn:
+            conn.execute("BEGIN")
+            conn.execute("COMMIT")
+        self.assert_counts(pool.stats(), 0, 0)
+        for _ in range(3):
+            with pool.connection() as conn:
+                conn.execute("SELECT * FROM t").fetchall()
+        self.assert_counts(pool.stats(), 2, 1)
+
+    def test_async_checkouts_alone_count_nothing(self):
+        """Test the same for the asyncio pool."""
+        async def run():
+            pool = AsyncConnectionPool(self.database, max_size=2)
+            try:
+                for _ in range(5):
+                    async with pool.connection():
+                        pass
+                stats = pool.stats()
+                async with pool.connection() as conn:
+                    await conn.execute_fetchall("SELECT * FROM t")
+                return stats, pool.stats()
+            finally:
+                await pool.close()
+
+        idle, used = asyncio.run(run())
+        self.assert_counts(idle, 0, 0)
+        self.assert_counts(used, 0, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
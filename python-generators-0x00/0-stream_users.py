@@ -2,38 +2,58 @@
 """
 Module that provides a generator function to stream users from a database
 """
-import mysql.connector
+from backends import ERRORS, get_backend
+from checkpoint import checkpointed
 
 
-def stream_users():
+def stream_users(fetch_size=100, where=None, columns="*", checkpoint=None):
     """
     Generator function that streams rows from the user_data table one by one
     
+    Rows come from the shared backend (see backends.py). With MySQL a
+    single connection is held for the lifetime of the generator and an
+    unbuffered cursor reads `fetch_size` rows per network round trip, so
+    the first row arrives without waiting for the whole table. Closing the
+    generator early (e.g. with contextlib.closing around islice) releases
+    the connection immediately.
+    
+    Filtering and column selection are pushed down into the query, so
+    rows and columns that are not needed never leave the server.
+    
+    With a checkpoint, rows are read in user_id order starting after the
+    checkpoint's key and the checkpoint is saved periodically and when the
+    generator stops, so a later run picks up where this one stopped.
+    
+    Args:
+        fetch_size (int): Number of rows read per fetchmany call
+        where: (column, operator, value) triples, e.g. [("age", ">", 25)]
+        columns: "*" or a sequence of column names to select
+        checkpoint (Checkpoint): Resume after the last user_id recorded
+            in this checkpoint, and advance it as rows are consumed
+        
     Yields:
         One row at a time from the database as a dictionary
     """
+    # Resume after the checkpoint's key, in key order
+    order_by = None
+    if checkpoint is not None:
+        order_by = "user_id"
+        if checkpoint.key is not None:
+            where = list(where or ()) + [("user_id", ">", checkpoint.key)]
+    
+    # The backend holds one connection and streams with fetchmany
+    rows = get_backend().rows("user_data", where, columns, order_by,
+                              fetch_size)
+    if checkpoint is not None:
+        rows = checkpointed(rows, checkpoint, lambda row: row["user_id"])
+    
     try:
-        # Connect to the database
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="",
-            database="ALX_prodev"
-        )
-        
-        # Create a cursor that returns dictionaries
-        cursor = connection.cursor(dictionary=True)
-        
-        # Execute query to get all users
-        cursor.execute("SELECT * FROM user_data")
-        
         # Yield each row one by one - this is the only loop in the function
-        for row in cursor:
+        for row in rows:
             yield row
             
-        # Clean up (this code runs after the generator is exhausted)
-        cursor.close()
-        connection.close()
-        
-    except mysql.connector.Error as err:
+    except ERRORS as err:
         print(f"Error: {err}")
+    finally:
+        # Runs on exhaustion, on error and when the generator is closed
+        rows.close()
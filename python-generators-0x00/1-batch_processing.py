@@ -2,73 +2,106 @@
 """
 Module that provides functions to stream and process user data in batches
 """
-import mysql.connector
+from backends import ERRORS, get_backend, require_connections
+from checkpoint import checkpointed
+from columnar import batch_length, batch_rows, columnar_page
+from keyset import dict_page
+from sharding import sharded_batches
 
 
-def stream_users_in_batches(batch_size):
+def last_user_id(batch):
+    """Returns the user_id of the last row of a batch, in either format"""
+    if isinstance(batch, dict):
+        return batch["user_id"][-1].item()
+    return batch[-1]["user_id"]
+
+
+def rows_in_batch(batch):
+    """Returns the number of rows of a batch, in either format"""
+    return batch_length(batch) if isinstance(batch, dict) else len(batch)
+
+
+def stream_users_in_batches(batch_size, where=None, columns="*",
+                            columnar=False, checkpoint=None):
     """
     Generator function that fetches rows in batches from the user_data table
     
     Args:
         batch_size (int): Number of rows to fetch in each batch
+        where: (column, operator, value) triples filtered on the server
+        columns: "*" or a sequence of column names to select
+        columnar (bool): Yield columnar batches (dict of NumPy arrays)
+            instead of lists of row dictionaries
+        checkpoint (Checkpoint): Resume after the last user_id recorded
+            in this checkpoint, and advance it as batches are consumed
         
     Yields:
-        List of dictionaries, each representing a row from the database
+        List of dictionaries, each representing a row from the database,
+        or a dictionary mapping each column to an array when columnar
     """
+    # Page through the table by user_id instead of LIMIT/OFFSET so
+    # every batch costs the same regardless of its position
+    page = columnar_page if columnar else dict_page
+    after = checkpoint.key if checkpoint is not None else None
+    batches = get_backend().pages("user_data", batch_size, columns=columns,
+                                  where=where, after=after, page=page)
+    if checkpoint is not None:
+        batches = checkpointed(batches, checkpoint, last_user_id,
+                               rows_in_batch)
+    
     try:
-        # Connect to the database
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="",
-            database="ALX_prodev"
-        )
-        
-        # Create a cursor that returns dictionaries
-        cursor = connection.cursor(dictionary=True)
-        
-        # Get total number of rows
-        cursor.execute("SELECT COUNT(*) as count FROM user_data")
-        total_rows = cursor.fetchone()['count']
-        
-        # Process in batches
-        offset = 0
-        while offset < total_rows:
-            # Execute query to get a batch of users
-            cursor.execute(f"SELECT * FROM user_data LIMIT {batch_size} OFFSET {offset}")
-            batch = cursor.fetchall()
-            
-            # If no more rows, break the loop
-            if not batch:
-                break
-                
-            # Yield the batch
+        for batch in batches:
             yield batch
-            
-            # Update offset for next batch
-            offset += batch_size
-        
-        # Clean up
-        cursor.close()
-        connection.close()
-        
-    except mysql.connector.Error as err:
+    except ERRORS as err:
         print(f"Error: {err}")
+    finally:
+        # Release the connection even if the consumer stops early
+        batches.close()
 
 
-def batch_processing(batch_size):
+def batch_processing(batch_size, columnar=False, checkpoint=None,
+                     shards=None):
     """
     Processes each batch to filter users over the age of 25
     
     Args:
         batch_size (int): Number of rows to fetch in each batch
+        columnar (bool): Fetch columnar batches and filter them with a
+            vectorized comparison instead of filtering in the database
+        checkpoint (Checkpoint): Resume an interrupted run from this
+            checkpoint and keep it up to date
+        shards (int): Scan this many user_id ranges concurrently, each
+            over its own connection (batches then arrive unordered)
+
+    Raises:
+        ValueError: If shards is combined with columnar or checkpoint;
+            a single resume key cannot track interleaved shards
+        NoConnectionError: If shards is set with the memory backend
     """
-    # Stream users in batches
-    for batch in stream_users_in_batches(batch_size):
-        # Process each user in the batch
-        for user in batch:
-            # Filter users over the age of 25
-            if user['age'] > 25:
-                # Print the user with a blank line after each user for readability
+    if shards and columnar:
+        raise ValueError("shards cannot be combined with columnar batches")
+    if shards and checkpoint is not None:
+        raise ValueError("shards cannot be combined with a checkpoint")
+    if columnar:
+        # Filter each columnar batch with one vectorized comparison
+        for batch in stream_users_in_batches(batch_size, columnar=True,
+                                             checkpoint=checkpoint):
+            for user in batch_rows(batch, batch["age"] > 25):
                 print(user)
                 print()
+        return
+    
+    # Stream batches of users over the age of 25, filtered by the database
+    where = [("age", ">", 25)]
+    if shards:
+        connect = require_connections(get_backend(), "sharded scans")
+        batches = sharded_batches(connect, shards, batch_size, where)
+    else:
+        batches = stream_users_in_batches(batch_size, where=where,
+                                          checkpoint=checkpoint)
+    for batch in batches:
+        # Process each user in the batch
+        for user in batch:
+            # Print the user with a blank line after each user for readability
+            print(user)
+            print()
@@ -1,7 +1,10 @@
 #!/usr/bin/python3
+from contextlib import closing
 from itertools import islice
 stream_users = __import__('0-stream_users').stream_users
 
-# iterate over the generator function and print only the first 6 rows
-for user in islice(stream_users(), 6):
-    print(user)
+# iterate over the generator function and print only the first 6 rows,
+# closing it afterwards so its connection is released right away
+with closing(stream_users()) as users:
+    for user in islice(users, 6):
+        print(user)
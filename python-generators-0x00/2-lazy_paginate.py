@@ -2,51 +2,97 @@
 """
 Module that provides a generator function for lazy pagination of user data
 """
+from backends import get_backend
+from keyset import fetch_page
+from prefetch import prefetch
 seed = __import__('seed')
 
 
-def paginate_users(page_size, offset):
+def paginate_users(page_size, last_seen=None, connection=None):
     """
     Fetches a page of users from the database
     
     Args:
         page_size (int): Number of rows to fetch in each page
-        offset (int): Starting position for fetching rows
+        last_seen: user_id of the last row of the previous page,
+            None to fetch the first page
+        connection: Open connection to reuse, a new one is opened and
+            closed around the query when omitted
         
     Returns:
         List of dictionaries, each representing a row from the database
     """
+    if connection is not None:
+        return fetch_page(connection, "user_data", page_size, after=last_seen)
+    
+    backend = get_backend()
+    if not backend.has_connections:
+        # The memory backend pages its arrays itself
+        return next(backend.pages("user_data", page_size, after=last_seen),
+                    [])
+    
     connection = seed.connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
-    rows = cursor.fetchall()
-    connection.close()
-    return rows
+    try:
+        return fetch_page(connection, "user_data", page_size, after=last_seen)
+    finally:
+        connection.close()
 
 
 def lazy_pagination(page_size):
     """
     Generator function that implements lazy loading of paginated data
     
+    One connection is shared by every page and closed as soon as the
+    generator is exhausted or closed.
+    
     Args:
         page_size (int): Number of rows to fetch in each page
         
     Yields:
         List of dictionaries, each representing a page of data
     """
-    offset = 0
+    backend = get_backend()
+    if not backend.has_connections:
+        # The memory backend has no connection to share, it pages itself
+        yield from backend.pages("user_data", page_size)
+        return
     
-    # This is the only loop in the function
-    while True:
-        # Get the next page of data
-        page = paginate_users(page_size, offset)
-        
-        # If no more data, stop iteration
-        if not page:
-            break
+    connection = seed.connect_to_prodev()
+    last_seen = None
+    
+    try:
+        # This is the only loop in the function
+        while True:
+            # Get the page that follows the last user_id seen
+            page = paginate_users(page_size, last_seen, connection)
+            
+            # If no more data, stop iteration
+            if not page:
+                break
+                
+            # Yield the page
+            yield page
             
-        # Yield the page
-        yield page
+            # Resume after the last key of this page
+            last_seen = page[-1]["user_id"]
+    finally:
+        connection.close()
+
+
+def prefetched_pagination(page_size, depth=2):
+    """
+    Generator function that loads pages ahead of the consumer
+    
+    The pages of lazy_pagination are fetched by a background thread, up
+    to `depth` pages ahead, so the query for the next page runs while the
+    current one is being processed. Errors raised while fetching surface
+    in the consumer, and closing the generator stops the fetching.
+    
+    Args:
+        page_size (int): Number of rows to fetch in each page
+        depth (int): Maximum number of pages fetched ahead
         
-        # Update offset for next page
-        offset += page_size
+    Yields:
+        List of dictionaries, each representing a page of data
+    """
+    yield from prefetch(lazy_pagination(page_size), depth)
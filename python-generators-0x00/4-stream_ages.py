@@ -3,7 +3,13 @@
 Module that provides functions to calculate the average age of users
 in a memory-efficient way using generators
 """
-import mysql.connector
+from backends import ERRORS, get_backend, require_connections
+from columnar import np
+from functools import partial
+from reducers import Avg
+from sharding import sharded_aggregate
+from sketches import KLL, CountMin, HyperLogLog, email_domain
+batch_processing = __import__('1-batch_processing')
 
 
 def stream_user_ages():
@@ -13,51 +19,138 @@ def stream_user_ages():
     Yields:
         int: Age of a user
     """
+    ages = get_backend().rows("user_data", columns=["age"])
     try:
-        # Connect to the database
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="",
-            database="ALX_prodev"
-        )
-        
-        # Create a cursor
-        cursor = connection.cursor()
-        
-        # Execute query to get only the ages
-        cursor.execute("SELECT age FROM user_data")
-        
         # Yield each age one by one
-        for (age,) in cursor:
-            yield age
-            
-        # Clean up
-        cursor.close()
-        connection.close()
-        
-    except mysql.connector.Error as err:
+        for row in ages:
+            yield row["age"]
+    except ERRORS as err:
         print(f"Error: {err}")
+    finally:
+        ages.close()
 
 
-def calculate_average_age():
+def columnar_average_age(batch_size=1000):
+    """
+    Averages ages client side over columnar batches
+    
+    Each batch of ages is summed with one vectorized operation, so the
+    per-row Python work of stream_user_ages is avoided when the
+    aggregate cannot be left to the database.
+    
+    Args:
+        batch_size (int): Number of ages fetched per batch
+        
+    Returns:
+        float: Average age of users with an age, None if there are none
+    """
+    total_age = 0.0
+    count = 0
+    for batch in batch_processing.stream_users_in_batches(
+            batch_size, columns=["age"], columnar=True):
+        # NULL ages arrive as NaN and are skipped, as AVG() does
+        ages = batch["age"][~np.isnan(batch["age"])]
+        total_age += ages.sum()
+        count += len(ages)
+    return total_age / count if count else None
+
+
+def calculate_average_age(columnar=False, shards=None):
     """
     Calculates the average age without loading the entire dataset into memory
     
+    The average is computed by the backend (AVG pushed down into SQL, or
+    a vectorized mean in memory), so a single value crosses the wire
+    instead of every age. With
+    `columnar` the ages are streamed in columnar batches and averaged
+    with vectorized sums instead. With `shards` the table is split into
+    user_id ranges averaged in parallel processes and merged.
+    
+    Args:
+        columnar (bool): Average columnar batches client side
+        shards (int): Number of parallel shards to scan
+    
     Returns:
         float: Average age of users
+
+    Raises:
+        NoConnectionError: If shards is set with the memory backend
     """
-    total_age = 0
-    count = 0
+    if columnar:
+        average_age = columnar_average_age()
+        return report_average_age(average_age)
+    if shards:
+        connect = require_connections(get_backend(), "sharded scans")
+        average_age = sharded_aggregate(connect,
+                                        {"average": ("age", Avg)},
+                                        shards)["average"]
+        return report_average_age(average_age)
+    
+    try:
+        average_age = get_backend().aggregate("avg", "age")
+    except ERRORS as err:
+        print(f"Error: {err}")
+        return 0
+    
+    return report_average_age(average_age)
+
+
+def approximate_user_statistics(shards=None):
+    """
+    Computes median and p95 age plus email-domain statistics in one pass
     
-    # Use the generator to stream ages one by one
-    for age in stream_user_ages():
-        total_age += age
-        count += 1
+    Uses bounded-memory sketches (see sketches.py) instead of collecting
+    every value: KLL for the age quantiles, HyperLogLog for the number of
+    distinct email domains and Count-Min for the most common domains.
     
-    # Calculate and return the average age
-    if count > 0:
-        average_age = total_age / count
+    Args:
+        shards (int): Scan this many user_id ranges in parallel processes
+            and merge their sketches
+        
+    Returns:
+        dict: median_age, p95_age, distinct_domains and top_domains
+
+    Raises:
+        NoConnectionError: If shards is set with the memory backend
+    """
+    sketches = {
+        "ages": ("age", partial(KLL, 200, (0.5, 0.95))),
+        "distinct_domains": ("email", partial(HyperLogLog, 14,
+                                              key=email_domain)),
+        "top_domains": ("email", partial(CountMin, 2000, 5, 10,
+                                         key=email_domain)),
+    }
+    if shards:
+        connect = require_connections(get_backend(), "sharded scans")
+        results = sharded_aggregate(connect, sketches, shards)
+    else:
+        states = {name: factory() for name, (_, factory) in sketches.items()}
+        for user in get_backend().rows("user_data",
+                                       columns=["age", "email"]):
+            for name, (column, _) in sketches.items():
+                states[name].add(user[column])
+        results = {name: state.result() for name, state in states.items()}
+    
+    return {
+        "median_age": results["ages"][0.5],
+        "p95_age": results["ages"][0.95],
+        "distinct_domains": results["distinct_domains"],
+        "top_domains": results["top_domains"],
+    }
+
+
+def report_average_age(average_age):
+    """
+    Prints and returns the average age
+    
+    Args:
+        average_age: Average age, None if there are no users
+        
+    Returns:
+        float: Average age of users, 0 if there are none
+    """
+    if average_age is not None:
+        average_age = float(average_age)
         print(f"Average age of users: {average_age:.2f}")
         return average_age
     else:
@@ -0,0 +1,432 @@
+#!/usr/bin/python3
+"""
+Module that provides the storage backends shared by the generators
+
+Every backend offers the same streaming interface:
+
+- `rows(table_name, where, columns, order_by, fetch_size)` yields row
+  dictionaries one at a time
+- `pages(table_name, page_size, key, columns, where, after, page)` yields
+  keyset-ordered pages built by a page builder (see keyset.dict_page and
+  columnar.columnar_page)
+- `aggregate(function, column, where, group_by, table_name)` computes
+  avg/sum/count/min/max
+
+MySQLBackend and SQLiteBackend run SQL over DB-API connections (also
+available through `connect()`); MemoryBackend keeps tables in NumPy
+arrays (or loads them from pyarrow Tables) and evaluates predicates and
+aggregates with vectorized operations. It has no connection: its
+`connect()` raises NoConnectionError, and code that needs connections
+(sharded scans, seed.py) checks `has_connections` or calls
+`require_connections()` before starting.
+
+The backend used by the generators comes from `get_backend()`, which is
+configured from the environment:
+
+    ALX_BACKEND       mysql (default), sqlite or memory
+    ALX_DB_HOST       MySQL host (default: localhost)
+    ALX_DB_USER       MySQL user (default: root)
+    ALX_DB_PASSWORD   MySQL password (default: empty)
+    ALX_DB_NAME       MySQL database (default: ALX_prodev)
+    ALX_SQLITE_PATH   SQLite database file (default: ALX_prodev.db)
+    ALX_MEMORY_CSV    CSV loaded as user_data by the memory backend
+                      (default: user_data.csv next to this module)
+
+or explicitly with `set_backend()`.
+"""
+import csv
+import os
+import sqlite3
+
+from columnar import columnar_page, np
+from keyset import dict_page, keyset_pages, select_list
+from pushdown import OPERATORS, aggregate, identifier, reduce_rows, \
+    where_clause
+from streaming import fetchmany_rows, release
+
+try:
+    import mysql.connector
+except ImportError:
+    mysql = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Exceptions raised by any of the database drivers
+ERRORS = (sqlite3.Error,) + ((mysql.connector.Error,) if mysql else ())
+
+
+class NoConnectionError(TypeError):
+    """Raised when a DB-API connection is asked of the memory backend"""
+
+
+def require_connections(backend, purpose):
+    """
+    Checks that a backend can open DB-API connections
+
+    Args:
+        backend: Backend about to be used
+        purpose (str): What needs the connections, for the error message
+
+    Returns:
+        The backend's connect callable
+
+    Raises:
+        NoConnectionError: If the backend keeps its data in memory
+    """
+    if not backend.has_connections:
+        raise NoConnectionError(f"{purpose} need a SQL backend "
+                                "(ALX_BACKEND=mysql or sqlite), the memory "
+                                "backend has no database connection")
+    return backend.connect
+
+
+def build_select(connection, table_name, where=None, columns="*",
+                 order_by=None):
+    """
+    Builds a SELECT statement with pushed-down predicates
+
+    Returns:
+        tuple: (query, params)
+    """
+    if order_by:
+        select = select_list(columns, identifier(order_by))
+    elif columns == "*":
+        select = "*"
+    else:
+        select = ", ".join(map(identifier, columns))
+    query = f"SELECT {select} FROM {identifier(table_name)}"
+    condition, params = where_clause(connection, where)
+    if condition:
+        query += f" WHERE {condition}"
+    if order_by:
+        query += f" ORDER BY {order_by}"
+    return query, params
+
+
+class SQLBackend:
+    """Streaming interface implemented over DB-API connections"""
+
+    has_connections = True
+
+    def connect(self):
+        """Opens a new DB-API connection"""
+        raise NotImplementedError
+
+    def cursor(self, connection):
+        """Opens a cursor suited to streaming a large result"""
+        return connection.cursor()
+
+    def rows(self, table_name, where=None, columns="*", order_by=None,
+             fetch_size=100):
+        """
+        Generator function that streams rows over a single connection
+
+        Args:
+            table_name (str): Table to read
+            where: (column, operator, value) triples, or None
+            columns: "*" or a sequence of column names to select
+            order_by (str): Column to sort by (included in the columns)
+            fetch_size (int): Number of rows read per fetchmany call
+
+        Yields:
+            dict: One row at a time
+        """
+        connection = self.connect()
+        cursor = self.cursor(connection)
+        try:
+            cursor.execute(*build_select(connection, table_name, where,
+                                         columns, order_by))
+            names = [column[0] for column in cursor.description]
+            for row in fetchmany_rows(cursor, fetch_size):
+                yield dict(zip(names, row))
+        finally:
+            release(connection, cursor)
+
+    def pages(self, table_name, page_size, key="user_id", columns="*",
+              where=None, after=None, page=dict_page):
+        """
+        Generator function that pages through a table with keyset pagination
+
+        Takes the arguments of keyset.keyset_pages, without the connection.
+
+        Yields:
+            One page at a time, as built by `page`
+        """
+        connection = self.connect()
+        try:
+            yield from keyset_pages(connection, table_name, page_size, key,
+                                    columns, after, where, page)
+        finally:
+            connection.close()
+
+    def aggregate(self, function, column="*", where=None, group_by=None,
+                  table_name="user_data"):
+        """
+        Computes an aggregate in SQL, see pushdown.aggregate
+
+        Returns:
+            The aggregate value, or a dictionary of values per group
+        """
+        connection = self.connect()
+        try:
+            return aggregate(connection, function, column, where, group_by,
+                             table_name)
+        finally:
+            connection.close()
+
+
+class MySQLBackend(SQLBackend):
+    """MySQL server reached through mysql-connector-python"""
+
+    def __init__(self, host=None, user=None, password=None, database=None):
+        """
+        Args default to the ALX_DB_* environment variables, then to the
+        local development server. Pass database="" to connect to the
+        server without selecting a database.
+        """
+        env = os.environ
+        self.host = host or env.get("ALX_DB_HOST", "localhost")
+        self.user = user or env.get("ALX_DB_USER", "root")
+        self.password = password if password is not None \
+            else env.get("ALX_DB_PASSWORD", "")
+        self.database = database if database is not None \
+            else env.get("ALX_DB_NAME", "ALX_prodev")
+
+    def connect(self):
+        """Opens a new MySQL connection"""
+        if mysql is None:
+            raise ImportError("the MySQL backend requires "
+                              "mysql-connector-python")
+        options = {"host": self.host, "user": self.user,
+                   "password": self.password}
+        if self.database:
+            options["database"] = self.database
+        return mysql.connector.connect(**options)
+
+    def cursor(self, connection):
+        """Opens an unbuffered cursor reading rows off the socket"""
+        return connection.cursor(buffered=False)
+
+
+class SQLiteBackend(SQLBackend):
+    """SQLite database file"""
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): Database file (default: ALX_SQLITE_PATH, then
+                ALX_prodev.db)
+        """
+        self.path = path or os.environ.get("ALX_SQLITE_PATH",
+                                           "ALX_prodev.db")
+
+    def connect(self):
+        """Opens a new SQLite connection"""
+        return sqlite3.connect(self.path)
+
+
+class MemoryBackend:
+    """Tables held in memory as NumPy arrays, one per column"""
+
+    has_connections = False
+
+    def __init__(self, tables):
+        """
+        Args:
+            tables (dict): Table name -> data, given as a pyarrow Table, a
+                dictionary of column name -> array, or a list of row
+                dictionaries
+        """
+        if np is None:
+            raise ImportError("the memory backend requires numpy")
+        self.tables = {name: self.to_columns(data)
+                       for name, data in tables.items()}
+
+    @staticmethod
+    def to_columns(data):
+        """Converts table data to a dictionary of NumPy arrays"""
+        if pyarrow is not None and isinstance(data, pyarrow.Table):
+            return {name: data.column(name).to_numpy(zero_copy_only=False)
+                    for name in data.column_names}
+        if isinstance(data, dict):
+            return {name: np.asarray(values) for name, values in data.items()}
+        if not data:
+            return {}
+        names = list(data[0])
+        return columnar_page(names, [tuple(row[name] for name in names)
+                                     for row in data])
+
+    @classmethod
+    def from_csv(cls, path, table_name="user_data"):
+        """
+        Loads a CSV file as a table; numeric columns become float64
+
+        Args:
+            path (str): CSV file with a header row
+            table_name (str): Name given to the table
+
+        Returns:
+            MemoryBackend
+        """
+        with open(path, newline="") as file:
+            rows = list(csv.DictReader(file))
+        columns = {}
+        for name in (rows[0] if rows else ()):
+            values = [row[name] for row in rows]
+            try:
+                columns[name] = np.array(values, dtype=np.float64)
+            except ValueError:
+                columns[name] = np.array(values, dtype=str)
+        return cls({table_name: columns})
+
+    def connect(self):
+        """
+        In-memory tables have no DB-API connection
+
+        Raises:
+            NoConnectionError: Always; use rows(), pages() or aggregate()
+        """
+        raise NoConnectionError("the memory backend has no database "
+                                "connection")
+
+    def select(self, table_name, where=None, order_by=None, after=None):
+        """
+        Returns the positions of the rows matching predicates, in order
+
+        Args:
+            table_name (str): Table to read
+            where: (column, operator, value) triples, or None
+            order_by (str): Column to sort the positions by, or None
+            after: Only keep rows whose order_by value is greater
+
+        Returns:
+            NumPy array of row positions
+        """
+        table = self.tables[table_name]
+        length = len(next(iter(table.values()))) if table else 0
+        mask = np.ones(length, dtype=bool)
+        for column, op, value in where or ():
+            if op not in OPERATORS:
+                raise ValueError(f"Unsupported operator: {op!r}")
+            mask &= OPERATORS[op](table[column], value)
+        if after is not None:
+            mask &= table[order_by] > after
+        positions = np.flatnonzero(mask)
+        if order_by:
+            order = np.argsort(table[order_by][positions], kind="stable")
+            positions = positions[order]
+        return positions
+
+    def chunk(self, table_name, names, positions):
+        """Returns the rows at the given positions as a list of tuples"""
+        table = self.tables[table_name]
+        return list(zip(*(table[name][positions].tolist()
+                          for name in names)))
+
+    def column_names(self, table_name, columns, key=None):
+        """Resolves "*" and makes sure the key column is selected"""
+        names = list(self.tables[table_name]) if columns == "*" \
+            else list(columns)
+        if key and key not in names:
+            names.append(key)
+        return names
+
+    def rows(self, table_name, where=None, columns="*", order_by=None,
+             fetch_size=100):
+        """
+        Generator function that streams rows of an in-memory table
+
+        Takes the same arguments as SQLBackend.rows.
+
+        Yields:
+            dict: One row at a time
+        """
+        names = self.column_names(table_name, columns, order_by)
+        positions = self.select(table_name, where, order_by)
+        for start in range(0, len(positions), fetch_size):
+            chunk = self.chunk(table_name, names,
+                               positions[start:start + fetch_size])
+            for row in chunk:
+                yield dict(zip(names, row))
+
+    def pages(self, table_name, page_size, key="user_id", columns="*",
+              where=None, after=None, page=dict_page):
+        """
+        Generator function that pages through an in-memory table by key
+
+        Takes the same arguments as SQLBackend.pages.
+
+        Yields:
+            One page at a time, as built by `page`
+        """
+        names = self.column_names(table_name, columns, key)
+        positions = self.select(table_name, where, key, after)
+        for start in range(0, len(positions), page_size):
+            yield page(names, self.chunk(table_name, names,
+                                         positions[start:start + page_size]))
+
+    def aggregate(self, function, column="*", where=None, group_by=None,
+                  table_name="user_data"):
+        """
+        Computes avg/sum/count/min/max with vectorized operations
+
+        Grouped aggregates are reduced in Python over the matching rows.
+
+        Returns:
+            The aggregate value, or a dictionary of values per group
+        """
+        if group_by:
+            return reduce_rows(self.rows(table_name, where), function,
+                               column, group_by=group_by)
+        positions = self.select(table_name, where)
+        if function == "count":
+            return len(positions)
+        if not len(positions):
+            return None
+        values = self.tables[table_name][column][positions]
+        reducers = {"avg": np.mean, "sum": np.sum, "min": np.min,
+                    "max": np.max}
+        if function not in reducers:
+            raise ValueError(f"Unsupported aggregate: {function!r}")
+        return reducers[function](values).item()
+
+
+_backend = None
+
+
+def backend_from_env():
+    """Creates the backend selected by the ALX_BACKEND variable"""
+    name = os.environ.get("ALX_BACKEND", "mysql")
+    if name == "mysql":
+        return MySQLBackend()
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name == "memory":
+        default = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               "user_data.csv")
+        return MemoryBackend.from_csv(os.environ.get("ALX_MEMORY_CSV",
+                                                     default))
+    raise ValueError(f"Unknown ALX_BACKEND: {name!r}")
+
+
+def get_backend():
+    """Returns the backend shared by the generators"""
+    global _backend
+    if _backend is None:
+        _backend = backend_from_env()
+    return _backend
+
+
+def set_backend(backend):
+    """
+    Replaces the backend shared by the generators
+
+    Args:
+        backend: MySQLBackend, SQLiteBackend, MemoryBackend, or None to go
+            back to the one configured by the environment
+    """
+    global _backend
+    _backend = backend
@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+"""
+Benchmark comparing aggregates pushed down into SQL with Python reductions
+
+For each workload the pushdown path runs one SQL statement, the Python
+path streams the needed columns and reduces them client side. Bytes
+transferred are estimated as the length of every value in its text
+form, which is how MySQL's text protocol sends result sets.
+
+Usage:
+    ./bench_aggregate.py [--rows N]
+"""
+import argparse
+import time
+
+from bench_keyset import build_sqlite
+from keyset import dict_page
+from pushdown import aggregate
+from streaming import fetchmany_rows
+
+WORKLOADS = [
+    ("avg(age)", "avg", "age", None, None),
+    ("count where age > 25", "count", "*", [("age", ">", 25)], None),
+    ("max(age) group by bucket", "max", "age", None, "bucket"),
+]
+
+
+def payload_bytes(rows):
+    """Estimates the bytes needed to send rows in MySQL's text protocol"""
+    return sum(len(str(value).encode()) for row in rows
+               for value in (row.values() if isinstance(row, dict) else row))
+
+
+def needed_columns(column, where, group_by):
+    """Returns the columns the Python path has to fetch for a workload"""
+    columns = {name for name, _, _ in where or ()}
+    if group_by:
+        columns.add(group_by)
+    if column != "*":
+        columns.add(column)
+    return sorted(columns) or ["user_id"]
+
+
+def stream_columns(connection, columns):
+    """Generator that streams the given columns as row dictionaries"""
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT {', '.join(columns)} FROM user_data")
+    names = [description[0] for description in cursor.description]
+    for row in fetchmany_rows(cursor, 1000):
+        yield dict_page(names, [row])[0]
+    cursor.close()
+
+
+def main():
+    """Runs every workload through both paths and prints the results"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    connection = build_sqlite(args.rows)
+    connection.execute("ALTER TABLE user_data ADD COLUMN bucket INTEGER")
+    connection.execute("UPDATE user_data SET bucket = age % 10")
+    connection.commit()
+
+    print(f"{'workload':<36} {'path':<9} {'ms':>10} {'bytes':>12}")
+    for label, function, column, where, group_by in WORKLOADS:
+        start = time.perf_counter()
+        result = aggregate(connection, function, column, where, group_by)
+        elapsed = (time.perf_counter() - start) * 1000
+        sent = payload_bytes(result.items() if group_by else [(result,)])
+        print(f"{label:<36} {'pushdown':<9} {elapsed:>10.2f} {sent:>12}")
+
+        columns = needed_columns(column, where, group_by)
+        start = time.perf_counter()
+        aggregate(stream_columns(connection, columns),
+                  function, column, where, group_by)
+        elapsed = (time.perf_counter() - start) * 1000
+        sent = payload_bytes(stream_columns(connection, columns))
+        print(f"{'':<36} {'python':<9} {elapsed:>10.2f} {sent:>12}")
+
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
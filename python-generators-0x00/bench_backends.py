@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+"""
+Benchmark running the same pipelines on every backend
+
+The same generated user_data rows are loaded into a SQLite file and an
+in-memory backend (and read from ALX_prodev with --mysql), then each
+backend streams rows, pages through the table and computes an
+aggregate, so results are reproducible on a single machine.
+
+Usage:
+    ./bench_backends.py [--rows N] [--mysql]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from backends import MemoryBackend, MySQLBackend, SQLiteBackend
+from bench_keyset import build_sqlite
+from keyset import dict_page
+
+WHERE = [("age", ">", 25)]
+
+PIPELINES = {
+    "rows": lambda backend: sum(1 for _ in backend.rows("user_data")),
+    "rows where": lambda backend: sum(
+        1 for _ in backend.rows("user_data", WHERE)),
+    "pages": lambda backend: sum(
+        len(page) for page in backend.pages("user_data", 1000,
+                                            page=dict_page)),
+    "avg where": lambda backend: backend.aggregate("avg", "age", WHERE),
+}
+
+
+def main():
+    """Times every pipeline on every backend"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--mysql", action="store_true",
+                        help="also run against the configured MySQL server")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "users.db")
+        source = build_sqlite(args.rows)
+        disk = sqlite3.connect(path)
+        source.backup(disk)
+        disk.close()
+
+        cursor = source.execute("SELECT * FROM user_data")
+        names = [column[0] for column in cursor.description]
+        rows = [dict(zip(names, row)) for row in cursor]
+        source.close()
+
+        backends = {"sqlite": SQLiteBackend(path),
+                    "memory": MemoryBackend({"user_data": rows})}
+        if args.mysql:
+            backends["mysql"] = MySQLBackend()
+        del rows
+
+        print(f"{'pipeline':<12}" + "".join(f"{name:>12}"
+                                            for name in backends))
+        for label, pipeline in PIPELINES.items():
+            timings = []
+            for backend in backends.values():
+                start = time.perf_counter()
+                pipeline(backend)
+                timings.append((time.perf_counter() - start) * 1000)
+            print(f"{label:<12}" + "".join(f"{ms:>10.1f}ms"
+                                           for ms in timings))
+
+
+if __name__ == "__main__":
+    main()
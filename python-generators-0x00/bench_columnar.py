@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+"""
+Benchmark comparing row-dictionary batches with columnar batches
+
+Uses tracemalloc to count the memory blocks (allocations) held per row
+by one batch in each format, then times filtering age > 25 and
+averaging age over the whole table.
+
+Usage:
+    ./bench_columnar.py [--rows N] [--batch-size N]
+"""
+import argparse
+import time
+import tracemalloc
+
+from bench_keyset import build_sqlite
+from columnar import batch_length, columnar_page
+from keyset import dict_page, fetch_rows, keyset_pages
+
+
+def held_by_batch(connection, page, batch_size):
+    """
+    Measures the blocks and bytes a single batch keeps alive
+
+    Returns:
+        tuple: (blocks per row, bytes per row)
+    """
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    names, rows = fetch_rows(connection, "user_data", batch_size)
+    batch = page(names, rows)
+    del names, rows
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+    count = batch_length(batch) if isinstance(batch, dict) else len(batch)
+    return blocks / count, size / count
+
+
+def dict_scan(connection, batch_size):
+    """Filters and averages over row-dictionary batches"""
+    total, count, over_25 = 0, 0, 0
+    for batch in keyset_pages(connection, "user_data", batch_size):
+        for user in batch:
+            total += user["age"]
+            count += 1
+            if user["age"] > 25:
+                over_25 += 1
+    return total / count, over_25
+
+
+def columnar_scan(connection, batch_size):
+    """Filters and averages over columnar batches"""
+    total, count, over_25 = 0.0, 0, 0
+    for batch in keyset_pages(connection, "user_data", batch_size,
+                              page=columnar_page):
+        ages = batch["age"]
+        total += ages.sum()
+        count += len(ages)
+        over_25 += int((ages > 25).sum())
+    return total / count, over_25
+
+
+def main():
+    """Runs the measurements and prints them side by side"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    connection = build_sqlite(args.rows)
+    print(f"{'format':<10} {'blocks/row':>11} {'bytes/row':>10} "
+          f"{'scan ms':>10}")
+    for label, page, scan in (("dict", dict_page, dict_scan),
+                              ("columnar", columnar_page, columnar_scan)):
+        blocks, size = held_by_batch(connection, page, args.batch_size)
+        start = time.perf_counter()
+        scan(connection, args.batch_size)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{label:<10} {blocks:>11.2f} {size:>10.0f} {elapsed:>10.1f}")
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
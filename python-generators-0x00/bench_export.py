@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+"""
+Benchmark of the streaming exporter against printing every row
+
+The print path mimics 3-main.py (print(user) for every row, stdout sent
+to a file); the other paths run export_users for each format.
+
+Usage:
+    ./bench_export.py [--rows N]
+"""
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+
+from bench_keyset import build_sqlite
+from export import export_users, pyarrow
+from keyset import keyset_pages
+
+TARGETS = ["users.csv", "users.ndjson", "users.csv.gz", "users.ndjson.gz"]
+
+
+def print_export(connection, path):
+    """Exports by printing each row, as 3-main.py does"""
+    with open(path, "w") as file, contextlib.redirect_stdout(file):
+        for page in keyset_pages(connection, "user_data", 1000):
+            for user in page:
+                print(user)
+
+
+def main():
+    """Times every export path and prints rows/s and file sizes"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    connection = build_sqlite(args.rows)
+    targets = TARGETS + (["users.parquet"] if pyarrow else [])
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'path':<18} {'seconds':>8} {'rows/s':>10} {'KiB':>8}")
+        for name in ["print.txt"] + targets:
+            path = os.path.join(directory, name)
+            start = time.perf_counter()
+            if name == "print.txt":
+                print_export(connection, path)
+            else:
+                export_users(connection, path, progress=None)
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(path) / 1024
+            print(f"{name:<18} {elapsed:>8.2f} "
+                  f"{args.rows / elapsed:>10.0f} {size:>8.0f}")
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/python3
+"""
+Benchmark comparing LIMIT/OFFSET pagination with keyset pagination
+
+Times individual pages taken at increasing depths into user_data. With
+OFFSET the cost grows with the depth, with keyset it stays flat.
+
+Usage:
+    ./bench_keyset.py [--rows N] [--page-size N] [--mysql]
+"""
+import argparse
+import sqlite3
+import time
+import uuid
+
+from keyset import fetch_page
+
+
+def build_sqlite(rows):
+    """
+    Creates an in-memory SQLite user_data table filled with fake users
+
+    Args:
+        rows (int): Number of rows to generate
+
+    Returns:
+        sqlite3 connection object
+    """
+    connection = sqlite3.connect(":memory:")
+    connection.execute("""
+        CREATE TABLE user_data (
+            user_id VARCHAR(36) PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            email VARCHAR(255) NOT NULL,
+            age DECIMAL NOT NULL
+        )
+    """)
+    connection.executemany(
+        "INSERT INTO user_data VALUES (?, ?, ?, ?)",
+        ((str(uuid.uuid4()), f"User {i}", f"user{i}@example.com", i % 100)
+         for i in range(rows))
+    )
+    connection.commit()
+    return connection
+
+
+def key_at(connection, depth):
+    """Returns the user_id found just before a given depth"""
+    cursor = connection.cursor()
+    cursor.execute(
+        f"SELECT user_id FROM user_data ORDER BY user_id "
+        f"LIMIT 1 OFFSET {depth - 1}"
+    )
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row else None
+
+
+def time_offset_page(connection, page_size, depth):
+    """Times one LIMIT/OFFSET page starting at a given depth"""
+    cursor = connection.cursor()
+    start = time.perf_counter()
+    cursor.execute(
+        f"SELECT * FROM user_data ORDER BY user_id "
+        f"LIMIT {page_size} OFFSET {depth}"
+    )
+    cursor.fetchall()
+    elapsed = time.perf_counter() - start
+    cursor.close()
+    return elapsed
+
+
+def time_keyset_page(connection, page_size, depth):
+    """Times one keyset page starting at a given depth"""
+    after = key_at(connection, depth) if depth else None
+    start = time.perf_counter()
+    fetch_page(connection, "user_data", page_size, after=after)
+    return time.perf_counter() - start
+
+
+def main():
+    """Runs the benchmark and prints per-page latency for each depth"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--mysql", action="store_true",
+                        help="run against ALX_prodev instead of SQLite")
+    args = parser.parse_args()
+
+    if args.mysql:
+        seed = __import__('seed')
+        connection = seed.connect_to_prodev()
+        cursor = connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM user_data")
+        rows = cursor.fetchone()[0]
+        cursor.close()
+    else:
+        connection = build_sqlite(args.rows)
+        rows = args.rows
+
+    print(f"{'depth':>10} {'offset ms':>12} {'keyset ms':>12}")
+    depth = 0
+    while depth < rows:
+        offset_ms = time_offset_page(connection, args.page_size, depth) * 1000
+        keyset_ms = time_keyset_page(connection, args.page_size, depth) * 1000
+        print(f"{depth:>10} {offset_ms:>12.3f} {keyset_ms:>12.3f}")
+        depth = depth * 2 if depth else args.page_size
+
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+"""
+Benchmark showing prefetching overlap query latency with processing
+
+A simulated paginator sleeps for the query latency before each page and
+the consumer sleeps for the processing time of each page. Without
+prefetching both add up; with it the total approaches the larger one.
+
+Usage:
+    ./bench_prefetch.py [--pages N] [--query-ms N] [--process-ms N]
+"""
+import argparse
+import time
+
+from prefetch import prefetch
+
+
+def slow_pages(pages, query_ms):
+    """Generator that simulates a paginator with a fixed query latency"""
+    for number in range(pages):
+        time.sleep(query_ms / 1000)
+        yield [number]
+
+
+def consume(pages, process_ms):
+    """Processes each page, simulating work, and returns the elapsed ms"""
+    start = time.perf_counter()
+    for _ in pages:
+        time.sleep(process_ms / 1000)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    """Times the consumer with and without prefetching"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--query-ms", type=float, default=10)
+    parser.add_argument("--process-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    plain = consume(slow_pages(args.pages, args.query_ms), args.process_ms)
+    print(f"{'no prefetch':<14} {plain:>10.1f} ms")
+    for depth in (1, 2, 4):
+        pages = prefetch(slow_pages(args.pages, args.query_ms), depth)
+        elapsed = consume(pages, args.process_ms)
+        print(f"{f'prefetch {depth}':<14} {elapsed:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+"""
+Benchmark of sharded scans over a growing number of shards
+
+Builds a SQLite copy of user_data in a temporary file, then computes
+count/sum/min/max/average and an age histogram with 1, 2, 4, ... shards
+scanned in separate processes, each over its own connection.
+
+Usage:
+    ./bench_sharding.py [--rows N] [--max-shards N]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from functools import partial
+
+from bench_keyset import build_sqlite
+from reducers import Avg, Count, Histogram, Max, Min, Sum
+from sharding import sharded_aggregate
+
+REDUCERS = {
+    "count": ("*", Count),
+    "sum": ("age", Sum),
+    "min": ("age", Min),
+    "max": ("age", Max),
+    "average": ("age", Avg),
+    "histogram": ("age", partial(Histogram, 10)),
+}
+
+
+def main():
+    """Runs the sharded aggregate with more and more shards"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=400000)
+    parser.add_argument("--max-shards", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "users.db")
+        memory = build_sqlite(args.rows)
+        disk = sqlite3.connect(path)
+        memory.backup(disk)
+        disk.close()
+        memory.close()
+        connect = partial(sqlite3.connect, path)
+
+        baseline = None
+        shards = 1
+        print(f"{'shards':>6} {'seconds':>9} {'rows/s':>10}")
+        while shards <= args.max_shards:
+            start = time.perf_counter()
+            result = sharded_aggregate(connect, REDUCERS, shards)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or result
+            assert result == baseline, "shards disagree"
+            print(f"{shards:>6} {elapsed:>9.2f} "
+                  f"{args.rows / elapsed:>10.0f}")
+            shards *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+"""
+Accuracy and memory check of the streaming sketches
+
+Feeds generated data to each sketch, both in one pass and as merged
+shards, compares the answers with exact values and checks them against
+the error bounds documented in sketches.py. Exits with status 1 if a
+bound is exceeded.
+
+Usage:
+    ./bench_sketches.py [--values N] [--shards N] [--seed N]
+"""
+import argparse
+import math
+import pickle
+import random
+import sys
+from collections import Counter
+
+from sketches import KLL, CountMin, HyperLogLog
+
+
+def build(factory, values, shards):
+    """Builds a sketch from values split into merged shards"""
+    parts = [factory() for _ in range(shards)]
+    for index, value in enumerate(values):
+        parts[index % shards].add(value)
+    sketch = parts[0]
+    for part in parts[1:]:
+        sketch.merge(pickle.loads(pickle.dumps(part)))
+    return sketch
+
+
+def check(label, error, bound):
+    """Prints one measurement and returns whether it is within the bound"""
+    ok = error <= bound
+    print(f"{label:<28} error {error:>9.5f}  bound {bound:>9.5f}  "
+          f"{'ok' if ok else 'EXCEEDED'}")
+    return ok
+
+
+def main():
+    """Measures every sketch and reports the errors"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--values", type=int, default=200000)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ages = [rng.uniform(18, 120) for _ in range(args.values)]
+    domains = [f"domain{int(rng.paretovariate(1.2))}.com"
+               for _ in range(args.values)]
+    ok = True
+
+    for shards in (1, args.shards):
+        print(f"-- {shards} shard(s)")
+        kll = build(lambda: KLL(200, seed=args.seed), ages, shards)
+        ordered = sorted(ages)
+        for q in (0.5, 0.95):
+            value = kll.quantile(q)
+            # Rank error: distance between q and the ranks the value spans
+            low = sum(1 for age in ordered if age < value) / len(ordered)
+            high = sum(1 for age in ordered if age <= value) / len(ordered)
+            error = max(0.0, low - q, q - high)
+            ok &= check(f"KLL p{int(q * 100)} rank", error, 1.7 / 200)
+        print(f"{'KLL values kept':<28} {kll.size} of {kll.count}")
+
+        hll = build(lambda: HyperLogLog(14), domains, shards)
+        exact = len(set(domains))
+        error = abs(hll.result() - exact) / exact
+        # Three standard errors
+        ok &= check("HyperLogLog distinct", error, 3 * 1.04 / math.sqrt(2 ** 14))
+
+        cms = build(lambda: CountMin(2000, 5, 10), domains, shards)
+        counts = Counter(domains)
+        error = max(cms.estimate(value) - count
+                    for value, count in counts.items()) / len(domains)
+        ok &= check("CountMin overestimate", error, math.e / 2000)
+        exact_top = [value for value, _ in counts.most_common(5)]
+        found = [value for value, _ in cms.result()[:5]]
+        print(f"{'CountMin top 5 found':<28} "
+              f"{len(set(exact_top) & set(found))} of 5")
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+"""
+Micro-benchmarks of Stream pipelines against hand-written generators
+
+Each workload runs three ways over the same in-memory rows: a
+hand-written generator like the ones in this package, one generator per
+stage chained together, and a fused Stream pipeline.
+
+Usage:
+    ./bench_stream.py [--rows N] [--repeat N]
+"""
+import argparse
+import time
+
+from reducers import Avg
+from stream import Stream
+
+
+def make_rows(count):
+    """Builds fake user rows"""
+    return [{"user_id": str(i), "name": f"User {i}",
+             "email": f"user{i}@example.com", "age": i % 100}
+            for i in range(count)]
+
+
+def over_25(user):
+    """Stage predicate of the chained variant"""
+    return user["age"] > 25
+
+
+def email_ends_in_7(user):
+    """Stage predicate shared by the chained and streamed variants"""
+    return user["email"].endswith("7@example.com")
+
+
+def age(user):
+    """Stage mapping shared by the chained and streamed variants"""
+    return user["age"]
+
+
+def hand_written(rows):
+    """Average age of users over 25 whose email ends in 7, one loop"""
+    total = count = 0
+    for user in rows:
+        if user["age"] > 25 and user["email"].endswith("7@example.com"):
+            total += user["age"]
+            count += 1
+    return total / count
+
+
+def chained(rows):
+    """Same workload with one generator per stage"""
+    older = (user for user in rows if over_25(user))
+    matching = (user for user in older if email_ends_in_7(user))
+    ages = (age(user) for user in matching)
+    reducer = Avg()
+    for value in ages:
+        reducer.add(value)
+    return reducer.result()
+
+
+def streamed(rows):
+    """Same workload as a Stream pipeline"""
+    return (Stream(rows)
+            .filter(("age", ">", 25))
+            .filter(email_ends_in_7)
+            .map(age)
+            .reduce(Avg()))
+
+
+def main():
+    """Times every variant and prints the results"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    print(f"{'variant':<14} {'best ms':>8}")
+    for variant in (hand_written, chained, streamed):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            variant(rows)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{variant.__name__:<14} {min(timings):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+"""
+Benchmark of time to first row and peak memory for streamed scans
+
+Compares a buffered scan (fetchall) with fetchmany-sized streaming over
+tables of growing size. The streamed figures should not grow with the
+table.
+
+Usage:
+    ./bench_streaming.py [--fetch-size N]
+"""
+import argparse
+import time
+import tracemalloc
+
+from bench_keyset import build_sqlite
+from streaming import fetchmany_rows
+
+
+def buffered_scan(connection, fetch_size):
+    """Generator that loads the whole table before yielding a row"""
+    cursor = connection.cursor()
+    cursor.execute("SELECT * FROM user_data")
+    yield from cursor.fetchall()
+    cursor.close()
+
+
+def streamed_scan(connection, fetch_size):
+    """Generator that reads the table fetch_size rows at a time"""
+    cursor = connection.cursor()
+    cursor.execute("SELECT * FROM user_data")
+    yield from fetchmany_rows(cursor, fetch_size)
+    cursor.close()
+
+
+def measure(scan, connection, fetch_size):
+    """
+    Runs a full scan and measures it
+
+    Returns:
+        tuple: (time to first row in ms, peak traced memory in KiB)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = scan(connection, fetch_size)
+    next(rows)
+    first_row_ms = (time.perf_counter() - start) * 1000
+    for _ in rows:
+        pass
+    peak = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+    return first_row_ms, peak
+
+
+def main():
+    """Runs both scans over growing tables and prints the measurements"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fetch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'buffered ttfr ms':>17} {'buffered KiB':>13} "
+          f"{'streamed ttfr ms':>17} {'streamed KiB':>13}")
+    for rows in (1000, 10000, 100000):
+        connection = build_sqlite(rows)
+        buffered = measure(buffered_scan, connection, args.fetch_size)
+        streamed = measure(streamed_scan, connection, args.fetch_size)
+        print(f"{rows:>8} {buffered[0]:>17.3f} {buffered[1]:>13.0f} "
+              f"{streamed[0]:>17.3f} {streamed[1]:>13.0f}")
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
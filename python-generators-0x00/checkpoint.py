@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+"""
+Module that provides resumable checkpoints for long-running scans
+
+A checkpoint records the last key a scan has handed out and confirmed,
+plus the number of rows behind it, in a small JSON state file. A scan
+restarted with the same checkpoint resumes with `WHERE key > last_key`,
+so an interrupted run continues where it stopped.
+
+Resuming only continues past the last key: it does not find rows added
+since. user_id is a random UUID, so a row inserted after a run may sort
+below the saved key and is never read by the resumed scan; call
+Checkpoint.reset() to scan the whole table again.
+"""
+import json
+import os
+import time
+
+
+class Checkpoint:
+    """Position of a resumable scan, persisted to a local state file"""
+
+    def __init__(self, path, every=1000):
+        """
+        Loads the checkpoint stored at path, if there is one
+
+        Args:
+            path (str): Location of the JSON state file
+            every (int): Number of rows between two automatic saves
+        """
+        self.path = path
+        self.every = every
+        self.key = None
+        self.rows = 0
+        self.saved_rows = 0
+        if os.path.exists(path):
+            with open(path) as file:
+                state = json.load(file)
+            self.key = state["key"]
+            self.rows = self.saved_rows = state["rows"]
+
+    def advance(self, key, rows=1):
+        """
+        Records that rows up to and including key have been processed
+
+        Args:
+            key: Key of the last processed row
+            rows (int): Number of rows processed since the last call
+        """
+        self.key = key
+        self.rows += rows
+        if self.rows - self.saved_rows >= self.every:
+            self.save()
+
+    def save(self):
+        """Writes the state file atomically"""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump({"key": self.key, "rows": self.rows,
+                       "saved_at": time.time()}, file)
+        os.replace(temp_path, self.path)
+        self.saved_rows = self.rows
+
+    def reset(self):
+        """Forgets the position so the next scan starts from the beginning"""
+        self.key = None
+        self.rows = self.saved_rows = 0
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def checkpointed(items, checkpoint, key_of, size_of=None):
+    """
+    Generator function that advances a checkpoint as items are consumed
+
+    An item counts as processed once the consumer asks for the next one
+    (or the source is exhausted). When the generator is closed early the
+    item the consumer was holding is not recorded, so it is delivered
+    again on resume rather than skipped.
+
+    Args:
+        items: Iterable of rows or pages, ordered by key
+        checkpoint (Checkpoint): Checkpoint to advance and save
+        key_of: Callable returning the last key of an item
+        size_of: Callable returning the number of rows in an item
+            (default: each item is one row)
+
+    Yields:
+        The items, unchanged
+    """
+    pending = None
+    try:
+        for item in items:
+            if pending is not None:
+                checkpoint.advance(*pending)
+            pending = (key_of(item), size_of(item) if size_of else 1)
+            yield item
+        if pending is not None:
+            checkpoint.advance(*pending)
+    finally:
+        checkpoint.save()
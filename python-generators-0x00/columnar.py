@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+"""
+Module that provides columnar batches backed by NumPy arrays
+
+A batch of row dictionaries costs one dictionary plus one Python object
+per value. A columnar batch stores each column in a single array:
+numbers as float64 and strings as a fixed-width unicode array, so the
+number of objects no longer grows with the number of rows and filters
+or aggregates run as vectorized operations.
+
+NULLs in a numeric column are stored as NaN. A column holding NULLs
+among strings, or values of mixed types, falls back to an object array.
+
+NumPy is only needed when columnar batches are requested.
+"""
+from decimal import Decimal
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NUMERIC_TYPES = (int, float, Decimal)
+
+
+def columnar_page(names, rows):
+    """
+    Builds a columnar batch from column names and row tuples
+
+    Args:
+        names: Column names, in the order of the values in each row
+        rows: Non-empty list of row tuples
+
+    Returns:
+        dict: Column name -> NumPy array holding that column's values
+
+    Raises:
+        ImportError: If NumPy is not installed
+    """
+    if np is None:
+        raise ImportError("columnar batches require numpy "
+                          "(pip install numpy)")
+    batch = {}
+    for name, values in zip(names, zip(*rows)):
+        batch[name] = column_array(values)
+    return batch
+
+
+def column_array(values):
+    """
+    Builds the array of one column, typed from all of its non-NULL values
+
+    Args:
+        values: Sequence of the column's values, None for NULL
+
+    Returns:
+        A float64 array (NULL as NaN) if every value is a number, a
+        unicode array if every value is a string, an object array
+        otherwise
+    """
+    present = [value for value in values if value is not None]
+    if present and all(isinstance(value, NUMERIC_TYPES)
+                       for value in present):
+        return np.fromiter((np.nan if value is None else value
+                            for value in values),
+                           dtype=np.float64, count=len(values))
+    if len(present) == len(values) and all(isinstance(value, str)
+                                           for value in values):
+        return np.array(values, dtype=str)
+    return np.array(values, dtype=object)
+
+
+def python_value(value):
+    """Converts an array element back to a plain Python value (NaN to None)"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def batch_length(batch):
+    """Returns the number of rows in a columnar batch"""
+    return len(next(iter(batch.values()))) if batch else 0
+
+
+def batch_rows(batch, mask=None):
+    """
+    Generator function that turns (part of) a columnar batch back into rows
+
+    Args:
+        batch (dict): Columnar batch
+        mask: Optional boolean array selecting the rows to yield
+
+    Yields:
+        dict: One row at a time, with plain Python values (None for NULL)
+    """
+    indexes = range(batch_length(batch)) if mask is None \
+        else np.flatnonzero(mask)
+    for index in indexes:
+        yield {name: python_value(column[index])
+               for name, column in batch.items()}
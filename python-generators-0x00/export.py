@@ -0,0 +1,270 @@
+#!/usr/bin/python3
+"""
+Streaming exporter for user_data
+
+Pages through the table with keyset pagination and writes each page as
+soon as it arrives, so memory stays constant whatever the table size.
+Supported formats are CSV, newline-delimited JSON and Parquet (columnar,
+needs pyarrow). CSV and NDJSON can be compressed with gzip, bz2 or xz.
+
+Usage:
+    ./export.py users.csv.gz
+    ./export.py users.parquet --sqlite users.db
+"""
+import argparse
+import bz2
+import csv
+import gzip
+import io
+import json
+import lzma
+import sqlite3
+import sys
+import time
+from decimal import Decimal
+from functools import partial
+
+from backends import get_backend
+from keyset import keyset_pages
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+FORMATS = ("csv", "ndjson", "parquet")
+
+COMPRESSORS = {
+    "gzip": partial(gzip.open, compresslevel=6),
+    "bz2": bz2.open,
+    "xz": lzma.open,
+}
+
+SUFFIXES = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "xz",
+    ".csv": "csv",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".parquet": "parquet",
+}
+
+
+def guess_format(path):
+    """
+    Guesses the format and compression of an export from its file name
+
+    Args:
+        path (str): Output path, e.g. users.ndjson.gz
+
+    Returns:
+        tuple: (format, compression), compression is None if uncompressed
+    """
+    compression = None
+    for suffix, name in SUFFIXES.items():
+        if path.endswith(suffix) and name in COMPRESSORS:
+            compression = name
+            path = path[:-len(suffix)]
+    for suffix, name in SUFFIXES.items():
+        if path.endswith(suffix) and name in FORMATS:
+            return name, compression
+    return "csv", compression
+
+
+def open_text(path, compression=None, buffer_size=1 << 20):
+    """
+    Opens a buffered text file for writing, optionally compressed
+
+    Args:
+        path (str): Output path
+        compression (str): None, "gzip", "bz2" or "xz"
+        buffer_size (int): Size of the write buffer in bytes
+
+    Returns:
+        Text file object
+
+    Raises:
+        ValueError: If the compression is not one of COMPRESSORS
+    """
+    if compression is not None and compression not in COMPRESSORS:
+        raise ValueError(f"Unsupported compression for CSV/NDJSON: "
+                         f"{compression!r} (use one of "
+                         f"{', '.join(COMPRESSORS)})")
+    if compression is None:
+        return open(path, "w", buffering=buffer_size, newline="",
+                    encoding="utf-8")
+    raw = COMPRESSORS[compression](path, "wb")
+    return io.TextIOWrapper(io.BufferedWriter(raw, buffer_size),
+                            encoding="utf-8", newline="")
+
+
+def json_default(value):
+    """Serializes the values json does not know about (e.g. DECIMAL ages)"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() \
+            else float(value)
+    return str(value)
+
+
+def write_csv(pages, file):
+    """Writes pages of row dictionaries as CSV with a header row"""
+    rows = 0
+    writer = csv.writer(file)
+    for page in pages:
+        if not rows:
+            writer.writerow(page[0])
+        writer.writerows(map(dict.values, page))
+        rows += len(page)
+        yield rows
+
+
+def write_ndjson(pages, file):
+    """Writes pages of row dictionaries as one JSON object per line"""
+    rows = 0
+    encode = json.JSONEncoder(default=json_default,
+                              separators=(",", ":")).encode
+    for page in pages:
+        file.write("".join(encode(row) + "\n" for row in page))
+        rows += len(page)
+        yield rows
+
+
+def write_parquet(pages, path, compression=None):
+    """Writes pages of row dictionaries as Parquet row groups"""
+    if pyarrow is None:
+        raise ImportError("parquet export requires pyarrow "
+                          "(pip install pyarrow)")
+    rows = 0
+    writer = None
+    try:
+        for page in pages:
+            table = pyarrow.Table.from_pylist(page)
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(
+                    path, table.schema, compression=compression or "none")
+            writer.write_table(table)
+            rows += len(page)
+            yield rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def print_progress(rows, elapsed):
+    """Reports the rows written so far and the rate on stderr"""
+    rate = rows / elapsed if elapsed else 0
+    print(f"Exported {rows} rows in {elapsed:.2f}s ({rate:.0f} rows/s)",
+          file=sys.stderr)
+
+
+def export_pages(pages, path, fmt=None, compression=None,
+                 buffer_size=1 << 20, progress=print_progress, every=100000):
+    """
+    Writes pages of row dictionaries to a file in constant memory
+
+    Args:
+        pages: Iterable of lists of row dictionaries
+        path (str): Output path
+        fmt (str): "csv", "ndjson" or "parquet" (default: from the path)
+        compression (str): For CSV/NDJSON "gzip", "bz2" or "xz", for
+            Parquet any pyarrow codec such as "snappy" or "zstd"
+            (default: from the path)
+        buffer_size (int): Size of the write buffer in bytes
+        progress: Callable receiving (rows, elapsed) about every `every`
+            rows and at the end, or None to stay silent
+        every (int): Rows between two progress reports
+
+    Returns:
+        int: Number of rows written
+
+    Raises:
+        ValueError: If the format, or the compression of a CSV/NDJSON
+            export, is not supported
+    """
+    guessed_format, guessed_compression = guess_format(path)
+    fmt = fmt or guessed_format
+    compression = compression or guessed_compression
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt!r}")
+
+    start = time.perf_counter()
+    rows = reported = 0
+    if fmt == "parquet":
+        file = None
+        counts = write_parquet(pages, path, compression)
+    else:
+        file = open_text(path, compression, buffer_size)
+        writer = write_csv if fmt == "csv" else write_ndjson
+        counts = writer(pages, file)
+    try:
+        for rows in counts:
+            if progress and rows - reported >= every:
+                progress(rows, time.perf_counter() - start)
+                reported = rows
+    finally:
+        if file is not None:
+            file.close()
+    if progress:
+        progress(rows, time.perf_counter() - start)
+    return rows
+
+
+def export_users(connection, path, fmt=None, compression=None,
+                 batch_size=1000, **options):
+    """
+    Exports the user_data table, streaming it page by page
+
+    Args:
+        connection: DB-API connection object
+        path (str): Output path
+        fmt (str): "csv", "ndjson" or "parquet" (default: from the path)
+        compression (str): Compression, see export_pages
+        batch_size (int): Rows fetched and written per page
+        options: Passed on to export_pages
+
+    Returns:
+        int: Number of rows written
+    """
+    pages = keyset_pages(connection, "user_data", batch_size)
+    return export_pages(pages, path, fmt, compression, **options)
+
+
+def main():
+    """Parses the command line and runs the export"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("path", help="output file, e.g. users.ndjson.gz")
+    parser.add_argument("--format", choices=FORMATS,
+                        help="default: guessed from the path")
+    parser.add_argument("--compression",
+                        help="gzip, bz2, xz (CSV/NDJSON) or a Parquet codec")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--sqlite", metavar="PATH",
+                        help="export from a SQLite database instead of MySQL")
+    args = parser.parse_args()
+    fmt = args.format or guess_format(args.path)[0]
+    if fmt != "parquet" and args.compression is not None \
+            and args.compression not in COMPRESSORS:
+        parser.error(f"--compression must be one of "
+                     f"{', '.join(COMPRESSORS)} for {fmt}")
+
+    if not args.sqlite and not get_backend().has_connections:
+        # The memory backend has no connection, export its own pages
+        pages = get_backend().pages("user_data", args.batch_size)
+        export_pages(pages, args.path, args.format, args.compression)
+        return
+
+    if args.sqlite:
+        connection = sqlite3.connect(args.sqlite)
+    else:
+        connection = __import__('seed').connect_to_prodev()
+    try:
+        export_users(connection, args.path, args.format, args.compression,
+                     args.batch_size)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
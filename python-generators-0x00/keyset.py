@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+"""
+Module that provides keyset (seek) pagination over a database table
+
+Instead of `LIMIT n OFFSET k`, which makes the server walk past every
+earlier row, each page resumes right after the last key seen:
+`WHERE key > last_seen ORDER BY key LIMIT n`. With an index on the key
+every page costs the same no matter how deep into the table it is.
+"""
+from pushdown import identifier, placeholder, where_clause
+
+
+def select_list(columns, key):
+    """
+    Builds the column list of a SELECT, making sure the key is included
+
+    Args:
+        columns: "*" or a sequence of column names
+        key: Column used to order and resume pages
+
+    Returns:
+        str: Comma separated column list
+    """
+    if columns == "*":
+        return "*"
+    columns = [identifier(column) for column in columns]
+    if identifier(key) not in columns:
+        columns.append(key)
+    return ", ".join(columns)
+
+
+def fetch_rows(connection, table_name, page_size, key="user_id",
+               columns="*", after=None, where=None):
+    """
+    Fetches the raw rows of the page that directly follows a given key
+
+    Args:
+        connection: DB-API connection object
+        table_name: Name of the table to read from
+        page_size (int): Maximum number of rows to fetch
+        key: Indexed column the pages are ordered by (default: user_id)
+        columns: "*" or a sequence of column names to select
+        after: Last key of the previous page, None for the first page
+        where: (column, operator, value) triples filtered on the server
+
+    Returns:
+        tuple: (column names, list of row tuples)
+
+    Raises:
+        ValueError: If table_name, key or a column is not a plain SQL
+            identifier
+    """
+    table_name = identifier(table_name)
+    key = identifier(key)
+    condition, params = where_clause(connection, where)
+    conditions = [condition] if condition else []
+    if after is not None:
+        conditions.append(f"{key} > {placeholder(connection)}")
+        params += (after,)
+
+    query = f"SELECT {select_list(columns, key)} FROM {table_name}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {key} LIMIT {int(page_size)}"
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        return [column[0] for column in cursor.description], rows
+    finally:
+        cursor.close()
+
+
+def dict_page(names, rows):
+    """Builds a page of row dictionaries from column names and row tuples"""
+    return [dict(zip(names, row)) for row in rows]
+
+
+def fetch_page(connection, table_name, page_size, key="user_id",
+               columns="*", after=None, where=None):
+    """
+    Fetches the page of rows that directly follows a given key
+
+    Takes the same arguments as fetch_rows.
+
+    Returns:
+        List of dictionaries, each representing a row from the database
+    """
+    return dict_page(*fetch_rows(connection, table_name, page_size, key,
+                                 columns, after, where))
+
+
+def keyset_pages(connection, table_name, page_size, key="user_id",
+                 columns="*", after=None, where=None, page=dict_page):
+    """
+    Generator function that pages through a table using keyset pagination
+
+    Args:
+        connection: DB-API connection object
+        table_name: Name of the table to read from
+        page_size (int): Number of rows in each page
+        key: Indexed column the pages are ordered by (default: user_id)
+        columns: "*" or a sequence of column names to select
+        after: Key to resume after, None to start from the beginning
+        where: (column, operator, value) triples filtered on the server
+        page: Callable building each page from (column names, row tuples),
+            row dictionaries by default
+
+    Yields:
+        One page at a time, as built by `page`
+    """
+    while True:
+        names, rows = fetch_rows(connection, table_name, page_size, key,
+                                 columns, after, where)
+        if not rows:
+            return
+        yield page(names, rows)
+
+        # A short page means the end of the table was reached
+        if len(rows) < page_size:
+            return
+        after = rows[-1][names.index(key)]
@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+"""
+Module that provides a prefetching wrapper for generators
+
+The source generator runs in a background thread and pushes its items
+into a bounded queue, so fetching the next items overlaps with the
+consumer processing the current one. The queue size bounds how far
+ahead the producer may run (backpressure).
+"""
+import queue
+import threading
+
+DONE = object()
+
+
+class Failure:
+    """Carries an exception raised by the source to the consumer"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(source, depth=2):
+    """
+    Generator function that consumes an iterable ahead of its caller
+
+    Items are produced by a background thread at most `depth` items
+    ahead of the consumer. An exception raised by the source is re-raised
+    in the consumer. Closing this generator (or exhausting it) stops the
+    producer, closes the source in the producer thread and joins it.
+
+    Args:
+        source: Iterable to consume, e.g. lazy_pagination(page_size)
+        depth (int): Maximum number of items fetched ahead
+
+    Yields:
+        The items of the source, in order
+    """
+    yield from prefetch_many([source], depth)
+
+
+def prefetch_many(sources, depth=2):
+    """
+    Generator function that consumes several iterables concurrently
+
+    Each source runs in its own background thread and all of them feed
+    one bounded queue, so items arrive in the order they are produced.
+    Items of a single source keep their relative order. Errors and
+    cancellation behave as in prefetch.
+
+    Args:
+        sources: Iterables to consume
+        depth (int): Maximum number of items fetched ahead in total
+
+    Yields:
+        The items of every source, as they become available
+    """
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        # Wait for room in the queue, giving up once the consumer is gone
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(source):
+        iterator = iter(source)
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+            put(DONE)
+        except BaseException as error:
+            put(Failure(error))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    producers = [threading.Thread(target=produce, args=(source,),
+                                  name="prefetch", daemon=True)
+                 for source in sources]
+    for producer in producers:
+        producer.start()
+    try:
+        running = len(producers)
+        while running:
+            item = items.get()
+            if item is DONE:
+                running -= 1
+                continue
+            if isinstance(item, Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        for producer in producers:
+            producer.join()
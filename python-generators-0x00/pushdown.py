@@ -0,0 +1,200 @@
+#!/usr/bin/python3
+"""
+Module that provides filtering and aggregation pushed down into SQL
+
+Predicates are written as (column, operator, value) triples, e.g.
+`[("age", ">", 25)]`, and are ANDed together. Against a database
+connection they become a parameterized WHERE clause and aggregates run
+on the server, so only the result crosses the wire. Any other source
+(an iterable of row dictionaries) is filtered and reduced in Python,
+one row at a time.
+"""
+import operator
+import re
+import sqlite3
+
+from reducers import REDUCERS
+
+OPERATORS = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def placeholder(connection):
+    """
+    Returns the parameter marker used by the connection's DB-API driver
+
+    Args:
+        connection: DB-API connection object (MySQL or SQLite)
+
+    Returns:
+        str: "?" for SQLite, "%s" for MySQL
+    """
+    return "?" if isinstance(connection, sqlite3.Connection) else "%s"
+
+
+def identifier(name):
+    """
+    Validates a table or column name before it is written into SQL
+
+    Args:
+        name (str): Table or column name
+
+    Returns:
+        str: The unchanged name
+
+    Raises:
+        ValueError: If the name is not a plain SQL identifier
+    """
+    if not IDENTIFIER.match(name):
+        raise ValueError(f"Invalid SQL identifier: {name!r}")
+    return name
+
+
+def where_clause(connection, where):
+    """
+    Builds a parameterized SQL condition from predicate triples
+
+    Args:
+        connection: DB-API connection the condition is meant for
+        where: Sequence of (column, operator, value) triples, or None
+
+    Returns:
+        tuple: (condition, params), condition is "" when there is no predicate
+    """
+    if not where:
+        return "", ()
+    marker = placeholder(connection)
+    conditions = []
+    params = []
+    for column, op, value in where:
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported operator: {op!r}")
+        conditions.append(f"{identifier(column)} {op} {marker}")
+        params.append(value)
+    return " AND ".join(conditions), tuple(params)
+
+
+def matches(row, where):
+    """
+    Evaluates predicate triples against a row in Python
+
+    Args:
+        row (dict): Row to test
+        where: Sequence of (column, operator, value) triples, or None
+
+    Returns:
+        bool: True if the row satisfies every predicate
+    """
+    return all(row[column] is not None and OPERATORS[op](row[column], value)
+               for column, op, value in where or ())
+
+
+def reduce_rows(rows, function, column="*", where=None, group_by=None):
+    """
+    Aggregates an iterable of row dictionaries in a single streaming pass
+
+    Args:
+        rows: Iterable of row dictionaries
+        function (str): One of avg, sum, count, min, max
+        column (str): Column to aggregate, "*" is only valid with count
+        where: Sequence of (column, operator, value) triples, or None
+        group_by: Column name or sequence of column names, or None
+
+    Returns:
+        The aggregate value, or a dictionary mapping each group key
+        (a value, or a tuple of values for several columns) to its value
+    """
+    reducer_class = REDUCERS[function]
+    groups = [group_by] if isinstance(group_by, str) else group_by
+    reducers = {}
+    for row in rows:
+        if not matches(row, where):
+            continue
+        if groups:
+            key = tuple(row[name] for name in groups)
+            key = key[0] if len(key) == 1 else key
+        else:
+            key = None
+        reducer = reducers.get(key)
+        if reducer is None:
+            reducer = reducers[key] = reducer_class()
+        reducer.add(1 if column == "*" else row[column])
+
+    if not groups:
+        reducer = reducers.get(None, reducer_class())
+        return reducer.result()
+    return {key: reducer.result() for key, reducer in reducers.items()}
+
+
+def aggregate_query(connection, function, column="*", where=None,
+                    group_by=None, table_name="user_data"):
+    """
+    Builds the SQL statement computing an aggregate on the server
+
+    Returns:
+        tuple: (query, params)
+    """
+    if function not in REDUCERS:
+        raise ValueError(f"Unsupported aggregate: {function!r}")
+    if column == "*" and function != "count":
+        raise ValueError(f"{function} needs a column")
+
+    target = "*" if column == "*" else identifier(column)
+    groups = [group_by] if isinstance(group_by, str) else list(group_by or ())
+    groups = [identifier(name) for name in groups]
+    select = groups + [f"{function.upper()}({target})"]
+
+    query = f"SELECT {', '.join(select)} FROM {identifier(table_name)}"
+    condition, params = where_clause(connection, where)
+    if condition:
+        query += f" WHERE {condition}"
+    if groups:
+        query += f" GROUP BY {', '.join(groups)}"
+    return query, params
+
+
+def aggregate(source, function, column="*", where=None, group_by=None,
+              table_name="user_data"):
+    """
+    Computes avg/sum/count/min/max, pushing the work down when possible
+
+    Against a DB-API connection the aggregate runs as a single SQL
+    statement. Any other source is treated as an iterable of row
+    dictionaries and reduced in Python by reduce_rows.
+
+    Args:
+        source: DB-API connection, or iterable of row dictionaries
+        function (str): One of avg, sum, count, min, max
+        column (str): Column to aggregate, "*" is only valid with count
+        where: Sequence of (column, operator, value) triples, or None
+        group_by: Column name or sequence of column names, or None
+        table_name (str): Table to aggregate when source is a connection
+
+    Returns:
+        The aggregate value, or a dictionary mapping each group key
+        to its value when group_by is given
+    """
+    if not hasattr(source, "cursor"):
+        return reduce_rows(source, function, column, where, group_by)
+
+    query, params = aggregate_query(source, function, column, where,
+                                    group_by, table_name)
+    cursor = source.cursor()
+    try:
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    if not group_by:
+        return rows[0][0]
+    return {(row[0] if len(row) == 2 else tuple(row[:-1])): row[-1]
+            for row in rows}
@@ -0,0 +1,147 @@
+#!/usr/bin/python3
+"""
+Module that provides streaming reducers for aggregating rows in Python
+
+Each reducer consumes values one at a time with `add` and keeps only a
+constant amount of state, so any stream can be aggregated without
+holding it in memory. NULL (None) values are ignored, as in SQL.
+
+Reducers are mergeable: `merge` folds in the state of another reducer of
+the same kind, so shards of a table can be reduced separately (even in
+other processes) and combined afterwards.
+"""
+
+
+class Count:
+    """Counts the values added"""
+
+    def __init__(self):
+        self.count = 0
+
+    def add(self, value):
+        """Adds one value"""
+        if value is not None:
+            self.count += 1
+
+    def merge(self, other):
+        """Folds in the state of another Count"""
+        self.count += other.count
+
+    def result(self):
+        """Returns the number of values added"""
+        return self.count
+
+
+class Sum:
+    """Sums the values added"""
+
+    def __init__(self):
+        self.total = None
+
+    def add(self, value):
+        """Adds one value"""
+        if value is not None:
+            self.total = value if self.total is None else self.total + value
+
+    def merge(self, other):
+        """Folds in the state of another Sum"""
+        self.add(other.total)
+
+    def result(self):
+        """Returns the sum, None if no value was added"""
+        return self.total
+
+
+class Min:
+    """Keeps the smallest value added"""
+
+    def __init__(self):
+        self.value = None
+
+    def add(self, value):
+        """Adds one value"""
+        if value is not None and (self.value is None or value < self.value):
+            self.value = value
+
+    def merge(self, other):
+        """Folds in the state of another Min"""
+        self.add(other.value)
+
+    def result(self):
+        """Returns the smallest value, None if no value was added"""
+        return self.value
+
+
+class Max:
+    """Keeps the largest value added"""
+
+    def __init__(self):
+        self.value = None
+
+    def add(self, value):
+        """Adds one value"""
+        if value is not None and (self.value is None or value > self.value):
+            self.value = value
+
+    def merge(self, other):
+        """Folds in the state of another Max"""
+        self.add(other.value)
+
+    def result(self):
+        """Returns the largest value, None if no value was added"""
+        return self.value
+
+
+class Avg:
+    """Averages the values added"""
+
+    def __init__(self):
+        self.total = 0
+        self.count = 0
+
+    def add(self, value):
+        """Adds one value"""
+        if value is not None:
+            self.total += value
+            self.count += 1
+
+    def merge(self, other):
+        """Folds in the state of another Avg"""
+        self.total += other.total
+        self.count += other.count
+
+    def result(self):
+        """Returns the average, None if no value was added"""
+        return self.total / self.count if self.count else None
+
+
+class Histogram:
+    """Counts the values added in fixed-width buckets"""
+
+    def __init__(self, width=10):
+        self.width = width
+        self.counts = {}
+
+    def add(self, value):
+        """Adds one value"""
+        if value is not None:
+            bucket = int(value // self.width) * self.width
+            self.counts[bucket] = self.counts.get(bucket, 0) + 1
+
+    def merge(self, other):
+        """Folds in the state of another Histogram of the same width"""
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+
+    def result(self):
+        """Returns a dictionary mapping each bucket's lower bound to its count"""
+        return dict(sorted(self.counts.items()))
+
+
+REDUCERS = {
+    "count": Count,
+    "sum": Sum,
+    "min": Min,
+    "max": Max,
+    "avg": Avg,
+}
@@ -4,9 +4,13 @@ Seed script for setting up MySQL database with user data
 and streaming rows using generators
 """
 import csv
-import mysql.connector
+import sqlite3
+import time
 import uuid
 import os
+from concurrent.futures import ProcessPoolExecutor
+from backends import ERRORS, MySQLBackend, NoConnectionError, get_backend
+from keyset import keyset_pages, placeholder
 
 
 def connect_db():
@@ -15,13 +19,9 @@ def connect_db():
     Returns: MySQL connection object or None if connection fails
     """
     try:
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password=""
-        )
+        connection = MySQLBackend(database="").connect()
         return connection
-    except mysql.connector.Error as err:
+    except ERRORS as err:
         print(f"Error connecting to MySQL: {err}")
         return None
 
@@ -37,24 +37,21 @@ def create_database(connection):
         cursor.execute("CREATE DATABASE IF NOT EXISTS ALX_prodev")
         cursor.close()
         print("Database ALX_prodev created successfully")
-    except mysql.connector.Error as err:
+    except ERRORS as err:
         print(f"Error creating database: {err}")
 
 
 def connect_to_prodev():
     """
-    Connects to the ALX_prodev database in MySQL
-    Returns: MySQL connection object or None if connection fails
+    Connects to the ALX_prodev database through the configured backend
+    (MySQL unless ALX_BACKEND says otherwise, see backends.py)
+    Returns: Connection object or None if connection fails, or if the
+    backend is the in-memory one, which has no connection
     """
     try:
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="",
-            database="ALX_prodev"
-        )
+        connection = get_backend().connect()
         return connection
-    except mysql.connector.Error as err:
+    except ERRORS + (NoConnectionError,) as err:
         print(f"Error connecting to ALX_prodev: {err}")
         return None
 
@@ -65,77 +62,331 @@ def create_table(connection):
     Args:
         connection: MySQL connection object
     """
+    # SQLite has no inline INDEX clause; the primary key is indexed anyway
+    index = "" if isinstance(connection, sqlite3.Connection) \
+        else ",\n                INDEX (user_id)"
     try:
         cursor = connection.cursor()
-        cursor.execute("""
+        cursor.execute(f"""
             CREATE TABLE IF NOT EXISTS user_data (
                 user_id VARCHAR(36) PRIMARY KEY,
                 name VARCHAR(255) NOT NULL,
                 email VARCHAR(255) NOT NULL,
-                age DECIMAL NOT NULL,
-                INDEX (user_id)
+                age DECIMAL NOT NULL{index}
             )
         """)
         connection.commit()
         cursor.close()
         print("Table user_data created successfully")
-    except mysql.connector.Error as err:
+    except ERRORS as err:
         print(f"Error creating table: {err}")
 
 
-def insert_data(connection, csv_file):
+def resolve_csv_path(csv_file):
+    """
+    Resolves a CSV path relative to the directory of this script
+    Args:
+        csv_file: Relative or absolute path to the CSV file
+    Returns: Absolute path to the CSV file
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(script_dir, csv_file)
+
+
+def parse_row(row):
+    """
+    Converts a CSV row into a user_data tuple
+    Args:
+        row: List of CSV fields (user_id, name, email, age)
+    Returns: Tuple ready to insert, or None if the row is incomplete
+    """
+    # Check if we have enough columns
+    if len(row) < 4:
+        return None
+    # Use provided UUID or generate a new one
+    user_id = row[0] if len(row[0]) == 36 else str(uuid.uuid4())
+    return (user_id, row[1], row[2], row[3])
+
+
+def read_partition(csv_path, start, end):
+    """
+    Generator function that reads the lines of a byte range of a file
+    Args:
+        csv_path: Path to the CSV file
+        start: Offset of the first byte, at the start of a line
+        end: Offset the range stops at, at the start of a line
+    Yields: Decoded lines whose first byte lies inside the range
+    """
+    with open(csv_path, 'rb') as file:
+        file.seek(start)
+        while file.tell() < end:
+            line = file.readline()
+            if not line:
+                break
+            yield line.decode('utf-8')
+
+
+def read_csv_chunks(csv_path, chunk_size, byte_range=None):
+    """
+    Generator function that reads a user_data CSV file in chunks
+    Args:
+        csv_path: Path to the CSV file containing user data
+        chunk_size: Number of rows in each chunk
+        byte_range: (start, end) partition from partition_csv, or None to
+            read the whole file
+    Yields: Lists of at most chunk_size user_data tuples
+    """
+    if byte_range is None:
+        file = open(csv_path, 'r', newline='')
+        lines = file
+        next(lines, None)  # Skip header row
+    else:
+        file = None
+        lines = read_partition(csv_path, *byte_range)
+
+    try:
+        chunk = []
+        for row in csv.reader(lines):
+            values = parse_row(row)
+            if values is None:
+                continue
+            chunk.append(values)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        if file is not None:
+            file.close()
+
+
+def partition_csv(csv_path, partitions):
+    """
+    Splits a CSV file into byte ranges aligned on line boundaries
+    The header line is left out, so every range holds data rows only.
+    Quoted fields spanning several lines are not supported.
+    Args:
+        csv_path: Path to the CSV file
+        partitions: Number of ranges wanted
+    Returns: List of (start, end) byte offsets, at most `partitions` long
+    """
+    size = os.path.getsize(csv_path)
+    with open(csv_path, 'rb') as file:
+        file.readline()  # Skip header row
+        first = file.tell()
+        step = max((size - first) // partitions, 1)
+
+        bounds = [first]
+        for index in range(1, partitions):
+            # Move to the start of the line containing the split point
+            file.seek(first + index * step - 1)
+            file.readline()
+            position = file.tell()
+            if position >= size:
+                break
+            if position > bounds[-1]:
+                bounds.append(position)
+        bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:])
+            if end > start]
+
+
+def upsert_statement(connection, on_duplicate="skip"):
+    """
+    Builds the INSERT statement used by the bulk loader
+    Args:
+        connection: MySQL or SQLite connection object
+        on_duplicate: "skip" to keep existing rows, "update" to overwrite them
+    Returns: SQL statement taking (user_id, name, email, age) parameters
+    """
+    if on_duplicate not in ("skip", "update"):
+        raise ValueError(f"on_duplicate must be 'skip' or 'update', "
+                         f"not {on_duplicate!r}")
+
+    marker = placeholder(connection)
+    values = f"VALUES ({marker}, {marker}, {marker}, {marker})"
+    columns = "user_data (user_id, name, email, age)"
+
+    if isinstance(connection, sqlite3.Connection):
+        if on_duplicate == "skip":
+            return f"INSERT OR IGNORE INTO {columns} {values}"
+        return (f"INSERT INTO {columns} {values} ON CONFLICT(user_id) "
+                "DO UPDATE SET name = excluded.name, "
+                "email = excluded.email, age = excluded.age")
+
+    if on_duplicate == "skip":
+        return f"INSERT IGNORE INTO {columns} {values}"
+    return (f"INSERT INTO {columns} {values} ON DUPLICATE KEY UPDATE "
+            "name = VALUES(name), email = VALUES(email), age = VALUES(age)")
+
+
+def print_progress(rows, elapsed):
+    """
+    Default progress reporter of the bulk loader
+    Args:
+        rows: Number of rows loaded so far
+        elapsed: Seconds since the load started
+    """
+    rate = rows / elapsed if elapsed else 0
+    print(f"Loaded {rows} rows in {elapsed:.2f}s ({rate:.0f} rows/s)")
+
+
+def load_chunks(connection, chunks, on_duplicate="skip", progress=None):
+    """
+    Sends chunks of user_data tuples with executemany, one commit per chunk
+    Args:
+        connection: MySQL or SQLite connection object
+        chunks: Iterable of lists of (user_id, name, email, age) tuples
+        on_duplicate: "skip" (default) or "update" existing rows
+        progress: Callable receiving (rows, elapsed) after each chunk,
+            or None to stay silent
+    Returns: Number of rows processed
+    """
+    statement = upsert_statement(connection, on_duplicate)
+    cursor = connection.cursor()
+    start = time.perf_counter()
+    rows = 0
+    try:
+        for chunk in chunks:
+            cursor.executemany(statement, chunk)
+            connection.commit()
+            rows += len(chunk)
+            if progress:
+                progress(rows, time.perf_counter() - start)
+    finally:
+        cursor.close()
+    return rows
+
+
+def bulk_insert_data(connection, csv_file, chunk_size=1000,
+                     on_duplicate="skip", progress=print_progress):
+    """
+    Streams a CSV file into user_data in chunks with executemany
+    Rows already present (same user_id) are skipped or updated instead of
+    aborting the whole load, and each chunk is committed on its own so an
+    interrupted load keeps the work already done.
+    Args:
+        connection: MySQL or SQLite connection object
+        csv_file: Path to the CSV file containing user data
+        chunk_size: Number of rows sent and committed per batch
+        on_duplicate: "skip" (default) or "update" existing rows
+        progress: Callable receiving (rows, elapsed) after each chunk,
+            or None to stay silent
+    Returns: Number of CSV rows processed
+    """
+    chunks = read_csv_chunks(resolve_csv_path(csv_file), chunk_size)
+    return load_chunks(connection, chunks, on_duplicate, progress)
+
+
+def load_partition(connect, csv_path, byte_range, chunk_size, on_duplicate):
+    """
+    Worker that loads one byte range of the CSV over its own connection
+    Args:
+        connect: Picklable callable returning a new DB-API connection
+        csv_path: Absolute path to the CSV file
+        byte_range: (start, end) partition from partition_csv
+        chunk_size: Number of rows sent and committed per batch
+        on_duplicate: "skip" or "update" existing rows
+    Returns: Tuple (rows loaded, seconds spent)
+    """
+    start = time.perf_counter()
+    connection = connect()
+    try:
+        chunks = read_csv_chunks(csv_path, chunk_size, byte_range)
+        rows = load_chunks(connection, chunks, on_duplicate)
+    finally:
+        connection.close()
+    return rows, time.perf_counter() - start
+
+
+def parallel_insert_data(csv_file, workers=None, connect=None,
+                         chunk_size=1000, on_duplicate="skip"):
+    """
+    Loads a CSV file with one process and one connection per partition
+    The file is split into line-aligned byte ranges by partition_csv and
+    each range is parsed and inserted by its own worker process.
+    Args:
+        csv_file: Path to the CSV file containing user data
+        workers: Number of processes (default: number of CPUs)
+        connect: Picklable callable returning a new DB-API connection
+            (default: connect_to_prodev)
+        chunk_size: Number of rows sent and committed per batch
+        on_duplicate: "skip" (default) or "update" existing rows
+    Returns: List of (rows, seconds) tuples, one per worker
+    """
+    csv_path = resolve_csv_path(csv_file)
+    workers = workers or os.cpu_count() or 1
+    connect = connect or connect_to_prodev
+    ranges = partition_csv(csv_path, workers)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(ranges) or 1) as pool:
+        futures = [pool.submit(load_partition, connect, csv_path, byte_range,
+                               chunk_size, on_duplicate)
+                   for byte_range in ranges]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    for index, (rows, seconds) in enumerate(results):
+        rate = rows / seconds if seconds else 0
+        print(f"Worker {index}: {rows} rows in {seconds:.2f}s "
+              f"({rate:.0f} rows/s)")
+    total = sum(rows for rows, _ in results)
+    rate = total / elapsed if elapsed else 0
+    print(f"Loaded {total} rows with {len(results)} workers in "
+          f"{elapsed:.2f}s ({rate:.0f} rows/s)")
+    return results
+
+
+def load_data_infile(connection, csv_file, on_duplicate="skip"):
     """
-    Inserts data in the database if it does not exist
+    Loads a CSV file into user_data with MySQL LOAD DATA LOCAL INFILE
+    The connection must be opened with allow_local_infile=True.
     Args:
         connection: MySQL connection object
         csv_file: Path to the CSV file containing user data
+        on_duplicate: "skip" (IGNORE) or "update" (REPLACE) existing rows
+    Returns: Number of rows affected
     """
+    mode = {"skip": "IGNORE", "update": "REPLACE"}[on_duplicate]
+    cursor = connection.cursor()
     try:
-        cursor = connection.cursor()
-        
-        # Check if data already exists
-        cursor.execute("SELECT COUNT(*) FROM user_data")
-        count = cursor.fetchone()[0]
-        
-        if count > 0:
-            print(f"Data already exists in the table. Skipping insertion.")
-            cursor.close()
-            return
-        
-        # Get absolute path to the CSV file
-        import os
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        csv_path = os.path.join(script_dir, csv_file)
-        
-        # Read data from CSV and insert into the table
-        with open(csv_path, 'r') as file:
-            csv_reader = csv.reader(file)
-            next(csv_reader)  # Skip header row
-            
-            for row in csv_reader:
-                # Check if we have enough columns
-                if len(row) >= 4:
-                    # Use provided UUID or generate a new one
-                    user_id = row[0] if len(row[0]) == 36 else str(uuid.uuid4())
-                    name = row[1]
-                    email = row[2]
-                    age = row[3]
-                    
-                    cursor.execute(
-                        "INSERT INTO user_data (user_id, name, email, age) VALUES (%s, %s, %s, %s)",
-                        (user_id, name, email, age)
-                    )
-        
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s {mode} INTO TABLE user_data "
+            "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+            "LINES TERMINATED BY '\\n' IGNORE 1 LINES "
+            "(@user_id, name, email, age) "
+            "SET user_id = IF(CHAR_LENGTH(@user_id) = 36, @user_id, UUID())",
+            (resolve_csv_path(csv_file),)
+        )
         connection.commit()
+        return cursor.rowcount
+    finally:
         cursor.close()
-        print(f"Data from {csv_path} inserted successfully")
+
+
+def insert_data(connection, csv_file, chunk_size=1000, on_duplicate="skip"):
+    """
+    Inserts data in the database, skipping rows that already exist
+    Args:
+        connection: MySQL connection object
+        csv_file: Path to the CSV file containing user data
+        chunk_size: Number of rows inserted and committed per batch
+        on_duplicate: "skip" (default) or "update" existing rows
+    """
+    csv_path = resolve_csv_path(csv_file)
+    try:
+        rows = bulk_insert_data(connection, csv_path, chunk_size,
+                                on_duplicate)
+        print(f"Data from {csv_path} inserted successfully ({rows} rows)")
     except FileNotFoundError:
         print(f"Error: CSV file {csv_path} not found")
-    except mysql.connector.Error as err:
+    except ERRORS as err:
         print(f"Error inserting data: {err}")
 
 
-def stream_rows(connection, table_name, batch_size=5):
+def stream_rows(connection, table_name, batch_size=5, key="user_id"):
     """
     Generator function that streams rows from a database table one by one
     
@@ -143,32 +394,51 @@ def stream_rows(connection, table_name, batch_size=5):
         connection: MySQL connection object
         table_name: Name of the table to stream data from
         batch_size: Number of rows to fetch at a time (default: 5)
+        key: Indexed column used to resume each batch (default: user_id)
         
     Yields:
         One row at a time from the database
     """
     try:
-        cursor = connection.cursor(dictionary=True)
-        offset = 0
-        
-        while True:
-            # Fetch a batch of rows
-            query = f"SELECT * FROM {table_name} LIMIT {batch_size} OFFSET {offset}"
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            
-            # If no more rows, stop iteration
-            if not rows:
-                break
-                
+        # Seek past the last key of each batch rather than using OFFSET
+        for rows in keyset_pages(connection, table_name, batch_size, key):
             # Yield each row one by one
             for row in rows:
                 yield row
-                
-            # Update offset for next batch
-            offset += batch_size
-            
-        cursor.close()
-    except mysql.connector.Error as err:
+    except ERRORS as err:
         print(f"Error streaming data: {err}")
         yield None
+
+
+if __name__ == "__main__":
+    import argparse
+    from functools import partial
+
+    parser = argparse.ArgumentParser(description="Load user_data.csv")
+    parser.add_argument("csv_file", nargs="?", default="user_data.csv")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="load byte-range partitions in N processes")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--on-duplicate", choices=("skip", "update"),
+                        default="skip")
+    parser.add_argument("--sqlite", metavar="PATH",
+                        help="load into a SQLite database instead of MySQL")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        connect = partial(sqlite3.connect, args.sqlite, timeout=60)
+    else:
+        connect = connect_to_prodev
+
+    connection = connect()
+    create_table(connection)
+    connection.close()
+
+    if args.workers > 1:
+        parallel_insert_data(args.csv_file, args.workers, connect,
+                             args.chunk_size, args.on_duplicate)
+    else:
+        connection = connect()
+        insert_data(connection, args.csv_file, args.chunk_size,
+                    args.on_duplicate)
+        connection.close()
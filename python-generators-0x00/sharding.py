@@ -0,0 +1,164 @@
+#!/usr/bin/python3
+"""
+Module that provides parallel range-sharded scans of user_data
+
+The user_id key space is split into contiguous UUID prefix ranges
+(e.g. 0000-3fff, 4000-7fff, ...). Each shard is scanned with keyset
+pagination over its own connection, in a separate process or thread,
+and the partial results are combined with mergeable reducers.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from keyset import keyset_pages
+from prefetch import prefetch_many
+
+
+def shard_bounds(shards, digits=4):
+    """
+    Splits the hexadecimal UUID key space into contiguous ranges
+
+    Args:
+        shards (int): Number of ranges
+        digits (int): Length of the hexadecimal prefixes used as bounds
+
+    Returns:
+        List of (low, high) prefixes; low is inclusive, high exclusive,
+        and None leaves that end open
+    """
+    space = 16 ** digits
+    cuts = [format(space * index // shards, f"0{digits}x")
+            for index in range(1, shards)]
+    return list(zip([None] + cuts, cuts + [None]))
+
+
+def shard_where(bounds, where=None, key="user_id"):
+    """
+    Adds the predicates restricting a scan to one shard
+
+    Args:
+        bounds: (low, high) prefixes from shard_bounds
+        where: Other (column, operator, value) triples, or None
+        key (str): Column holding the UUID
+
+    Returns:
+        list: Predicate triples for the shard
+    """
+    low, high = bounds
+    where = list(where or ())
+    if low is not None:
+        where.append((key, ">=", low))
+    if high is not None:
+        where.append((key, "<", high))
+    return where
+
+
+def shard_pages(connect, bounds, batch_size, where=None, columns="*",
+                table_name="user_data", key="user_id"):
+    """
+    Generator function that pages through one shard over its own connection
+
+    The connection is opened on first use, so it belongs to whichever
+    thread consumes the generator.
+
+    Yields:
+        List of dictionaries, each representing a page of the shard
+    """
+    connection = connect()
+    try:
+        yield from keyset_pages(connection, table_name, batch_size, key,
+                                columns, where=shard_where(bounds, where, key))
+    finally:
+        connection.close()
+
+
+def scan_shard(connect, bounds, reducers, where=None, batch_size=1000,
+               table_name="user_data", key="user_id"):
+    """
+    Reduces one shard; the worker run by sharded_aggregate
+
+    Args:
+        connect: Picklable callable returning a new DB-API connection
+        bounds: (low, high) prefixes from shard_bounds
+        reducers (dict): Name -> (column, reducer factory); column "*"
+            feeds the reducer one per row
+        where: (column, operator, value) triples, or None
+        batch_size (int): Rows fetched per page
+        table_name (str): Table to scan
+        key (str): Column holding the UUID
+
+    Returns:
+        dict: Name -> reducer holding the shard's partial result
+    """
+    states = {name: factory() for name, (_, factory) in reducers.items()}
+    columns = sorted({column for column, _ in reducers.values()
+                      if column != "*"}) or [key]
+    for page in shard_pages(connect, bounds, batch_size, where, columns,
+                            table_name, key):
+        for row in page:
+            for name, (column, _) in reducers.items():
+                states[name].add(1 if column == "*" else row[column])
+    return states
+
+
+def sharded_aggregate(connect, reducers, shards=None, where=None,
+                      batch_size=1000, table_name="user_data",
+                      key="user_id", processes=True):
+    """
+    Scans a table in parallel shards and merges the partial results
+
+    Args:
+        connect: Picklable callable returning a new DB-API connection
+        reducers (dict): Name -> (column, reducer factory), e.g.
+            {"average": ("age", Avg), "ages": ("age", partial(Histogram, 10))}
+        shards (int): Number of shards (default: number of CPUs)
+        where: (column, operator, value) triples, or None
+        batch_size (int): Rows fetched per page
+        table_name (str): Table to scan
+        key (str): Column holding the UUID
+        processes (bool): Scan shards in processes, or in threads if False
+
+    Returns:
+        dict: Name -> merged result
+    """
+    shards = shards or os.cpu_count() or 1
+    executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor(max_workers=shards) as pool:
+        futures = [pool.submit(scan_shard, connect, bounds, reducers, where,
+                               batch_size, table_name, key)
+                   for bounds in shard_bounds(shards)]
+        partials = [future.result() for future in futures]
+
+    merged = partials[0]
+    for partial in partials[1:]:
+        for name, state in partial.items():
+            merged[name].merge(state)
+    return {name: state.result() for name, state in merged.items()}
+
+
+def sharded_batches(connect, shards, batch_size, where=None, columns="*",
+                    table_name="user_data", key="user_id", depth=None):
+    """
+    Generator function that streams every shard concurrently
+
+    Each shard is paged by its own thread and connection; batches are
+    yielded as soon as any shard produces one, so batches from different
+    shards interleave.
+
+    Args:
+        connect: Callable returning a new DB-API connection
+        shards (int): Number of shards
+        batch_size (int): Rows fetched per page
+        where: (column, operator, value) triples, or None
+        columns: "*" or a sequence of column names to select
+        table_name (str): Table to scan
+        key (str): Column holding the UUID
+        depth (int): Batches buffered ahead (default: one per shard)
+
+    Yields:
+        List of dictionaries, each representing a page of one shard
+    """
+    sources = [shard_pages(connect, bounds, batch_size, where, columns,
+                           table_name, key)
+               for bounds in shard_bounds(shards)]
+    yield from prefetch_many(sources, depth or shards)
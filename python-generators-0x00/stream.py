@@ -0,0 +1,272 @@
+#!/usr/bin/python3
+"""
+Module that provides a composable, lazy stream pipeline
+
+    Stream.from_table(connection).filter(("age", ">", 25)) \\
+        .map(lambda user: user["email"]).batch(100)
+
+Nothing runs until the stream is iterated. Adjacent filter and map
+stages are fused into a single loop instead of one generator per stage,
+and filters given as (column, operator, value) triples on a table source
+are pushed down into the SQL query. batch and window end a fused run.
+"""
+import functools
+from collections import deque
+
+from keyset import keyset_pages
+from pushdown import OPERATORS, aggregate, reduce_rows
+
+FILTER = "filter"
+MAP = "map"
+BATCH = "batch"
+WINDOW = "window"
+
+
+class TableSource:
+    """Rows of a table read with keyset pagination, with pushed predicates"""
+
+    def __init__(self, connection, table_name="user_data", batch_size=1000,
+                 key="user_id", columns="*", where=()):
+        self.connection = connection
+        self.table_name = table_name
+        self.batch_size = batch_size
+        self.key = key
+        self.columns = columns
+        self.where = tuple(where)
+
+    def restrict(self, predicate):
+        """Returns a copy of this source with one more predicate triple"""
+        return TableSource(self.connection, self.table_name, self.batch_size,
+                           self.key, self.columns, self.where + (predicate,))
+
+    def __iter__(self):
+        for page in keyset_pages(self.connection, self.table_name,
+                                 self.batch_size, self.key, self.columns,
+                                 where=self.where or None):
+            yield from page
+
+
+def fuse(items, operations, sink=None):
+    """
+    Applies a run of filter/map stages to items in one generated loop
+
+    The stages are compiled into the body of a single generator, e.g.
+    two filters and a map become::
+
+        for item in items:
+            if not f0(item): continue
+            if not f1(item): continue
+            item = f2(item)
+            yield item
+
+    so each item costs one generator step however many stages there are.
+    Predicate triples are written inline (`item["age"] > v0`) rather than
+    called.
+    With a sink, `yield item` becomes `sink(item)` and the loop runs
+    eagerly, without any generator at all.
+
+    Args:
+        items: Iterable to transform
+        operations: Sequence of (FILTER or MAP, function) pairs
+        sink: Callable consuming each resulting item, or None
+
+    Returns:
+        Generator of the items passing every filter, transformed by every
+        map, or None once the items have been fed to the sink
+    """
+    lines = ["def run(items):", "    for item in items:"]
+    namespace = {}
+    for index, (kind, function) in enumerate(operations):
+        if kind == FILTER and isinstance(function, tuple):
+            # Inline predicate triples instead of calling a function
+            column, op, value = function
+            if op not in OPERATORS:
+                raise ValueError(f"Unsupported operator: {op!r}")
+            op = "==" if op == "=" else op
+            namespace[f"v{index}"] = value
+            lines.append(f"        field = item[{column!r}]")
+            lines.append(f"        if field is None or not field {op} "
+                         f"v{index}: continue")
+        elif kind == FILTER:
+            namespace[f"f{index}"] = function
+            lines.append(f"        if not f{index}(item): continue")
+        else:
+            namespace[f"f{index}"] = function
+            lines.append(f"        item = f{index}(item)")
+    if sink is None:
+        lines.append("        yield item")
+    else:
+        namespace["sink"] = sink
+        lines.append("        sink(item)")
+    exec("\n".join(lines), namespace)
+    return namespace["run"](items)
+
+
+def batches(items, size):
+    """Generator function that groups items into lists of `size` items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def windows(items, size, step=1):
+    """Generator function that yields sliding windows of `size` items"""
+    window = deque(maxlen=size)
+    pending = size
+    for item in items:
+        window.append(item)
+        pending -= 1
+        if pending == 0:
+            yield tuple(window)
+            pending = step
+
+
+BARRIERS = {
+    BATCH: batches,
+    WINDOW: windows,
+}
+
+
+class Stream:
+    """Lazy pipeline of stages over an iterable or a database table"""
+
+    def __init__(self, source, stages=()):
+        """
+        Args:
+            source: Iterable of items, or a TableSource
+            stages: Tuple of (kind, argument) stages, normally built with
+                the chaining methods
+        """
+        self.source = source
+        self.stages = tuple(stages)
+
+    @classmethod
+    def from_table(cls, connection, table_name="user_data", batch_size=1000,
+                   key="user_id", columns="*"):
+        """
+        Creates a stream over the rows of a table
+
+        Args:
+            connection: DB-API connection object
+            table_name (str): Table to read
+            batch_size (int): Rows fetched per page
+            key (str): Indexed column used for keyset pagination
+            columns: "*" or a sequence of column names to select
+
+        Returns:
+            Stream: Stream of row dictionaries
+        """
+        return cls(TableSource(connection, table_name, batch_size, key,
+                               columns))
+
+    def then(self, kind, argument):
+        """Returns a new stream with one more stage"""
+        return Stream(self.source, self.stages + ((kind, argument),))
+
+    def filter(self, predicate):
+        """
+        Keeps the items matching a predicate
+
+        Args:
+            predicate: Callable returning a truth value, or a
+                (column, operator, value) triple; a triple applied
+                directly to a table source becomes part of its SQL query
+
+        Returns:
+            Stream
+        """
+        if isinstance(predicate, tuple) and not self.stages \
+                and isinstance(self.source, TableSource):
+            return Stream(self.source.restrict(predicate))
+        return self.then(FILTER, predicate)
+
+    def map(self, function):
+        """Transforms every item with a function"""
+        return self.then(MAP, function)
+
+    def batch(self, size):
+        """Groups items into lists of at most `size` items"""
+        return self.then(BATCH, (size,))
+
+    def window(self, size, step=1):
+        """Yields tuples of `size` consecutive items, advancing by `step`"""
+        return self.then(WINDOW, (size, step))
+
+    def __iter__(self):
+        return self.run()
+
+    def run(self, sink=None):
+        """
+        Builds the pipeline and either returns it or drains it into a sink
+
+        Args:
+            sink: Callable consuming each resulting item, or None
+
+        Returns:
+            Iterator over the results, or None when a sink is given
+        """
+        items = iter(self.source)
+        operations = []
+        for kind, argument in self.stages:
+            if kind in (FILTER, MAP):
+                operations.append((kind, argument))
+                continue
+            if operations:
+                items = fuse(items, operations)
+                operations = []
+            items = BARRIERS[kind](items, *argument)
+        if sink is not None:
+            return fuse(items, operations, sink)
+        if operations:
+            items = fuse(items, operations)
+        return items
+
+    def to_list(self):
+        """Runs the stream and collects its items"""
+        return list(self)
+
+    def reduce(self, reducer, initial=None):
+        """
+        Runs the stream and reduces it to one value
+
+        Args:
+            reducer: A reducer with add()/result() (see reducers.py), or
+                a two-argument function as for functools.reduce
+            initial: Initial value when reducer is a function
+
+        Returns:
+            The reduced value
+        """
+        if hasattr(reducer, "add"):
+            self.run(sink=reducer.add)
+            return reducer.result()
+        if initial is None:
+            return functools.reduce(reducer, self)
+        return functools.reduce(reducer, self, initial)
+
+    def aggregate(self, function, column="*", group_by=None):
+        """
+        Computes avg/sum/count/min/max over the rows of the stream
+
+        When the stream is a table with only pushed-down filters the
+        aggregate runs in SQL, otherwise the rows are reduced in Python.
+
+        Args:
+            function (str): One of avg, sum, count, min, max
+            column (str): Column to aggregate, "*" is only valid with count
+            group_by: Column name or sequence of column names, or None
+
+        Returns:
+            The aggregate value, or a dictionary of values per group
+        """
+        if isinstance(self.source, TableSource) and not self.stages:
+            source = self.source
+            return aggregate(source.connection, function, column,
+                             source.where or None, group_by,
+                             source.table_name)
+        return reduce_rows(self, function, column, group_by=group_by)
@@ -0,0 +1,45 @@
+#!/usr/bin/python3
+"""
+Module that provides helpers for streaming rows over a single connection
+"""
+from contextlib import suppress
+
+
+def fetchmany_rows(cursor, fetch_size):
+    """
+    Generator function that reads rows from an executed cursor in chunks
+
+    Only `fetch_size` rows are held in memory at a time, so with an
+    unbuffered cursor the time to first row and the memory used do not
+    depend on the size of the result set.
+
+    Args:
+        cursor: Cursor on which a query has been executed
+        fetch_size (int): Number of rows requested per network read
+
+    Yields:
+        One row at a time, as returned by the cursor
+    """
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def release(connection, cursor=None):
+    """
+    Closes a cursor and its connection, even if rows are left unread
+
+    An unbuffered MySQL cursor refuses to close while part of its result
+    is still on the wire (e.g. when the consumer stopped early). Closing
+    the connection drops the pending result along with the socket.
+
+    Args:
+        connection: DB-API connection object
+        cursor: Cursor opened on the connection (optional)
+    """
+    if cursor is not None:
+        with suppress(Exception):
+            cursor.close()
+    connection.close()
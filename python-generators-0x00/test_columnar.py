@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Unit tests for the columnar module.
+"""
+import math
+import unittest
+from decimal import Decimal
+
+from columnar import batch_rows, columnar_page
+
+
+class TestColumnarPage(unittest.TestCase):
+    """Test cases for columnar_page and batch_rows.
+    """
+
+    def test_types(self):
+        """Test that numbers become float64 and strings unicode."""
+        batch = columnar_page(["name", "age"], [("a", 30), ("b", Decimal(5))])
+        self.assertEqual(batch["name"].dtype.kind, "U")
+        self.assertEqual(batch["age"].dtype.kind, "f")
+        self.assertEqual(list(batch_rows(batch)),
+                         [{"name": "a", "age": 30.0},
+                          {"name": "b", "age": 5.0}])
+
+    def test_null_in_first_row(self):
+        """Test that a NULL first value does not decide the type."""
+        batch = columnar_page(["age"], [(None,), (30,), (20,)])
+        self.assertEqual(batch["age"].dtype.kind, "f")
+        self.assertTrue(math.isnan(batch["age"][0]))
+        self.assertEqual([row["age"] for row in batch_rows(batch)],
+                         [None, 30.0, 20.0])
+
+    def test_null_in_later_row(self):
+        """Test that a later NULL in a numeric column becomes NaN."""
+        batch = columnar_page(["age"], [(30,), (None,), (20,)])
+        self.assertEqual(list(batch_rows(batch, batch["age"] > 25)),
+                         [{"age": 30.0}])
+
+    def test_strings_with_null_and_mixed_types(self):
+        """Test the object array fallback."""
+        batch = columnar_page(["name", "mixed"],
+                              [(None, 1), ("b", "x")])
+        self.assertEqual(batch["name"].dtype, object)
+        self.assertEqual(batch["mixed"].dtype, object)
+        self.assertEqual(list(batch_rows(batch)),
+                         [{"name": None, "mixed": 1},
+                          {"name": "b", "mixed": "x"}])
+
+    def test_all_null(self):
+        """Test that a column of NULLs stays NULL."""
+        batch = columnar_page(["age"], [(None,), (None,)])
+        self.assertEqual([row["age"] for row in batch_rows(batch)],
+                         [None, None])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Unit tests for the sketches module.
+"""
+import math
+import random
+import unittest
+
+from sketches import KLL, CountMin, HyperLogLog, email_domain
+
+QUANTILES = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99)
+
+
+def shards_of(values, shards):
+    """Split values into round-robin shards."""
+    return [values[index::shards] for index in range(shards)]
+
+
+class TestKLL(unittest.TestCase):
+    """Test cases for the KLL quantile sketch.
+    """
+
+    def setUp(self):
+        """Build a shuffled stream of distinct values 0..n-1."""
+        self.n = 50000
+        self.values = list(range(self.n))
+        random.Random(1).shuffle(self.values)
+
+    def assert_rank_error(self, sketch):
+        """Assert every quantile is within 1.7 / k of its true rank."""
+        bound = 1.7 / sketch.k * self.n
+        for q in QUANTILES:
+            # Value v has rank v in 0..n-1
+            error = abs(sketch.quantile(q) - q * self.n)
+            self.assertLessEqual(error, bound, f"q={q}")
+
+    def test_rank_error_bound(self):
+        """Test the rank error of a single sketch."""
+        for k in (100, 200):
+            with self.subTest(k=k):
+                sketch = KLL(k, QUANTILES, seed=7)
+                for value in self.values:
+                    sketch.add(value)
+                self.assertEqual(sketch.count, self.n)
+                self.assert_rank_error(sketch)
+
+    def test_memory_is_bounded(self):
+        """Test that the sketch keeps O(k) values, not the stream."""
+        sketch = KLL(200, seed=7)
+        for value in self.values:
+            sketch.add(value)
+        self.assertLessEqual(sketch.size, sketch.max_size)
+        self.assertLess(sketch.max_size, 3 * 200 + 2 * len(sketch.compactors))
+
+    def test_merged_shards_match_single_sketch(self):
+        """Test that merged shard sketches meet the same bound."""
+        single = KLL(200, QUANTILES, seed=7)
+        for value in self.values:
+            single.add(value)
+        merged = None
+        for index, shard in enumerate(shards_of(self.values, 4)):
+            sketch = KLL(200, QUANTILES, seed=index)
+            for value in shard:
+                sketch.add(value)
+            if merged is None:
+                merged = sketch
+            else:
+                merged.merge(sketch)
+        self.assertEqual(merged.count, single.count)
+        self.assert_rank_error(merged)
+        bound = 2 * 1.7 / 200 * self.n
+        for q in QUANTILES:
+            self.assertLessEqual(abs(merged.quantile(q) - single.quantile(q)),
+                                 bound)
+
+    def test_empty_and_none(self):
+        """Test that None is ignored and an empty sketch has no quantile."""
+        sketch = KLL()
+        sketch.add(None)
+        self.assertIsNone(sketch.quantile(0.5))
+        self.assertEqual(sketch.result(), {0.5: None, 0.95: None})
+
+
+class TestHyperLogLog(unittest.TestCase):
+    """Test cases for the HyperLogLog distinct count sketch.
+    """
+
+    def test_relative_error_bound(self):
+        """Test the estimate is within 3 standard errors."""
+        standard_error = 1.04 / math.sqrt(2 ** 14)
+        for distinct in (500, 20000, 100000):
+            with self.subTest(distinct=distinct):
+                sketch = HyperLogLog(14)
+                for value in range(distinct):
+                    sketch.add(f"user{value}")
+                    sketch.add(f"user{value}")
+                self.assertLessEqual(abs(sketch.result() - distinct),
+                                     3 * standard_error * distinct)
+
+    def test_merged_shards_match_single_sketch(self):
+        """Test that merging shards gives exactly the single sketch."""
+        values = [f"user{value}" for value in range(30000)]
+        single = HyperLogLog(12)
+        for value in values:
+            single.add(value)
+        merged = HyperLogLog(12)
+        for shard in shards_of(values, 3):
+            sketch = HyperLogLog(12)
+            for value in shard:
+                sketch.add(value)
+            merged.merge(sketch)
+        self.assertEqual(merged.registers, single.registers)
+        self.assertEqual(merged.result(), single.result())
+
+    def test_merge_rejects_other_precision(self):
+        """Test that sketches of different precision do not merge."""
+        with self.assertRaises(ValueError):
+            HyperLogLog(12).merge(HyperLogLog(14))
+
+    def test_key(self):
+        """Test that the key function is applied before hashing."""
+        sketch = HyperLogLog(key=email_domain)
+        for email in ("a@x.com", "b@X.com", "c@y.org", None):
+            sketch.add(email)
+        self.assertEqual(sketch.result(), 2)
+
+
+class TestCountMin(unittest.TestCase):
+    """Test cases for the Count-Min frequency sketch.
+    """
+
+    def setUp(self):
+        """Build a skewed stream with known counts."""
+        generator = random.Random(3)
+        self.values = [f"domain{int(generator.paretovariate(1.2))}"
+                       for _ in range(30000)]
+        self.counts = {}
+        for value in self.values:
+            self.counts[value] = self.counts.get(value, 0) + 1
+
+    def build(self, values, width=500, depth=5):
+        """Return a CountMin fed with values."""
+        sketch = CountMin(width, depth, top=5)
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+    def test_error_bound(self):
+        """Test estimates are never low and within e / width of total."""
+        sketch = self.build(self.values)
+        bound = math.e / sketch.width * sketch.total
+        within = 0
+        for value, count in self.counts.items():
+            estimate = sketch.estimate(value)
+            self.assertGreaterEqual(estimate, count)
+            within += estimate - count <= bound
+        # Each estimate holds with probability 1 - exp(-depth)
+        self.assertGreaterEqual(within / len(self.counts),
+                                1 - math.exp(-sketch.depth))
+
+    def test_heavy_hitters(self):
+        """Test that the most frequent values are reported first."""
+        sketch = self.build(self.values)
+        expected = sorted(self.counts, key=self.counts.get, reverse=True)
+        reported = [value for value, _ in sketch.result()]
+        self.assertEqual(reported[:3], expected[:3])
+
+    def test_merged_shards_match_single_sketch(self):
+        """Test that merging shards gives exactly the single sketch."""
+        single = self.build(self.values)
+        merged = CountMin(500, 5, top=5)
+        for shard in shards_of(self.values, 4):
+            merged.merge(self.build(shard))
+        self.assertEqual(merged.rows, single.rows)
+        self.assertEqual(merged.total, single.total)
+        self.assertEqual(merged.result()[:3], single.result()[:3])
+
+    def test_merge_rejects_other_shape(self):
+        """Test that sketches of different shapes do not merge."""
+        with self.assertRaises(ValueError):
+            CountMin(100, 5).merge(CountMin(200, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()